@@ -0,0 +1,241 @@
+"""Benchmark suite for the invoice pipeline, with seeded synthetic data.
+
+Runs headless and times each stage at several sizes:
+
+    customers.load_xlsx   read customer_data.xlsx
+    customers.save_xlsx   merge one customer into it by rewriting the workbook (a compaction)
+    customers.add         save one customer as the app does (journal append)
+    items.add             parse and add typed-in items (_add_item, without widgets)
+    invoice.xlsx          render an invoice (_generate_invoice_excel)
+    invoice.pdf           render the same invoice as a PDF
+
+Customers and items come from seeded generators, so every run measures the
+same data. Each case reports the median wall time over --repeat runs and the
+peak memory allocated by Python (tracemalloc, measured in one extra run so
+it does not slow the timed ones).
+
+With --save-baseline the results are written to a JSON file; later runs
+compare against it and flag any case that got slower or bigger by more
+than --tolerance, exiting with status 1. Baselines are per machine, so
+save one before changing the code and compare after:
+
+    python benchmarks/pipeline.py --save-baseline
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --quick --only customers
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from customer_store import (ExcelCustomerRepository, merge_customers_xlsx, read_customers_xlsx,  # noqa: E402
+                            write_customers_xlsx)
+from invoice_engine import build_item, generate_invoice  # noqa: E402
+from line_items import ItemList  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_baseline.json")
+CUSTOMER_SIZES = (1_000, 10_000, 100_000)
+ITEM_SIZES = (10, 1_000, 10_000)
+QUICK_CUSTOMER_SIZES = (1_000,)
+QUICK_ITEM_SIZES = (10, 1_000)
+SEED = 20250401
+
+# --- Synthetic Data ---
+_NAME_WORDS = ["Anant", "Shree", "Om", "Sai", "Ganesh", "Laxmi", "Mahalaxmi", "Sahyadri", "Krishna", "Panchganga",
+               "Deccan", "Kolhapur", "Ichalkaranji", "Sangli", "Warna", "Royal", "National", "Modern", "Star", "Unity"]
+_NAME_SUFFIXES = ["Traders", "Enterprises", "Textiles", "Industries", "Agencies", "Solar", "Electricals", "Pvt. Ltd."]
+_GOODS = ["Solar panel 540W", "Inverter 5kVA", "DC cable 4 sq mm", "MC4 connector pair", "Mounting structure",
+          "Earthing kit", "Lightning arrester", "ACDB box", "Battery 150Ah", "Charge controller 60A"]
+_HSN_CODES = ["8541", "8504", "8544", "8536", "7308", "8535", "8507", "9032"]
+
+
+def make_customers(count, seed=SEED):
+    """Returns count (customer_key, customer_data) pairs with unique keys."""
+    rng = random.Random(seed)
+    customers = []
+    for n in range(count):
+        name = f"{rng.choice(_NAME_WORDS)} {rng.choice(_NAME_WORDS)} {rng.choice(_NAME_SUFFIXES)}"
+        customers.append((f"C{n:06d}", {
+            "name": name,
+            "gst": f"27{''.join(rng.choices('ABCDEFGHJKLMNPQRSTUVWXYZ', k=5))}{rng.randrange(10000):04d}A1Z{rng.randrange(10)}",
+            "address": f"{rng.randrange(1, 999)}/{rng.randrange(1, 99)}, {rng.choice(_NAME_WORDS)} Nagar, Kolhapur",
+            "phone": f"9{rng.randrange(10 ** 9):09d}",
+            "email": f"accounts{n}@example.com",
+        }))
+    return customers
+
+
+def make_items(count, seed=SEED):
+    """Returns count line items as the strings typed into the item form."""
+    rng = random.Random(seed)
+    return [{
+        "hsn": rng.choice(_HSN_CODES),
+        "description": f"{rng.choice(_GOODS)} lot {n}",
+        "quantity": str(rng.randrange(1, 50)),
+        "rate": f"{rng.randrange(100, 50000)}.{rng.randrange(100):02d}",
+        "discount": rng.choice(["", "", "2", "5", "7.5%"]),
+        "cgst": rng.choice(["6", "9", "14"]),
+        "sgst": rng.choice(["6", "9", "14"]),
+    } for n in range(count)]
+
+
+def _build_items(raw_items):
+    return [build_item(raw["hsn"], raw["description"], raw["quantity"], raw["rate"],
+                       raw["discount"], raw["cgst"], raw["sgst"]) for raw in raw_items]
+
+
+PARTY = {"name": "Benchmark Traders", "gst": "27AAAAA0000A1Z5", "address": "Kolhapur",
+         "phone": "9800000000", "email": "accounts@example.com"}
+INVOICE = {"sale_date": "01-04-2025", "delivery_date": "02-04-2025", "invoice_no": "BENCH-00001"}
+
+
+# --- Cases ---
+# Each case factory gets a scratch folder and a size and returns the function
+# to time; setup work done in the factory is not timed.
+def customers_load_xlsx(workdir, size):
+    path = os.path.join(workdir, f"customers_{size}.xlsx")
+    if not os.path.exists(path):
+        write_customers_xlsx(path, make_customers(size))
+    return lambda: read_customers_xlsx(path)
+
+
+def customers_save_xlsx(workdir, size):
+    path = os.path.join(workdir, f"customers_save_{size}.xlsx")
+    write_customers_xlsx(path, make_customers(size))
+    keys = itertools.count(1)
+    return lambda: merge_customers_xlsx(path, [(f"NEW{next(keys):06d}", {"name": "New Customer"})])
+
+
+def customers_add(workdir, size):
+    path = os.path.join(workdir, f"customers_add_{size}.xlsx")
+    write_customers_xlsx(path, make_customers(size))
+    repository = ExcelCustomerRepository(path)
+    len(repository)  # Loaded before timing, as in the app
+    keys = itertools.count(1)
+    return lambda: repository.add(f"NEW{next(keys):06d}", {"name": "New Customer"})
+
+
+def items_add(workdir, size):
+    raw_items = make_items(size)
+
+    def run():
+        items = ItemList()
+        for raw in raw_items:
+            items.add(build_item(raw["hsn"], raw["description"], raw["quantity"], raw["rate"],
+                                 raw["discount"], raw["cgst"], raw["sgst"]))
+        return items.totals
+    return run
+
+
+def _invoice_case(output_format):
+    def case(workdir, size):
+        items = _build_items(make_items(size))
+        return lambda: generate_invoice(PARTY, INVOICE, items, output_format, output_dir=workdir,
+                                        filename=f"invoice_{size}.{output_format}")
+    return case
+
+
+CASES = [
+    ("customers.load_xlsx", customers_load_xlsx, "customer"),
+    ("customers.save_xlsx", customers_save_xlsx, "customer"),
+    ("customers.add", customers_add, "customer"),
+    ("items.add", items_add, "item"),
+    ("invoice.xlsx", _invoice_case("xlsx"), "item"),
+    ("invoice.pdf", _invoice_case("pdf"), "item"),
+]
+
+
+def measure(run, repeat):
+    """Returns (median seconds, peak traced bytes) for run()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def compare(results, baseline, tolerance):
+    """Yields (case, message) for every case that regressed beyond tolerance against baseline."""
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric, unit in (("seconds", "s"), ("peak_bytes", "B")):
+            if before[metric] and result[metric] > before[metric] * (1 + tolerance):
+                yield name, (f"{metric} {before[metric]:.4g}{unit} -> {result[metric]:.4g}{unit}"
+                             f" (+{(result[metric] / before[metric] - 1) * 100:.0f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (median is reported)")
+    parser.add_argument("--quick", action="store_true", help="only the smaller sizes")
+    parser.add_argument("--only", help="run only cases whose name starts with this, e.g. customers")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown/growth before a case is flagged (default: %(default)s = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = {
+        "customer": QUICK_CUSTOMER_SIZES if args.quick else CUSTOMER_SIZES,
+        "item": QUICK_ITEM_SIZES if args.quick else ITEM_SIZES,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for case_name, case, kind in CASES:
+            if args.only and not case_name.startswith(args.only):
+                continue
+            for size in sizes[kind]:
+                name = f"{case_name}[{size}]"
+                seconds, peak = measure(case(workdir, size), args.repeat)
+                results[name] = {"seconds": seconds, "peak_bytes": peak}
+                print(f"  {name:<28} {seconds * 1000:10.1f} ms   peak {peak / 1024 / 1024:8.1f} MB", flush=True)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f).get("results", {})
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(), "results": baseline},
+                      f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = list(compare(results, baseline.get("results", {}), args.tolerance))
+    if baseline.get("machine") != platform.platform():
+        print(f"\nNote: the baseline was recorded on {baseline.get('machine')}")
+    if not regressions:
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"\n{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for name, message in regressions:
+        print(f"  REGRESSION {name}: {message}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Compares the Excel and PDF invoice renderers for speed and output size.
+
+Renders the same invoices once per format in this process (after one
+warm-up render each, so imports and the template are not counted) and
+reports the median and p95 render time and the average file size:
+
+    python benchmarks/render_formats.py --invoices 50 --items 20
+    python benchmarks/render_formats.py --items 2000 --formats xlsx pdf --no-logo
+
+Run it from the folder holding logo.jpg to include the logo.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from invoice_engine import RENDERERS, build_item, default_logo_path, generate_invoice  # noqa: E402
+
+PARTY = {"name": "Benchmark Traders", "gst": "27AAAAA0000A1Z5", "address": "Kolhapur",
+         "phone": "9800000000", "email": "accounts@example.com"}
+
+
+def make_items(count, invoice_no=0):
+    return [build_item("8541", f"Solar panel 540W, lot {invoice_no}-{n}", n % 5 + 1, "1500.50",
+                       5 if n % 3 == 0 else 0, 9, 9)
+            for n in range(count)]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--invoices", type=int, default=30)
+    parser.add_argument("--items", type=int, default=20, help="line items per invoice")
+    parser.add_argument("--formats", nargs="+", choices=sorted(RENDERERS), default=sorted(RENDERERS, reverse=True))
+    parser.add_argument("--no-logo", action="store_true", help="render without logo.jpg")
+    args = parser.parse_args(argv)
+
+    invoices = [make_items(args.items, n) for n in range(args.invoices)]
+    with tempfile.TemporaryDirectory() as output_dir:
+        logo_path = os.path.join(output_dir, "no-logo.jpg") if args.no_logo else default_logo_path()
+        print(f"{args.invoices} invoices x {args.items} items"
+              + (", no logo" if args.no_logo or not os.path.exists(logo_path) else ""))
+        for output_format in args.formats:
+            def render(n, items):
+                invoice = {"sale_date": "01-04-2025", "delivery_date": "02-04-2025", "invoice_no": f"B-{n:05d}"}
+                return generate_invoice(PARTY, invoice, items, output_format, output_dir=output_dir,
+                                        filename=f"invoice_{n}.{output_format}", logo_path=logo_path)
+
+            render(-1, invoices[0])  # Warm-up
+            times, sizes = [], []
+            for n, items in enumerate(invoices):
+                start = time.perf_counter()
+                path = render(n, items)
+                times.append(time.perf_counter() - start)
+                sizes.append(os.path.getsize(path))
+            print(f"  {output_format:5} median {statistics.median(times) * 1000:8.1f} ms"
+                  f"   p95 {percentile(times, 0.95) * 1000:8.1f} ms"
+                  f"   {args.invoices / sum(times):7.1f} invoices/s"
+                  f"   avg size {statistics.mean(sizes) / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Load test for the invoice rendering service on localhost.
+
+Starts invoice_service in-process on a free port (or targets --url), sends
+--requests invoices from --concurrency client threads, and reports
+throughput, latency percentiles and how many requests were turned away
+with 503 by the service's backpressure:
+
+    python benchmarks/service_load.py --requests 200 --concurrency 16 --workers 4
+    python benchmarks/service_load.py --url http://127.0.0.1:8765 --items 200
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from customer_store import MemoryCustomerRepository  # noqa: E402
+from invoice_service import InvoiceService, make_server  # noqa: E402
+from render_cache import CACHE_DIR, RenderCache  # noqa: E402
+
+
+def make_payload(items, request_no=0):
+    """A test invoice; request_no makes each one distinct so the render cache is not hit."""
+    return {
+        "party": {"name": "Load Test Traders", "gst": "27AAAAA0000A1Z5", "address": "Kolhapur"},
+        "invoice": {"sale_date": "01-04-2025", "delivery_date": "02-04-2025"},
+        "items": [
+            {"hsn": "8541", "description": f"Panel {n} lot {request_no}", "quantity": n % 5 + 1, "rate": 1500,
+             "cgst": 9, "sgst": 9}
+            for n in range(items)
+        ],
+    }
+
+
+def run_clients(host, port, bodies, requests, concurrency, retry):
+    """Sends the requests and returns ([latency seconds of successes], Counter of statuses, wall seconds)."""
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=120)
+        while True:
+            with lock:
+                request_no = next(remaining, None)
+            if request_no is None:
+                break
+            body = bodies[request_no % len(bodies)]
+            while True:
+                start = time.perf_counter()
+                conn.request("POST", "/invoices?return=path", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    statuses[response.status] += 1
+                if response.status == 503 and retry:
+                    time.sleep(0.05)
+                    continue
+                if response.status == 200:
+                    with lock:
+                        latencies.append(elapsed)
+                break
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="an already running service (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--items", type=int, default=20, help="line items per invoice")
+    parser.add_argument("--workers", type=int, default=None, help="render processes for the in-process service")
+    parser.add_argument("--queue-limit", type=int, default=None)
+    parser.add_argument("--no-retry", action="store_true", help="count 503s instead of retrying them")
+    parser.add_argument("--repeat", action="store_true", help="send the same invoice every time (render cache hits)")
+    args = parser.parse_args(argv)
+
+    bodies = [json.dumps(make_payload(args.items, n)).encode("utf-8") for n in range(1 if args.repeat else args.requests)]
+    server = service = None
+    with tempfile.TemporaryDirectory() as output_dir:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            service = InvoiceService(output_dir, MemoryCustomerRepository(), args.workers, args.queue_limit,
+                                     numbers_path=os.path.join(output_dir, "invoice_numbers.db"),
+                                     cache=RenderCache(os.path.join(output_dir, CACHE_DIR)))
+            server = make_server("127.0.0.1", 0, service, quiet=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address
+
+        try:
+            latencies, statuses, wall = run_clients(host, port, bodies, args.requests, args.concurrency,
+                                                    retry=not args.no_retry)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+                service.close()
+
+    print(f"{args.requests} invoices x {args.items} items, {args.concurrency} clients"
+          + (f", {service.workers} workers, queue limit {service.queue_limit}" if service else ""))
+    print(f"  responses      {dict(sorted(statuses.items()))}")
+    if latencies:
+        print(f"  throughput     {len(latencies) / wall:8.1f} invoices/s")
+        print(f"  latency p50    {statistics.median(latencies) * 1000:8.1f} ms")
+        print(f"  latency p95    {percentile(latencies, 0.95) * 1000:8.1f} ms")
+        print(f"  latency p99    {percentile(latencies, 0.99) * 1000:8.1f} ms")
+        print(f"  latency max    {max(latencies) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measures cold-start time of the invoice app.
+
+Launches `invoice_app.py --measure-startup` several times and reports the
+median time until the window is ready and until the saved parties are
+loaded. Compare the old startup path with `--eager`:
+
+    python benchmarks/startup_time.py            # background loading (default)
+    python benchmarks/startup_time.py --eager    # old behaviour
+    python benchmarks/startup_time.py --exe dist/invoice_app.exe
+
+Run it from the folder holding customer_data.xlsx.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "invoice_app.py")
+
+
+def measure_once(command):
+    """Runs the app once and returns {marker: ms since launch} measured from outside."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    timings = {}
+    for line in proc.stdout:
+        marker, _, inner_ms = line.partition(" ")
+        if marker.endswith("_ms"):
+            timings[marker[:-3]] = (time.perf_counter() - start) * 1000
+            timings[marker[:-3] + " (in-process)"] = float(inner_ms)
+    proc.wait()
+    if proc.returncode:
+        raise SystemExit(f"{' '.join(command)} exited with {proc.returncode}")
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="measure the old eager startup path")
+    parser.add_argument("--exe", help="measure a PyInstaller build instead of invoice_app.py")
+    args = parser.parse_args(argv)
+
+    command = [args.exe] if args.exe else [sys.executable, APP]
+    command.append("--measure-startup")
+    if args.eager:
+        command.append("--eager")
+
+    runs = [measure_once(command) for _ in range(args.runs)]
+    print(f"{' '.join(command)}  ({args.runs} runs, median ms)")
+    for marker in runs[0]:
+        values = [run[marker] for run in runs if marker in run]
+        print(f"  {marker:<32} {statistics.median(values):8.1f}  (min {min(values):.1f}, max {max(values):.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,617 @@
+"""Customer repositories behind SAVED_PARTIES.
+
+Two interchangeable backends expose the same read-only mapping interface
+(``key in repo``, ``repo[key]``, ``repo.keys()``) plus ``add()``:
+
+- ExcelCustomerRepository: the original customer_data.xlsx layout, held in
+  an in-memory dict. The file's mtime and size are rechecked on access, and
+  edits made elsewhere (e.g. another workstation) are merged into the dict.
+  New customers are appended to a small journal (customer_data.journal.jsonl)
+  rather than rewriting the workbook, and a background compactor merges the
+  journal into the workbook in batches.
+- SQLiteCustomerRepository: an indexed SQLite file. Lookups go through the
+  primary-key B-tree and adding a customer is a single-row insert, so
+  neither depends on how many parties are stored.
+
+MemoryCustomerRepository is an unsaved stand-in used when loading fails.
+
+Usage:
+    python customer_store.py import customer_data.xlsx customer_data.db
+    python customer_store.py export customer_data.db customer_data.xlsx
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import abstractmethod
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from file_utils import write_atomic
+from invoice_metrics import span
+
+# openpyxl is only imported by the xlsx helpers, so the SQLite backend and
+# app startup don't pay for it.
+
+CUSTOMER_FIELDS = ("name", "gst", "address", "phone", "email")
+XLSX_HEADERS = ["Customer Key", "Customer Name", "GST Number", "Address", "Phone", "Email"]
+XLSX_COLUMN_WIDTHS = {'A': 25, 'B': 35, 'C': 20, 'D': 45, 'E': 18, 'F': 28}
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+# How often (seconds) ExcelCustomerRepository checks whether the file changed
+REVALIDATE_INTERVAL = 1.0
+# Journal of customers not yet merged into customer_data.xlsx, kept beside it
+JOURNAL_SUFFIX = ".journal.jsonl"
+# How often (seconds) the background compactor merges the journal into the xlsx
+COMPACT_INTERVAL = 30.0
+
+
+# --- customer_data.xlsx Layout ---
+def _row_to_customer(row):
+    return {
+        "name": row[1] if row[1] else "",
+        "gst": row[2] if len(row) > 2 and row[2] else "",
+        "address": row[3] if len(row) > 3 and row[3] else "",
+        "phone": row[4] if len(row) > 4 and row[4] else "",
+        "email": row[5] if len(row) > 5 and row[5] else "",
+    }
+
+
+def iter_customers_xlsx(file_path):
+    """Yields (customer_key, customer_data) from a customer_data.xlsx file."""
+    import openpyxl
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        ws = wb.active
+        # Read data starting from row 2 (skip header)
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            if row and row[0]:  # Check if Customer Key exists
+                yield row[0], _row_to_customer(row)
+    finally:
+        wb.close()
+
+
+def read_customers_xlsx(file_path):
+    """Reads a customer_data.xlsx file into a dict. Missing file means no customers."""
+    if not os.path.exists(file_path):
+        return {}
+    with span("customers.load") as load:
+        customers = dict(iter_customers_xlsx(file_path))
+        load.set(customers=len(customers))
+    return customers
+
+
+def _new_customer_workbook():
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Customers"
+
+    # Create headers
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
+    for col, header in enumerate(XLSX_HEADERS, start=1):
+        cell = ws.cell(row=1, column=col)
+        cell.value = header
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+
+    # Set column widths
+    for column, width in XLSX_COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+    return wb
+
+
+def merge_customers_xlsx(file_path, customers):
+    """Appends the customers whose keys are not in customer_data.xlsx yet, in one save. Returns how many were added.
+
+    The workbook is saved to a temporary file and renamed into place, so
+    readers never see it half-written.
+    """
+    import openpyxl
+
+    if not os.path.exists(file_path):
+        wb = _new_customer_workbook()
+    else:
+        wb = openpyxl.load_workbook(file_path)
+    try:
+        ws = wb.active
+        existing = {row[0] for row in ws.iter_rows(min_row=2, max_col=1, values_only=True) if row[0]}
+        next_row = ws.max_row + 1
+        added = 0
+        for customer_key, customer_data in customers:
+            if customer_key in existing:
+                continue  # Already merged, e.g. by a compaction cut short before it could clear the journal
+            existing.add(customer_key)
+            ws.cell(row=next_row, column=1, value=customer_key)
+            for col, field in enumerate(CUSTOMER_FIELDS, start=2):
+                ws.cell(row=next_row, column=col, value=customer_data.get(field, ""))
+            next_row += 1
+            added += 1
+        if added:
+            write_atomic(file_path, wb.save, prefix=".~customers-")
+    finally:
+        wb.close()
+    return added
+
+
+def write_customers_xlsx(file_path, customers):
+    """Writes (customer_key, customer_data) pairs to a fresh customer_data.xlsx."""
+    wb = _new_customer_workbook()
+    ws = wb.active
+    for customer_key, customer_data in customers:
+        ws.append([customer_key] + [customer_data.get(field, "") for field in CUSTOMER_FIELDS])
+    wb.save(file_path)
+    wb.close()
+
+
+# --- Customer Journal ---
+def journal_path(file_path):
+    """Returns the journal file kept beside customer_data.xlsx."""
+    return os.path.splitext(file_path)[0] + JOURNAL_SUFFIX
+
+
+def _read_journal(path):
+    entries = []
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return entries
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by a crash
+            entries.append((entry["key"], {field: entry.get(field, "") for field in CUSTOMER_FIELDS}))
+    return entries
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f, blocking):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not blocking:
+                    raise
+                # LK_LOCK gives up after about 10 seconds; keep waiting
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f, blocking):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """Holds an exclusive lock on the lock file at path, against other processes and threads.
+
+    Yields True once locked. If blocking is False and someone else holds
+    the lock, yields False straight away instead of waiting.
+    """
+    with open(path, "a+b") as f:
+        try:
+            _lock_file(f, blocking)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _unlock_file(f)
+
+
+class CustomerJournal:
+    """Append-only JSON-lines file of customers added since the last compaction.
+
+    append() opens the journal, writes one line, fsyncs and closes it, so a
+    saved customer survives a crash and costs the same however many
+    customers there are. A compaction first renames the journal to
+    <journal>.compacting, so customers added while the workbook is being
+    rewritten go to a fresh journal; the renamed file is deleted once its
+    customers are in the workbook. A compaction cut short leaves it to be
+    merged next time.
+
+    Several app windows (or workstations sharing the folder) may use one
+    journal: appends, reads and the rename happen under <journal>.lock,
+    and only one compaction runs at a time, under <journal>.compact.lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.lock_path = path + ".lock"
+        self.compact_lock_path = path + ".compact.lock"
+
+    def append(self, customer_key, customer_data):
+        entry = {"key": customer_key}
+        entry.update((field, customer_data.get(field, "")) for field in CUSTOMER_FIELDS)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with _file_lock(self.lock_path), open(self.path, "a+b") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line  # Don't glue onto a line cut short by a crash
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self):
+        """Returns [(customer_key, customer_data)] not yet compacted, oldest first."""
+        with _file_lock(self.lock_path):
+            return _read_journal(self.compacting_path) + _read_journal(self.path)
+
+    @contextmanager
+    def compaction(self):
+        """Moves the journal aside for compacting and yields its entries, to be merged in the block.
+
+        The moved-aside file is deleted when the block finishes without an
+        error; after an error it is merged again next time. Yields None if
+        another process (or thread) is compacting this journal already.
+        """
+        with _file_lock(self.compact_lock_path, blocking=False) as locked:
+            if not locked:
+                yield None
+                return
+            with _file_lock(self.lock_path):
+                # Unless an earlier compaction was cut short and left its batch behind
+                if not os.path.exists(self.compacting_path) and os.path.exists(self.path):
+                    os.replace(self.path, self.compacting_path)
+                batch = _read_journal(self.compacting_path)
+            yield batch
+            with _file_lock(self.lock_path):
+                try:
+                    os.remove(self.compacting_path)
+                except FileNotFoundError:
+                    pass
+
+    def signature(self):
+        """(mtime, size) of both journal files, to tell whether another process changed them."""
+        return _file_signature(self.compacting_path), _file_signature(self.path)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# --- Repositories ---
+class CustomerRepository(Mapping):
+    """Read-only mapping of customer key -> customer data, plus add().
+
+    An abstract base (Mapping is an abc.ABC): a store must implement add()
+    as well as __getitem__, __iter__ and __len__ before it can be created.
+    """
+
+    _subscribers = ()
+
+    @abstractmethod
+    def add(self, customer_key, customer_data):
+        """Stores a new customer. Returns False if the key already exists."""
+
+    def subscribe(self, callback):
+        """Calls callback(changed, removed) when customers change outside this process.
+
+        changed maps customer key -> customer data for new or edited
+        customers and removed lists deleted keys. The callback may run on
+        any thread that touches the repository.
+        """
+        self._subscribers = self._subscribers + (callback,)
+
+    def _notify(self, changed, removed):
+        for callback in self._subscribers:
+            callback(changed, removed)
+
+    def close(self):
+        pass
+
+
+class MemoryCustomerRepository(CustomerRepository):
+    """Customers held only in memory (nothing is persisted)."""
+
+    def __init__(self, customers=None):
+        self._customers = dict(customers or {})
+
+    def __getitem__(self, customer_key):
+        return self._customers[customer_key]
+
+    def __iter__(self):
+        return iter(list(self._customers))
+
+    def __len__(self):
+        return len(self._customers)
+
+    def add(self, customer_key, customer_data):
+        if customer_key in self._customers:
+            return False
+        self._customers[customer_key] = {field: customer_data.get(field, "") for field in CUSTOMER_FIELDS}
+        return True
+
+
+class ExcelCustomerRepository(CustomerRepository):
+    """Customers kept in customer_data.xlsx plus its journal, indexed by a dict in memory.
+
+    The dict is loaded on first use and revalidated against the files'
+    mtime and size at most every REVALIDATE_INTERVAL seconds. New journal
+    lines are merged straight away; a changed workbook is re-read on a
+    background thread while lookups keep using the current dict. The
+    differences are applied to the dict in place and reported to
+    subscribers. Our own saves update the dict directly and do not count as
+    a change.
+
+    add() only appends to the journal (see CustomerJournal), so saving a
+    customer takes the same time however large the workbook is. compact()
+    merges the journal into the workbook in one save; with compact_interval
+    a background thread does that every compact_interval seconds.
+    """
+
+    def __init__(self, file_path="customer_data.xlsx", compact_interval=None):
+        self.file_path = file_path
+        self.journal = CustomerJournal(journal_path(file_path))
+        self._customers = None
+        self._signature = None
+        self._checked = 0.0
+        self._reloading = False
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._compactor = None
+        self.compact_error = None  # The last compaction's error, if it failed (retried next time)
+        if compact_interval:
+            self.start_compactor(compact_interval)
+
+    def _file_signature(self):
+        return _file_signature(self.file_path), self.journal.signature()
+
+    def _read(self):
+        customers = read_customers_xlsx(self.file_path)
+        for customer_key, customer_data in self.journal.entries():
+            customers.setdefault(customer_key, customer_data)
+        return customers
+
+    def _index(self, revalidate=False):
+        now = time.monotonic()
+        if self._customers is not None and not revalidate and now - self._checked < REVALIDATE_INTERVAL:
+            return self._customers
+        with self._lock:
+            self._checked = now
+            signature = self._file_signature()
+            if self._customers is None:
+                self._customers = self._read()
+                self._signature = signature
+                return self._customers
+            if signature[1] != self._signature[1]:
+                # The journal grew (another process added customers): no need to re-read the workbook
+                self._merge_journal()
+            if signature[0] != self._signature[0] and not self._reloading:
+                # Changed elsewhere, e.g. another workstation. Re-reading a large workbook takes
+                # seconds, so it happens on a worker thread and the current dict is used meanwhile.
+                self._reloading = True
+                threading.Thread(target=self._reload, args=(signature[0],), name="customer-reload",
+                                 daemon=True).start()
+            self._signature = (self._signature[0], signature[1])
+        return self._customers
+
+    def _reload(self, xlsx_signature):
+        """Re-reads the changed workbook and applies the differences (on the customer-reload thread)."""
+        try:
+            # Not while our own compaction moves customers from the journal into the workbook
+            with self._compact_lock, span("customers.reload"):
+                fresh = read_customers_xlsx(self.file_path)
+            with self._lock:
+                for customer_key, customer_data in self.journal.entries():
+                    fresh.setdefault(customer_key, customer_data)
+                self._merge(fresh)
+                self._signature = (xlsx_signature, self._signature[1])
+        except Exception:
+            pass  # E.g. caught mid-save by Excel; the next check tries again
+        finally:
+            self._reloading = False
+
+    def _merge(self, fresh):
+        """Applies the customers read from a changed file to the in-memory dict."""
+        customers = self._customers
+        changed = {key: data for key, data in fresh.items() if customers.get(key) != data}
+        removed = [key for key in customers if key not in fresh]
+        for key in removed:
+            del customers[key]
+        customers.update(changed)
+        if changed or removed:
+            self._notify(changed, removed)
+
+    def _merge_journal(self):
+        customers = self._customers
+        changed = {key: data for key, data in self.journal.entries() if key not in customers}
+        customers.update(changed)
+        if changed:
+            self._notify(changed, [])
+
+    def __getitem__(self, customer_key):
+        return self._index()[customer_key]
+
+    def __contains__(self, customer_key):
+        return customer_key in self._index()
+
+    def __iter__(self):
+        return iter(list(self._index()))
+
+    def __len__(self):
+        return len(self._index())
+
+    def add(self, customer_key, customer_data):
+        with self._lock:
+            # Pick up outside edits first, so a key added elsewhere is not saved twice
+            customers = self._index(revalidate=True)
+            if customer_key in customers:
+                return False
+            customer = {field: customer_data.get(field, "") for field in CUSTOMER_FIELDS}
+            with span("customers.journal"):
+                self.journal.append(customer_key, customer)
+            customers[customer_key] = customer
+            self._signature = self._file_signature()
+        return True
+
+    def compact(self):
+        """Merges the journaled customers into customer_data.xlsx in one save. Returns how many were added."""
+        with self._compact_lock:
+            with self.journal.compaction() as batch:
+                if not batch:
+                    return 0
+                # The slow load and save run outside self._lock, so lookups and add() carry on meanwhile
+                with span("customers.compact", customers=len(batch)):
+                    added = merge_customers_xlsx(self.file_path, batch)
+            with self._lock:
+                if self._signature is not None:
+                    # Our own save is not an outside change, but a journal grown by another process still is
+                    xlsx_signature, (compacting_signature, _) = self._file_signature()
+                    self._signature = (xlsx_signature, (compacting_signature, self._signature[1][1]))
+            return added
+
+    def start_compactor(self, interval=COMPACT_INTERVAL):
+        """Runs compact() every interval seconds on a daemon thread until close()."""
+        if self._compactor is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                    self.compact_error = None
+                except Exception as e:
+                    # E.g. the workbook is open in Excel; the journal keeps the customers until the next try
+                    self.compact_error = e
+
+        self._compactor = threading.Thread(target=run, name="customer-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        """Stops the compactor (customers still in the journal are merged by a later compaction)."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+
+class SQLiteCustomerRepository(CustomerRepository):
+    """Customers in an indexed SQLite table, optionally seeded from customer_data.xlsx."""
+
+    def __init__(self, file_path="customer_data.db", import_from=None):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS customers ("
+            "key TEXT PRIMARY KEY, name TEXT, gst TEXT, address TEXT, phone TEXT, email TEXT)"
+        )
+        self._conn.commit()
+        if import_from and not len(self) and os.path.exists(import_from):
+            self.import_xlsx(import_from)
+
+    def __getitem__(self, customer_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, gst, address, phone, email FROM customers WHERE key = ?", (customer_key,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(customer_key)
+        return {field: value if value is not None else "" for field, value in zip(CUSTOMER_FIELDS, row)}
+
+    def __contains__(self, customer_key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM customers WHERE key = ?", (customer_key,)).fetchone() is not None
+
+    def __iter__(self):
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM customers ORDER BY rowid")]
+        return iter(keys)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def add(self, customer_key, customer_data):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO customers (key, name, gst, address, phone, email) VALUES (?, ?, ?, ?, ?, ?)",
+                (customer_key,) + tuple(customer_data.get(field, "") for field in CUSTOMER_FIELDS),
+            )
+        return cursor.rowcount == 1
+
+    def import_xlsx(self, file_path):
+        """Bulk-loads customers from a customer_data.xlsx file (and its journal). Returns the number added."""
+        rows = (
+            (customer_key,) + tuple(customer_data[field] for field in CUSTOMER_FIELDS)
+            for source in (iter_customers_xlsx(file_path), CustomerJournal(journal_path(file_path)).entries())
+            for customer_key, customer_data in source
+        )
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO customers (key, name, gst, address, phone, email) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            return self._conn.total_changes - before
+
+    def export_xlsx(self, file_path):
+        """Writes all customers to file_path in the customer_data.xlsx layout."""
+        write_customers_xlsx(file_path, ((key, self[key]) for key in self))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_customer_repository(file_path="customer_data.xlsx", compact_interval=None):
+    """Opens the repository matching the file extension (.xlsx or .db/.sqlite).
+
+    compact_interval starts the journal compactor of an xlsx repository.
+    """
+    if file_path.lower().endswith(SQLITE_SUFFIXES):
+        xlsx_path = os.path.join(os.path.dirname(file_path), "customer_data.xlsx")
+        return SQLiteCustomerRepository(file_path, import_from=xlsx_path)
+    return ExcelCustomerRepository(file_path, compact_interval)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] not in ("import", "export"):
+        print(__doc__.strip().split("Usage:")[1])
+        return 2
+
+    command, source, target = argv
+    if command == "import":
+        repo = SQLiteCustomerRepository(target)
+        count = repo.import_xlsx(source)
+        print(f"Imported {count} customers into {target} ({len(repo)} total)")
+    else:
+        repo = SQLiteCustomerRepository(source)
+        repo.export_xlsx(target)
+        print(f"Exported {len(repo)} customers to {target}")
+    repo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
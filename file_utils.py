@@ -0,0 +1,28 @@
+"""Atomic file writes shared by the renderers, the customer store and the render cache.
+
+A file is written under a temporary name in its own folder and then
+renamed over the target, so readers (and other processes) never see a
+half-written file and two writers never interleave.
+"""
+import os
+import tempfile
+
+# mkstemp creates files readable by the owner only; saved files get the usual umask permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_atomic(path, write, prefix=".~invoice-"):
+    """Calls write(temp_path) for a temporary file beside path, then renames it over path."""
+    fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=os.path.splitext(path)[1], dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
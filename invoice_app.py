@@ -1,99 +1,84 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from tkinter import ttk, messagebox, filedialog
 from datetime import date, datetime
-from tkcalendar import DateEntry
+import argparse
 import os
-
-# --- Load Customers from Excel File ---
-def load_customers_from_excel(file_path="customer_data.xlsx"):
-    """Loads customer data from an Excel file."""
-    customers = {}
+import queue
+import threading
+from customer_store import COMPACT_INTERVAL, MemoryCustomerRepository, journal_path, open_customer_repository
+from invoice_engine import ITEM_FIELDS, customer_key_for
+from invoice_pdf import check_printable
+from line_items import PAISE_PER_RUPEE, PERCENT_SCALE, QTY_SCALE, ItemList, fixed_text, rupees
+from item_preview import preview_item
+from item_grid import ItemGrid
+from item_import import build_items, read_item_file, read_item_rows
+from invoice_jobs import InvoiceJobQueue
+from party_search import PartyIndex
+from product_catalog import CATALOG_FILE, ProductCatalog
+from invoice_numbers import NUMBERS_FILE, InvoiceNumberAllocator
+from render_cache import CACHE_DIR, RenderCache, generate_invoice_cached
+from invoice_register import REGISTER_FILE, InvoiceRegister
+from invoice_metrics import (METRICS_FILE, METRICS_WINDOW, PROFILE_DIR, enable_metrics, enable_profiling, latency_summary,
+                             metrics_enabled, profiled, span)
+
+# Customer database: customer_data.xlsx by default, or an indexed SQLite file
+# (e.g. customer_data.db, seeded from customer_data.xlsx on first use).
+CUSTOMER_DB = os.environ.get("INVOICE_CUSTOMER_DB", "customer_data.xlsx")
+
+# --- Load Customers ---
+def open_saved_parties(file_path=CUSTOMER_DB):
+    """Opens the customer repository and loads it, reporting problems in a dialog."""
+    if file_path.lower().endswith(".xlsx") and not os.path.exists(file_path) and not os.path.exists(journal_path(file_path)):
+        messagebox.showwarning("customer_data.xlsx Not Found, Creating a new file named customer_data.xlsx", 
+            f"Customer database file '{file_path}' not found.\nUsing empty customer list.")
     try:
-        if not os.path.exists(file_path):
-            messagebox.showwarning("customer_data.xlsx Not Found, Creating a new file named customer_data.xlsx", 
-                f"Customer database file '{file_path}' not found.\nUsing empty customer list.")
-            return customers
-            
-        wb = openpyxl.load_workbook(file_path)
-        ws = wb.active
-        
-        # Read data starting from row 2 (skip header)
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if row[0]:  # Check if Customer Key exists
-                customer_key = row[0]
-                customers[customer_key] = {
-                    "name": row[1] if row[1] else "",
-                    "gst": row[2] if row[2] else "",
-                    "address": row[3] if row[3] else "",
-                    "phone": row[4] if len(row) > 4 and row[4] else "",
-                    "email": row[5] if len(row) > 5 and row[5] else "",
-                }
-        wb.close()
+        repository = open_customer_repository(file_path, compact_interval=COMPACT_INTERVAL)
+        len(repository)  # Loads the customers now rather than on first use
+        return repository
     except Exception as e:
         messagebox.showerror("Error Loading Customers", 
             f"Failed to load customer data from '{file_path}'.\nError: {e}")
-    
-    return customers
-
-def save_customer_to_excel(customer_key, customer_data, file_path="customer_data.xlsx"):
-    """Saves a new customer to the Excel file."""
-    try:
-        if not os.path.exists(file_path):
-            # Create new file with headers if it doesn't exist
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Customers"
-
-            # Create headers
-            headers = ["Customer Key", "Customer Name", "GST Number", "Address", "Phone", "Email"]
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            header_font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
-
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=1, column=col)
-                cell.value = header
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            # Set column widths
-            ws.column_dimensions['A'].width = 25
-            ws.column_dimensions['B'].width = 35
-            ws.column_dimensions['C'].width = 20
-            ws.column_dimensions['D'].width = 45
-            ws.column_dimensions['E'].width = 18
-            ws.column_dimensions['F'].width = 28
-        else:
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-
-        # Find the next empty row
-        next_row = ws.max_row + 1
-
-        # Add the new customer data
-        ws.cell(row=next_row, column=1, value=customer_key)
-        ws.cell(row=next_row, column=2, value=customer_data.get("name", ""))
-        ws.cell(row=next_row, column=3, value=customer_data.get("gst", ""))
-        ws.cell(row=next_row, column=4, value=customer_data.get("address", ""))
-        ws.cell(row=next_row, column=5, value=customer_data.get("phone", ""))
-        ws.cell(row=next_row, column=6, value=customer_data.get("email", ""))
-
-        # Save the workbook
-        wb.save(file_path)
-        wb.close()
-        return True
-    except Exception as e:
-        messagebox.showerror("Error Saving Customer", 
-            f"Failed to save customer data to '{file_path}'.\nError: {e}")
-        return False
-
-# Load customers at startup
-SAVED_PARTIES = load_customers_from_excel()
+        return MemoryCustomerRepository()
+
+# Customers are loaded on a background thread once the window is up
+# (see InvoiceGeneratorApp._start_loading_customers); `--eager` loads them here first.
+SAVED_PARTIES = MemoryCustomerRepository()
+
+# Matches listed in the party picker per search
+PARTY_SEARCH_RESULTS = 50
+NEW_PARTY = "(New Party)"
+
+# Product catalog used to autocomplete items, kept next to the customer database
+PRODUCT_CATALOG = ProductCatalog(os.path.join(os.path.dirname(CUSTOMER_DB), CATALOG_FILE))
+
+# Invoice number counter, shared with other windows and batch runs on this folder
+NUMBERS_DB = os.path.join(os.path.dirname(CUSTOMER_DB), NUMBERS_FILE)
+# Rendered invoices, reused when the same invoice is generated again
+RENDER_CACHE_DIR = os.path.join(os.path.dirname(CUSTOMER_DB), CACHE_DIR)
+# Register of every invoice issued, for GST reports (python invoice_register.py report)
+REGISTER_DB = os.path.join(os.path.dirname(CUSTOMER_DB), REGISTER_FILE)
+# Phase timings (--metrics) and cProfile captures of each invoice written (--profile)
+METRICS_LOG = os.path.join(os.path.dirname(CUSTOMER_DB), METRICS_FILE)
+PROFILES_DIR = os.path.join(os.path.dirname(CUSTOMER_DB), PROFILE_DIR)
+# How often the Timings window refreshes (ms)
+TIMINGS_REFRESH_MS = 1000
+# How often the app checks that new parties were merged into the workbook (ms)
+COMPACT_CHECK_MS = 5000
+
+# Item form: entry keys in build_item argument order (the CGST entry is "gst"),
+# and how long typing must pause before the item is re-checked (ms)
+ITEM_ENTRY_KEYS = ("hsn", "description", "quantity", "rate", "discount", "gst", "sgst")
+ITEM_FIELD_LABELS = {"hsn": "HSN/SAC Code", "description": "Description", "quantity": "Quantity", "rate": "Rate",
+                     "discount": "Discount", "cgst": "CGST", "sgst": "SGST"}
+PREVIEW_DELAY_MS = 150
+INVALID_FOREGROUND = "#b00020"
+INVALID_BACKGROUND = "#fde7e9"
 
 class InvoiceGeneratorApp:
-    def __init__(self, master):
+    def __init__(self, master, background_load=True):
         self.master = master
         master.title("🧾 Tax Invoice Generator")
         master.geometry("800x700")
@@ -101,7 +86,26 @@ class InvoiceGeneratorApp:
         master.state('zoomed')
         
         # --- Data storage for Item details ---
-        self.items_data = []
+        # Items keyed by stable id, with running totals updated in O(1)
+        # as rows are added, edited or removed
+        self.items_data = ItemList()
+        self._editing_id = None
+
+        # --- Background invoice writing ---
+        self.jobs = InvoiceJobQueue()
+        self._jobs_submitted = 0
+        self._jobs_finished = 0
+        self._polling_jobs = False
+        self._invoice_numbers = None
+        self._render_cache = None
+        self._register = None
+        self._invoice_numbers_lock = threading.Lock()
+        self._timings_window = None
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # --- Status bar ---
+        self.status_var = tk.StringVar(master, value="Ready")
+        ttk.Label(master, textvariable=self.status_var, anchor="w", relief="sunken").pack(side="bottom", fill="x")
         
         # --- Setup the main notebook (tabs) ---
         self.notebook = ttk.Notebook(master)
@@ -114,6 +118,14 @@ class InvoiceGeneratorApp:
         self._setup_buyer_details_frame(self.page1)
         self._setup_items_frame(self.page1)
 
+        # --- Saved parties ---
+        self.customers_ready = not background_load
+        self._customer_load_result = None
+        if background_load:
+            self._start_loading_customers()
+        self._compact_error = None
+        self.master.after(COMPACT_CHECK_MS, self._check_customer_compaction)
+
     ## ----------------- PAGE 1: BUYER DETAILS -----------------
 
     def _setup_buyer_details_frame(self, parent):
@@ -125,15 +137,25 @@ class InvoiceGeneratorApp:
         for i in range(4):
             frame.columnconfigure(i, weight=1)
 
-        # 1. Saved Party Dropdown
+        # 1. Saved Party Search: type part of a name, key, GST No. or phone
         ttk.Label(frame, text="Load Saved Party:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        party_keys = ["(New Party)"] + list(SAVED_PARTIES.keys())
+        # Customer edits made elsewhere arrive here from any thread and are
+        # applied to the search index on the Tk thread
+        self._customer_changes = queue.Queue()
+        SAVED_PARTIES.subscribe(self._queue_customer_changes)
+        self.party_index = PartyIndex(SAVED_PARTIES.items())
+        self._party_choices = {}  # dropdown label -> customer key
+        self._selected_party = None
         self.party_var = tk.StringVar(frame)
-        self.party_var.set(party_keys[0]) # Default value
+        self.party_var.set(NEW_PARTY) # Default value
         
-        self.party_dropdown = ttk.Combobox(frame, textvariable=self.party_var, values=party_keys, state="readonly")
+        self.party_dropdown = ttk.Combobox(frame, textvariable=self.party_var, values=[NEW_PARTY])
         self.party_dropdown.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         self.party_dropdown.bind("<<ComboboxSelected>>", self._load_saved_party)
+        self.party_dropdown.bind("<KeyRelease>", self._search_parties)
+        self.party_dropdown.bind("<Return>", self._pick_first_party)
+        self.party_status = ttk.Label(frame, text="")
+        self.party_status.grid(row=0, column=2, padx=5, pady=5, sticky="w")
 
         # 2. Buyer Details Entry Fields
         self.buyer_entries = {}
@@ -152,6 +174,7 @@ class InvoiceGeneratorApp:
             self.buyer_entries[key] = entry
 
         # 3. Date Fields with Calendar
+        from tkcalendar import DateEntry
         self.date_entries = {}
         date_fields = [
             ("Sale Date", "sale_date", 1), 
@@ -171,16 +194,110 @@ class InvoiceGeneratorApp:
             if key == "sale_date":
                 date_entry.set_date(default_sale_date)
 
+    def _start_loading_customers(self):
+        """Loads the customer repository on a worker thread so the window shows at once."""
+        self.party_status.config(text="Loading saved parties...")
+
+        def load():
+            try:
+                repository = open_customer_repository(CUSTOMER_DB, compact_interval=COMPACT_INTERVAL)
+                repository.subscribe(self._queue_customer_changes)
+                # Load and index the customers on this thread
+                with span("customers.open"):
+                    len(repository)
+                with span("customers.index"):
+                    index = PartyIndex(repository.items())
+                self._customer_load_result = (repository, index, None)
+            except Exception as e:
+                self._customer_load_result = (None, None, e)
+            try:
+                PRODUCT_CATALOG.refresh()  # Warm the product catalog too
+            except Exception:
+                pass  # Reported when the catalog is first used
+
+        threading.Thread(target=load, name="customer-loader", daemon=True).start()
+        self.master.after(50, self._poll_customer_loading)
+
+    def _poll_customer_loading(self):
+        """Hands the loaded customers to the GUI on the Tk thread."""
+        if self._customer_load_result is None:
+            self.master.after(50, self._poll_customer_loading)
+            return
+
+        global SAVED_PARTIES
+        repository, index, error = self._customer_load_result
+        self.customers_ready = True
+        self.party_status.config(text="")
+        if error is not None:
+            messagebox.showerror("Error Loading Customers", 
+                f"Failed to load customer data from '{CUSTOMER_DB}'.\nError: {error}")
+            return
+        if CUSTOMER_DB.lower().endswith(".xlsx") and not os.path.exists(CUSTOMER_DB) and not len(repository):
+            messagebox.showwarning("customer_data.xlsx Not Found, Creating a new file named customer_data.xlsx", 
+                f"Customer database file '{CUSTOMER_DB}' not found.\nUsing empty customer list.")
+        SAVED_PARTIES = repository
+        self.party_index = index
+        self._search_parties()
+
+    def _check_customer_compaction(self):
+        """Warns once if new parties could not be merged into the workbook (e.g. it is open in Excel)."""
+        error = getattr(SAVED_PARTIES, "compact_error", None)
+        if error is not None and self._compact_error is None:
+            self.status_var.set(f"New parties are not yet saved into '{CUSTOMER_DB}' - retrying.")
+            messagebox.showwarning("Saved Parties Not Merged",
+                f"New parties could not be written into '{CUSTOMER_DB}' (is it open in Excel?).\n"
+                f"They are kept in '{journal_path(CUSTOMER_DB)}' and will be merged on the next try.\nError: {error}")
+        elif error is None and self._compact_error is not None:
+            self.status_var.set(f"New parties saved into '{CUSTOMER_DB}'.")
+        self._compact_error = error
+        self.master.after(COMPACT_CHECK_MS, self._check_customer_compaction)
+
+    def _queue_customer_changes(self, changed, removed):
+        self._customer_changes.put((changed, removed))
+
+    def _apply_customer_changes(self):
+        """Updates the party search index with customers changed in the file since the last search."""
+        while True:
+            try:
+                changed, removed = self._customer_changes.get_nowait()
+            except queue.Empty:
+                return
+            self.party_index.update(changed, removed)
+
+    def _search_parties(self, event=None):
+        """Refills the party dropdown with the saved parties matching what has been typed."""
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        self._apply_customer_changes()
+        query = self.party_var.get()
+        if query in self._party_choices:
+            return
+        self._selected_party = None
+        matches = self.party_index.search(query, PARTY_SEARCH_RESULTS) if query != NEW_PARTY else []
+        matches = [customer_key for customer_key in matches if customer_key in SAVED_PARTIES]
+        self._party_choices = {}
+        for customer_key in matches:
+            self._party_choices[f"{customer_key} - {SAVED_PARTIES[customer_key].get('name', '')}"] = customer_key
+        self.party_dropdown['values'] = [NEW_PARTY] + list(self._party_choices)
+
+    def _pick_first_party(self, event):
+        """Loads the best match when Enter is pressed in the party search."""
+        if self._party_choices and self.party_var.get() not in self._party_choices:
+            self.party_var.set(next(iter(self._party_choices)))
+        self._load_saved_party(event)
+
     def _load_saved_party(self, event):
         """Loads details from SAVED_PARTIES into entry fields."""
-        selected_key = self.party_var.get()
+        selected_key = self._party_choices.get(self.party_var.get())
         if selected_key in SAVED_PARTIES:
+            self._selected_party = selected_key
             details = SAVED_PARTIES[selected_key]
             for key, entry in self.buyer_entries.items():
                 entry.delete(0, tk.END)
                 entry.insert(0, details.get(key, ""))
-        elif selected_key == "(New Party)":
-             for entry in self.buyer_entries.values():
+        elif self.party_var.get() == NEW_PARTY:
+            self._selected_party = None
+            for entry in self.buyer_entries.values():
                 entry.delete(0, tk.END)
 
     ## ----------------- PAGE 1: ITEMS ENTRY -----------------
@@ -199,17 +316,23 @@ class InvoiceGeneratorApp:
             entry_frame.columnconfigure(i, weight=1)
         self.item_entries = {}
 
-        # HSN/SAC Code (Optional)
+        # HSN/SAC Code (Optional) - autocompleted from the product catalog
+        self._product_choices = {}  # dropdown label -> Product
         ttk.Label(entry_frame, text="HSN/SAC Code").grid(row=0, column=0, padx=5, sticky="ew")
-        hsn_entry = ttk.Entry(entry_frame)
+        hsn_entry = ttk.Combobox(entry_frame)
         hsn_entry.grid(row=0, column=1, padx=5, sticky="ew")
+        hsn_entry.bind("<KeyRelease>", lambda event: self._complete_product(event, "hsn"))
+        hsn_entry.bind("<<ComboboxSelected>>", self._fill_from_product)
         self.item_entries["hsn"] = hsn_entry
 
-        # Description
+        # Description - autocompleted from the product catalog
         ttk.Label(entry_frame, text="Description").grid(row=0, column=2, padx=5, sticky="ew")
-        desc_entry = ttk.Entry(entry_frame)
+        desc_entry = ttk.Combobox(entry_frame)
         desc_entry.grid(row=0, column=3, padx=5, sticky="ew")
         desc_entry.bind("<Return>", lambda event: self._add_item())
+        desc_entry.bind("<KeyRelease>", lambda event: self._complete_product(event, "description"))
+        desc_entry.bind("<<ComboboxSelected>>", self._fill_from_product)
+        desc_entry.bind("<FocusOut>", self._prefill_known_product)
         self.item_entries["description"] = desc_entry
 
         # Quantity
@@ -253,117 +376,253 @@ class InvoiceGeneratorApp:
         self.item_entries["sgst"] = sgst_entry
         ttk.Label(sgst_frame).pack(side="left")
 
-        # 2. Treeview for displaying added items
-        self.tree = ttk.Treeview(frame, columns=("HSN/SAC","Description", "Qty", "Rate", "Discount", "CGST", "SGST", "Total"), show="headings", height=10)
-        self.tree.heading("HSN/SAC", text="HSN/SAC Code")
-        self.tree.column("HSN/SAC", width=100, anchor="center")
-        self.tree.heading("Description", text="Description")
-        self.tree.column("Description", width=200, anchor="w")
-        self.tree.heading("Qty", text="Quantity")
-        self.tree.column("Qty", width=80, anchor="center")
-        self.tree.heading("Rate", text="Rate")
-        self.tree.column("Rate", width=100, anchor="e")
-        self.tree.heading("Discount", text="Discount")
-        self.tree.column("Discount", width=80, anchor="center")
-        self.tree.heading("CGST", text="CGST")
-        self.tree.column("CGST", width=80, anchor="center")
-        self.tree.heading("SGST", text="SGST")
-        self.tree.column("SGST", width=80, anchor="center")
-        self.tree.heading("Total", text="Total Amount")
-        self.tree.column("Total", width=120, anchor="e")
-        self.tree.pack(fill="both", padx=5, pady=5, expand=True)
+        # Live check of the item being typed: amounts or problems shown under the fields
+        style = ttk.Style(self.master)
+        for widget_class in ("TEntry", "TCombobox"):
+            style.configure(f"Invalid.{widget_class}", foreground=INVALID_FOREGROUND, fieldbackground=INVALID_BACKGROUND)
+        style.configure("Invalid.TLabel", foreground=INVALID_FOREGROUND)
+        self._preview_job = None
+        self.item_preview_var = tk.StringVar(entry_frame)
+        self.item_preview_label = ttk.Label(entry_frame, textvariable=self.item_preview_var, anchor="w")
+        self.item_preview_label.grid(row=1, column=0, columnspan=6, padx=5, pady=(4, 0), sticky="ew")
+        self._item_texts = {}  # Keeps the variables alive; their traces go when they are collected
+        for key, entry in self.item_entries.items():
+            text = self._item_texts[key] = tk.StringVar(entry_frame)
+            entry.configure(textvariable=text)
+            text.trace_add("write", lambda *args: self._schedule_item_preview())
+
+        # 2. Item table (only the visible rows are put in the Treeview)
+        self.item_grid = ItemGrid(frame, self.items_data)
+        self.item_grid.pack(fill="both", padx=5, pady=5, expand=True)
+        self.item_grid.bind_rows("<Double-1>", lambda event: self._edit_item())
+
+        # 3. Live invoice totals
+        self.totals_var = tk.StringVar(frame)
+        ttk.Label(frame, textvariable=self.totals_var, anchor="e", font=("Calibri", 11, "bold")).pack(fill="x", padx=5)
+        self._show_totals()
 
         # Buttons frame at the bottom
         buttons_frame = ttk.Frame(frame)
         buttons_frame.pack(pady=5, anchor="e")
         
+        ttk.Button(buttons_frame, text="New Invoice", command=self._new_invoice).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Import Items (CSV)", command=self._import_items_file).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Paste Items", command=self._paste_items).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Edit Selected Item", command=self._edit_item).pack(side="left", padx=5)
         ttk.Button(buttons_frame, text="Remove Selected Item", command=self._remove_item).pack(side="left", padx=5)
         ttk.Button(buttons_frame, text="Generate Invoice (Excel)", command=self._generate_invoice).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Generate PDF",
+                   command=lambda: self._generate_invoice("pdf")).pack(side="left", padx=5)
+        if metrics_enabled():
+            ttk.Button(buttons_frame, text="Timings", command=self._show_timings).pack(side="left", padx=5)
         
     def _add_item(self):
-        """Validates input and adds an item to the items_data list and Treeview."""
-        try:
-            hsn = self.item_entries["hsn"].get().strip()
-            description = self.item_entries["description"].get().strip()
-            quantity = float(self.item_entries["quantity"].get())
-            rate = float(self.item_entries["rate"].get())
-            
-            # Parse Discount percentage
-            discount_input = self.item_entries["discount"].get().strip()
-            discount_percent = float(discount_input.rstrip('%')) if discount_input else 0.0
-            
-            # Parse CGST percentage
-            cgst_input = self.item_entries["gst"].get().strip()
-            cgst_percent = float(cgst_input.rstrip('%')) if cgst_input else 0.0
-            
-            # Parse SGST percentage
-            sgst_input = self.item_entries["sgst"].get().strip()
-            sgst_percent = float(sgst_input.rstrip('%')) if sgst_input else 0.0
+        """Adds the typed item to the item list (or saves the item being edited).
+
+        A field that is blank or invalid is marked in red and focused instead,
+        so the operator can fix it without a dialog.
+        """
+        preview = self._update_item_preview(submitting=True)
+        if not preview.valid:
+            for field, key in zip(ITEM_FIELDS, ITEM_ENTRY_KEYS):
+                if field in preview.errors or field in preview.missing:
+                    self.item_entries[key].focus()
+                    self.item_entries[key].select_range(0, tk.END)
+                    break
+            self.status_var.set("Item not added - fix the fields marked in red.")
+            return
 
-            if not description or quantity <= 0 or rate <= 0 or discount_percent < 0 or cgst_percent < 0 or sgst_percent < 0:
-                messagebox.showerror("Input Error", "All fields must be filled, and Quantity/Rate/Discount/CGST/SGST must be valid positive numbers.")
-                return
+        if self._editing_id in self.items_data:
+            # Replace the row being edited in place
+            self.items_data.replace(self._editing_id, preview.item, preview.amounts)
+            self.item_grid.refresh_row(self._editing_id)
+        else:
+            self.items_data.add(preview.item, preview.amounts)
+            self.item_grid.scroll_to_end()
+        self._editing_id = None
+        self._show_totals()
+
+        # Clear fields after adding
+        for key in self.item_entries:
+            self.item_entries[key].delete(0, tk.END)
+        self.item_entries["description"].focus()
+
+    def _schedule_item_preview(self):
+        """Re-checks the item form once typing pauses for PREVIEW_DELAY_MS."""
+        if self._preview_job is not None:
+            self.master.after_cancel(self._preview_job)
+        self._preview_job = self.master.after(PREVIEW_DELAY_MS, self._update_item_preview)
+
+    def _update_item_preview(self, submitting=False):
+        """Shows the typed item's amounts, or marks its invalid fields. Returns the ItemPreview.
+
+        While typing only invalid values are marked; on submit, blank
+        required fields are marked too.
+        """
+        if self._preview_job is not None:
+            self.master.after_cancel(self._preview_job)
+            self._preview_job = None
+        preview = preview_item(*(self.item_entries[key].get() for key in ITEM_ENTRY_KEYS))
+
+        marked = dict(preview.errors)
+        if submitting:
+            marked.update((field, "required") for field in preview.missing)
+        for field, key in zip(ITEM_FIELDS, ITEM_ENTRY_KEYS):
+            entry = self.item_entries[key]
+            style = f"Invalid.{entry.winfo_class()}" if field in marked else entry.winfo_class()
+            if str(entry.cget("style")) != style:
+                entry.configure(style=style)
+
+        if preview.valid:
+            subtotal, cgst, sgst, discount, total = preview.amounts
+            text = (f"Subtotal {rupees(subtotal):,.2f} + CGST {rupees(cgst):,.2f} + SGST {rupees(sgst):,.2f}"
+                    + (f" - Discount {rupees(discount):,.2f}" if discount else "")
+                    + f" = Line total {rupees(total):,.2f}")
+        elif marked:
+            text = "; ".join(f"{ITEM_FIELD_LABELS[field]}: {message}" for field, message in marked.items())
+        elif preview.blank:
+            text = ""
+        else:
+            text = "Still needed: " + ", ".join(ITEM_FIELD_LABELS[field] for field in preview.missing)
+        self.item_preview_var.set(text)
+        self.item_preview_label.configure(style="Invalid.TLabel" if marked else "TLabel")
+        return preview
+
+    def _complete_product(self, event, field):
+        """Offers catalog products matching the HSN code or description typed so far."""
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        widget = self.item_entries[field]
+        text = widget.get()
+        try:
+            products = PRODUCT_CATALOG.complete(field, text) if text.strip() else ()
+        except Exception as e:
+            self.status_var.set(f"Could not read product catalog '{PRODUCT_CATALOG.file_path}': {e}")
+            return
+        if field == "hsn":
+            labels = [f"{p.hsn} - {p.description}" for p in products]
+        else:
+            labels = [p.description for p in products]
+        self._product_choices = dict(zip(labels, products))
+        widget['values'] = labels
+
+    def _fill_from_product(self, event):
+        """Prefills the item fields from the catalog product picked in a dropdown."""
+        product = self._product_choices.get(event.widget.get())
+        if product is not None:
+            self._fill_item_entries(product)
+
+    def _prefill_known_product(self, event):
+        """Prefills rate and taxes when a typed description is an exact catalog match."""
+        if self.item_entries["rate"].get().strip():
+            return
+        try:
+            product = PRODUCT_CATALOG.find("description", self.item_entries["description"].get())
+        except Exception:
+            return
+        if product is not None:
+            self._fill_item_entries(product)
 
-            # Calculate amounts with new formula: Total = (Qty * Rate) + (CGST + SGST) - Discount
-            item_subtotal = quantity * rate
-            cgst_amount = (item_subtotal * cgst_percent) / 100.0
-            sgst_amount = (item_subtotal * sgst_percent) / 100.0
-            total_tax = cgst_amount + sgst_amount
-            discount_amount = (item_subtotal * discount_percent) / 100.0
-            total_with_tax = item_subtotal + total_tax - discount_amount
-
-            item = {
-                "hsn": hsn,
-                "description": description,
-                "quantity": quantity,
-                "rate": rate,
-                "discount_percent": discount_percent,
-                "discount_amount": discount_amount,
-                "cgst_percent": cgst_percent,
-                "sgst_percent": sgst_percent,
-                "cgst_amount": cgst_amount,
-                "sgst_amount": sgst_amount,
-                "total": item_subtotal,
-            }
-            self.items_data.append(item)
-
-            # Insert into Treeview
-            self.tree.insert("", "end", values=(
-                hsn,
-                description,
-                f"{quantity:.2f}",
-                f"{rate:.2f}",
-                f"{discount_percent:.2f}",
-                f"{cgst_amount:.2f}",
-                f"{sgst_amount:.2f}",
-                f"{total_with_tax:.2f}"
-            ))
-
-            # Clear fields after adding
-            for key in self.item_entries:
+    def _fill_item_entries(self, product):
+        for key, value in (("hsn", product.hsn), ("description", product.description), ("rate", product.rate),
+                           ("gst", product.cgst), ("sgst", product.sgst)):
+            if value or key in ("hsn", "description"):
                 self.item_entries[key].delete(0, tk.END)
-            self.item_entries["description"].focus()
+                self.item_entries[key].insert(0, value)
 
-        except ValueError:
-            messagebox.showerror("Input Error", "Quantity, Rate, Discount, CGST, and SGST must be valid numbers. Enter percentages like '18' or '18%'.")
+    def _edit_item(self):
+        """Loads the selected item into the entry fields; pressing Enter saves it back in place."""
+        selected_item = self.item_grid.selection()
+        if not selected_item:
+            messagebox.showwarning("Selection Error", "Please select an item to edit.")
+            return
+
+        item_id = selected_item[0]
+        item = self.items_data[item_id]
+        field_values = {
+            "hsn": item.hsn,
+            "description": item.description,
+            # The exact stored values, so saving the item unchanged keeps its amounts
+            "quantity": fixed_text(item.quantity_milli, QTY_SCALE),
+            "rate": fixed_text(item.rate_paise, PAISE_PER_RUPEE),
+            "discount": fixed_text(item.discount_bp, PERCENT_SCALE) if item.discount_bp else "",
+            "gst": fixed_text(item.cgst_bp, PERCENT_SCALE),
+            "sgst": fixed_text(item.sgst_bp, PERCENT_SCALE),
+        }
+        for key, entry in self.item_entries.items():
+            entry.delete(0, tk.END)
+            entry.insert(0, field_values[key])
+        self._editing_id = item_id
+        self.status_var.set("Editing item - change the fields and press Enter to save it.")
+        self.item_entries["description"].focus()
 
     def _remove_item(self):
-        """Removes the selected item from the Treeview and the items_data list."""
-        selected_item = self.tree.selection()
+        """Removes the selected items from the item list."""
+        selected_item = self.item_grid.selection()
         if not selected_item:
             messagebox.showwarning("Selection Error", "Please select an item to remove.")
             return
 
-        # Get the index of the selected item in the Treeview
-        item_id = selected_item[0]
-        item_index = self.tree.index(item_id)
-        
-        # Remove from the Python list
-        if 0 <= item_index < len(self.items_data):
-            self.items_data.pop(item_index)
-            
-        # Remove from the Treeview
-        self.tree.delete(item_id)
+        for item_id in selected_item:
+            self.items_data.remove(item_id)
+            if self._editing_id == item_id:
+                self._editing_id = None
+        self._show_totals()
+        self.item_grid.refresh()
+
+    def _import_items_file(self):
+        """Imports line items from a CSV file."""
+        path = filedialog.askopenfilename(title="Import Items",
+                                          filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            rows = read_item_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Import Error", f"Could not read '{path}'.\nError: {e}")
+            return
+        self._import_items(rows, os.path.basename(path))
+
+    def _paste_items(self):
+        """Imports line items from spreadsheet rows on the clipboard."""
+        try:
+            text = self.master.clipboard_get()
+        except tk.TclError:
+            messagebox.showwarning("Paste Items", "The clipboard is empty.")
+            return
+        self._import_items(read_item_rows(text), "the clipboard")
+
+    def _import_items(self, rows, source):
+        """Validates all rows first, reports every bad row at once, then adds the good ones in one pass."""
+        items, errors = build_items(rows)
+        if not items and not errors:
+            messagebox.showwarning("Import Items", f"No items found in {source}.")
+            return
+        if errors:
+            shown = "\n".join(f"Line {line_no}: {error}" for line_no, error in errors[:15])
+            if len(errors) > 15:
+                shown += f"\n... and {len(errors) - 15} more"
+            if not items:
+                messagebox.showerror("Import Error", f"No valid items in {source}:\n\n{shown}")
+                return
+            if not messagebox.askyesno("Import Items",
+                    f"{len(errors)} of {len(rows)} rows in {source} are invalid:\n\n{shown}\n\n"
+                    f"Import the other {len(items)} items?"):
+                return
+
+        self.items_data.extend(items)
+        self._show_totals()
+        self.item_grid.scroll_to_end()
+        self.status_var.set(f"Imported {len(items)} items from {source}")
+
+    def _show_totals(self):
+        """Shows the running invoice totals under the item list."""
+        totals = self.items_data.totals
+        self.totals_var.set(
+            f"Subtotal: {rupees(totals.subtotal):,.2f}    CGST: {rupees(totals.cgst):,.2f}    "
+            f"SGST: {rupees(totals.sgst):,.2f}    Discount: {rupees(totals.discount):,.2f}    "
+            f"GRAND TOTAL: {rupees(totals.total):,.2f}"
+        )
 
     ## ----------------- INVOICE GENERATION -----------------
     def _get_all_input_data(self):
@@ -380,7 +639,7 @@ class InvoiceGeneratorApp:
         }
         
         # 3. Items Data
-        items = self.items_data
+        items = list(self.items_data)
         
         # --- Basic Validation ---
         if not all(party_details.values()):
@@ -396,227 +655,228 @@ class InvoiceGeneratorApp:
             "items": items
         }, None
 
-    def _generate_invoice(self):
-        """Gathers data, validates, and calls the Excel generation function."""
-        data, error = self._get_all_input_data()
+    def _generate_invoice(self, output_format="xlsx"):
+        """Gathers data, validates, and calls the Excel (or PDF) generation function."""
+        with span("invoice.validate"):
+            data, error = self._get_all_input_data()
         
         if error:
             messagebox.showerror("Generation Error", error)
             return
+        if output_format == "pdf":
+            try:
+                check_printable(data["party"], data["invoice"], data["items"])
+            except ValueError as e:
+                messagebox.showerror("Generation Error", str(e))
+                return
+        if not self.customers_ready:
+            messagebox.showinfo("Please Wait", "Saved parties are still loading. Try again in a moment.")
+            return
             
-        try:
-            # Check if this is a new party and save it
-            party_name = data["party"]["name"]
-            is_new_party = self.party_var.get() == "(New Party)"
-            
-            if is_new_party and party_name:
-                # Generate customer key from name
-                customer_key = party_name.split()[0].upper().replace(".", "").replace(",", "")
-                
-                # Check if customer already exists
-                global SAVED_PARTIES
-                if customer_key not in SAVED_PARTIES:
-                    # Save to Excel
-                    if save_customer_to_excel(customer_key, data["party"]):
-                        # Reload customers
-                        SAVED_PARTIES = load_customers_from_excel()
-                        # Update dropdown values
-                        party_keys = ["(New Party)"] + list(SAVED_PARTIES.keys())
-                        self.party_dropdown['values'] = party_keys
-                        messagebox.showinfo("Customer Saved", 
-                            f"New customer '{party_name}' has been saved to the database.")
-            
-            # Call the Excel generation function
-            filename = self._generate_invoice_excel(data["party"], data["invoice"], data["items"])
-            messagebox.showinfo("Success!", f"Invoice successfully generated as:\n**{filename}**\n\nFile saved in the current directory.")
-            
-        except Exception as e:
-            messagebox.showerror("Critical Error", f"An error occurred during file generation: {e}")
+        # Check if this is a new party; it is saved along with the invoice
+        customer_key = None
+        party_name = data["party"]["name"]
+        if self._selected_party is None and party_name:
+            customer_key = customer_key_for(party_name)
+
+        # Write on a worker thread from a snapshot of the form, so the
+        # operator can carry on with the next invoice straight away.
+        data["format"] = output_format
+        data["submitted"] = time.perf_counter()
+        self.jobs.submit(self._write_invoice, SAVED_PARTIES, customer_key, data, self.items_data.calculation())
+        self._jobs_submitted += 1
+        self._show_job_progress()
+        if not self._polling_jobs:
+            self._polling_jobs = True
+            self.master.after(100, self._poll_jobs)
+
+    def _write_invoice(self, customers, customer_key, data, calculation):
+        """Saves a new customer and writes the invoice. Runs on a worker thread, so no widgets here."""
+        queued_ms = round((time.perf_counter() - data["submitted"]) * 1000, 3)
+        with span("invoice.write", format=data["format"], items=len(data["items"]), queued_ms=queued_ms) as write, \
+                profiled("invoice"):
+            saved_customer, customer_error = None, None
+            if customer_key is not None and customer_key not in customers:
+                with span("invoice.save_customer"):
+                    try:
+                        if customers.add(customer_key, data["party"]):
+                            saved_customer = (customer_key, data["party"])
+                    except Exception as e:
+                        customer_error = e
+
+            with span("invoice.render"):
+                filename, invoice_no, reused = self._generate_invoice_excel(data["party"], data["invoice"], data["items"],
+                                                                            calculation, data["format"])
+            write.set(reused=reused)
+
+            # The file is written by now, so a register failure is reported on its own
+            register_error = None
+            if not reused:
+                with span("invoice.register"):
+                    try:
+                        self._register.record(data["party"], dict(data["invoice"], invoice_no=invoice_no), data["items"],
+                                              filename)
+                    except Exception as e:
+                        register_error = e
+        return filename, reused, saved_customer, customer_error, register_error
+
+    def _next_invoice_no(self):
+        """Allocates the next invoice number. Runs on a worker thread; the counter is opened on first use."""
+        with self._invoice_numbers_lock:
+            if self._invoice_numbers is None:
+                # One number at a time, so closing the app never leaves a gap
+                self._invoice_numbers = InvoiceNumberAllocator(NUMBERS_DB, block_size=1)
+        return self._invoice_numbers.next_invoice_no()
+
+    def _poll_jobs(self):
+        """Reports finished invoice jobs on the Tk thread and keeps polling while any are pending."""
+        for job_id, result, error in self.jobs.poll():
+            self._jobs_finished += 1
+            if error is not None:
+                self.status_var.set(f"Invoice generation failed: {error}")
+                messagebox.showerror("Critical Error", f"An error occurred during file generation: {error}")
+                continue
+
+            filename, reused, saved_customer, customer_error, register_error = result
+            if customer_error is not None:
+                messagebox.showerror("Error Saving Customer", 
+                    f"Failed to save customer data to '{CUSTOMER_DB}'.\nError: {customer_error}")
+            if register_error is not None:
+                messagebox.showerror("Error Recording Invoice",
+                    f"The invoice was saved, but could not be recorded in '{REGISTER_DB}'.\nError: {register_error}")
+            if saved_customer:
+                # Make the new party searchable
+                self.party_index.add(*saved_customer)
+            self.status_var.set(f"Invoice saved: {filename}"
+                                + (" (same as an earlier invoice, reused)" if reused else "")
+                                + (" (new customer saved)" if saved_customer else ""))
+
+        if self.jobs.pending:
+            self._show_job_progress()
+            self.master.after(100, self._poll_jobs)
+        else:
+            self._polling_jobs = False
+            self._jobs_submitted = self._jobs_finished = 0
+
+    def _show_job_progress(self):
+        """Shows how many of the queued invoices have been written."""
+        self.status_var.set(f"Writing invoices... {self._jobs_finished} of {self._jobs_submitted} done")
+
+    def _show_timings(self):
+        """Opens (or raises) a window with the rolling latency of each timed phase."""
+        window = self._timings_window
+        if window is not None and window.winfo_exists():
+            window.lift()
+            return
+        window = self._timings_window = tk.Toplevel(self.master)
+        window.title("Timings")
+        window.geometry("720x360")
+        columns = ("count", "last_ms", "median_ms", "p95_ms", "max_ms")
+        tree = ttk.Treeview(window, columns=columns)
+        tree.heading("#0", text="Phase")
+        tree.column("#0", width=220)
+        for column, heading in zip(columns, ("Runs", "Last (ms)", "Median (ms)", "p95 (ms)", "Max (ms)")):
+            tree.heading(column, text=heading)
+            tree.column(column, width=90, anchor="e")
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        ttk.Label(window, text=f"Last {METRICS_WINDOW} runs of each phase. Full log: {METRICS_LOG}",
+                  anchor="w").pack(fill="x", padx=5, pady=(0, 5))
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for row in latency_summary():
+                tree.insert("", "end", text=row["span"], values=(
+                    row["count"], *(f"{row[column]:,.1f}" for column in columns[1:])))
+            window.after(TIMINGS_REFRESH_MS, refresh)
+
+        refresh()
+
+    def _new_invoice(self):
+        """Clears the buyer details and items to start the next invoice."""
+        self.party_var.set(NEW_PARTY)
+        self._selected_party = None
+        for entry in self.buyer_entries.values():
+            entry.delete(0, tk.END)
+        self.items_data = ItemList()
+        self.item_grid.items = self.items_data
+        self._editing_id = None
+        self._show_totals()
+        self.item_grid.refresh()
+
+    def _on_close(self):
+        """Closes the window; invoices still queued are finished before the process exits."""
+        if self.jobs.pending:
+            self.status_var.set("Finishing queued invoices...")
+        self.jobs.close()
+        self.master.destroy()
 
     ## ----------------- EXCEL GENERATION LOGIC -----------------
     
-    def _generate_invoice_excel(self, party_details, invoice_details, items):
-        """Generates the invoice in an Excel file (Adapted from previous script)."""
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Tax Invoice"
-
-        # --- Styles (Basic) ---
-        heading_font = Font(name='Calibri', size=16, bold=True)
-        header_font = Font(name='Calibri', size=11, bold=True)
-        border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                        top=Side(style='thin'), bottom=Side(style='thin'))
-        fill_header = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-
-        # --- Invoice Header (Your Company Details) ---
-        ws['A1'] = "Anant Enterprises"
-        ws['A1'].font = heading_font
-        ws['A2'] = "18/560, New industrial estate"
-        ws['A3'] = "Ichalkaranji Opp. ASC College, Kolhapur, Maharashtra, 416115"
-        ws['A4'] = "GSTIN: 27FQLPP6106G1ZK"
-
-        # --- Merge cells for logo ---
-        ws.merge_cells('E1:G1')
-        ws.merge_cells('E2:G2')
-        ws.merge_cells('E3:G3')
-
-        # --- Insert logo image ---
-        logo_path = os.path.join(os.getcwd(), "logo.jpg")
-        if os.path.exists(logo_path):
-            from openpyxl.drawing.image import Image as XLImage
-            img = XLImage(logo_path)
-            # Resize the image to fit the merged cells (approximate)
-            img.width = 250  # pixels
-            img.height = 80  # pixels
-            ws.add_image(img, 'E1')
-        
-        # --- Buyer Details ---
-        ws['A6'] = "BILL TO:"
-        ws['A6'].font = header_font
-        ws['A7'] = f"Party Name: {party_details['name']}"
-        ws['A8'] = f"GST No.: {party_details['gst']}"
-        ws['A9'] = f"Address: {party_details['address']}"
-        ws['A10'] = f"Phone: {party_details.get('phone', '')}"
-        ws['A11'] = f"Email: {party_details.get('email', '')}"
-        
-        # --- Date Details ---
-        ws['G6'] = "INVOICE DATE:"
-        ws['G6'].font = header_font
-        ws['H6'] = invoice_details['sale_date']
-        ws['G7'] = "DELIVERY DATE:"
-        ws['G7'].font = header_font
-        ws['H7'] = invoice_details['delivery_date']
-        
-        # --- Table Headers (Row 12) ---
-        headers = ["Sr.", "HSN/SAC Code", "Description of Goods", "Quantity", "Rate", "Subtotal", "Discount (%)", "CGST (%)", "SGST (%)", "Total (Incl. Tax)"]
-        col_start = 1
-        for i, header in enumerate(headers):
-            col = col_start + i
-            cell = ws.cell(row=13, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = fill_header
-            cell.border = border
-        
-        # --- Table Data ---
-        row = 14
-        total_invoice_amount = 0
-
-        for i, item in enumerate(items):
-            ws[f'A{row}'] = i + 1
-            cell = ws[f'A{row}']
-            cell.alignment = Alignment(horizontal='center', vertical='center') # Center align serial number
-            ws[f'B{row}'] = item['hsn']
-            # Apply center alignment and wrap text to HSN/SAC Code
-            hsn_cell = ws[f'B{row}']
-            hsn_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            ws[f'C{row}'] = item['description']
-            ws[f'D{row}'] = item['quantity']
-            cell = ws[f'C{row}']
-            cell.alignment = Alignment(horizontal='center', vertical='center') # Center align quantity
-            ws[f'E{row}'] = item['rate']
-            ws[f'F{row}'] = item['total']
-            # Display Discount as percentage with % symbol, or leave blank if no discount
-            if item['discount_percent'] > 0:
-                ws[f'G{row}'] = f"{item['discount_percent']:.2f}%"
-            # Display CGST and SGST as percentages with % symbol
-            ws[f'H{row}'] = f"{item['cgst_percent']:.2f}%"
-            ws[f'I{row}'] = f"{item['sgst_percent']:.2f}%"
-
-            # Set wrap text, center and middle alignment for description cell
-            desc_cell = ws[f'C{row}']
-            desc_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-            # Calculate total with discount and taxes: Total = (Qty * Rate) + (CGST + SGST) - Discount
-            total_with_tax = item['total'] + item['cgst_amount'] + item['sgst_amount'] - item['discount_amount']
-            ws[f'J{row}'] = total_with_tax
-
-            # Formatting and border
-            for col_idx in range(1, 11):
-                cell = ws.cell(row=row, column=col_idx)
-                cell.border = border
-                if col_idx >= 4:
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            total_invoice_amount += total_with_tax
-            row += 1
-
-        # --- Calculate Total GST ---
-        total_gst = sum(item['cgst_amount'] + item['sgst_amount'] for item in items)
-
-        # --- Summary & Totals ---
-        # Total GST row
-        ws[f'G{row + 1}'] = "Total GST:"
-        ws[f'G{row + 1}'].font = header_font
-        ws[f'H{row + 1}'] = total_gst
-        ws[f'H{row + 1}'].font = header_font
-        ws[f'H{row + 1}'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Total Discount row
-        total_discount = sum(item['discount_amount'] for item in items)
-        ws[f'G{row + 2}'] = "Total Discount:"
-        ws[f'G{row + 2}'].font = header_font
-        ws[f'H{row + 2}'] = total_discount
-        ws[f'H{row + 2}'].font = header_font
-        ws[f'H{row + 2}'].alignment = Alignment(horizontal='center', vertical='center')
-
-        # Total (Incl. Tax) row
-        ws[f'G{row + 3}'] = "TOTAL (Incl. Tax):"
-        ws[f'G{row + 3}'].font = header_font
-        ws[f'H{row + 3}'] = total_invoice_amount
-        ws[f'H{row + 3}'].font = header_font
-        ws[f'H{row + 3}'].alignment = Alignment(horizontal='center', vertical='center')
-
-        # --- Signature Section ---
-        signature_start_row = row + 1
-        ws[f'D{signature_start_row}'] = "For Anant Enterprises"
-        # ws[f'E{signature_start_row}'].alignment = Alignment(horizontal='center', vertical='center') 
-        ws[f'D{signature_start_row}'].font = header_font
-        
-        # Add Authority Signatory after some space
-        signatory_row = signature_start_row + 4
-        ws[f'D{signatory_row}'] = "Authority Signatory"
-        # desc_cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws[f'D{signatory_row}'].font = header_font
-
-        #Add Bank Details
-        bank_details_row = row + 1
-        ws[f'A{bank_details_row}'] = "Bank Details:"
-        ws[f'A{bank_details_row}'].font = header_font
-        ws[f'A{bank_details_row + 1}'] = "A/C: ANANT ENTERPRISES"
-        ws[f'A{bank_details_row + 2}'] = "A/C No.: 50200104022360"
-        ws[f'A{bank_details_row + 3}'] = "IFSC Code: HDFC0007957"
-        ws[f'A{bank_details_row + 4}'] = "Branch: Ichalkaranji"
-        
-        # --- Column Widths for readability ---
-        ws.column_dimensions['A'].width = 5
-        ws.column_dimensions['B'].width = 13
-        ws.column_dimensions['C'].width = 30
-        ws.column_dimensions['D'].width = 10
-        ws.column_dimensions['E'].width = 10
-        ws.column_dimensions['F'].width = 9
-        ws.column_dimensions['G'].width = 15
-        ws.column_dimensions['H'].width = 13
-        ws.column_dimensions['I'].width = 13
-        ws.column_dimensions['J'].width = 15
-
-        # --- Page Layout: Scale to Fit (1 page width) ---
-        ws.page_setup.paperSize = ws.PAPERSIZE_LETTER
-        ws.print_options.horizontalCentered = True
-        ws.page_setup.fitToPage = True
-        ws.page_setup.fitToHeight = 0
-        ws.page_setup.fitToWidth = 1
-
-        # --- Save the file ---
-        # Ensure the filename is safe and unique
-        party_name_safe = party_details['name'].split()[0].replace('.', '').upper()
-        filename = os.path.join(os.getcwd(), f"Invoice_{party_name_safe}_{date.today()}.xlsx")
-        wb.save(filename)
-        return filename
+    def _generate_invoice_excel(self, party_details, invoice_details, items, calculation=None, output_format="xlsx"):
+        """Generates the invoice in an Excel (or PDF) file (see invoice_engine). Returns (filename, invoice_no, reused).
+
+        An invoice identical to one generated before is not rebuilt: the
+        earlier file, with its invoice number, is reused (see render_cache).
+        A PDF of an invoice already saved as Excel gets the same number.
+        """
+        with self._invoice_numbers_lock:
+            if self._render_cache is None:
+                self._render_cache = RenderCache(RENDER_CACHE_DIR)
+                self._register = InvoiceRegister(REGISTER_DB)
+        return generate_invoice_cached(self._render_cache, party_details, invoice_details, items,
+                                       self._next_invoice_no, output_format=output_format,
+                                       calculation=calculation)
+
+# --- Startup Timing ---
+def _report_startup_timings(root, app):
+    """Prints how long the window and the customer list took to appear, then exits."""
+    def elapsed_ms():
+        return (time.perf_counter() - _STARTUP_T0) * 1000
+
+    def window_ready():
+        root.update_idletasks()
+        print(f"window_ready_ms {elapsed_ms():.1f}", flush=True)
+        wait_for_customers()
+
+    def wait_for_customers():
+        if not app.customers_ready:
+            root.after(5, wait_for_customers)
+            return
+        print(f"customers_ready_ms {elapsed_ms():.1f}", flush=True)
+        root.destroy()
+
+    root.after_idle(window_ready)
 
 # --- Main Tkinter Loop ---
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tax Invoice Generator")
+    parser.add_argument("--eager", action="store_true",
+                        help="load openpyxl and all customers before showing the window")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="print startup timings (ms since launch) and exit")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"time each phase of invoice generation into {METRICS_FILE} (see the Timings button)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"save a cProfile of every invoice written into {PROFILE_DIR}/")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        enable_metrics(METRICS_LOG)
+    if args.profile:
+        enable_profiling(PROFILES_DIR)
+
+    global SAVED_PARTIES
+    if args.eager:
+        import openpyxl  # noqa: F401
+        SAVED_PARTIES = open_saved_parties()
+
     root = tk.Tk()
-    app = InvoiceGeneratorApp(root)
+    app = InvoiceGeneratorApp(root, background_load=not args.eager)
+    if args.measure_startup:
+        _report_startup_timings(root, app)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
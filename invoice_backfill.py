@@ -0,0 +1,167 @@
+"""Back-fills the invoice register from existing Invoice_*.xlsx workbooks.
+
+Invoices generated before the register existed are only on disk. This tool
+finds every Invoice_*.xlsx under the given files and folders and reads the
+party, dates, items and totals back out of the invoice layout (buyer and
+dates above the table headings on row 13, items from row 14, totals in
+column H). Workbooks are opened in openpyxl's read_only mode and parsed
+across a process pool, and the results are written to invoice_register.db
+by the main process.
+
+The mtime and size of each file are kept in the register's source_files
+table, so a re-run only reads new and changed files. Files that cannot be
+read are recorded with their error and reported again once they change.
+Line amounts are recalculated from the items, and the total printed on
+each invoice is kept alongside (source_files.file_total) for checking.
+
+Usage:
+    python invoice_backfill.py "Generated Invoices" --register invoice_register.db --workers 8
+"""
+import argparse
+import fnmatch
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from invoice_engine import build_item_from_row
+from invoice_template import FIRST_ITEM_ROW, ITEM_HEADERS
+from invoice_register import REGISTER_FILE, InvoiceRegister
+from line_items import PAISE_PER_RUPEE, to_fixed
+
+INVOICE_FILE_PATTERN = "Invoice_*.xlsx"
+
+# Labels written by the invoice template: column A for the buyer, G for dates and totals
+PARTY_LABELS = {"Party Name:": "name", "GST No.:": "gst", "Address:": "address", "Phone:": "phone", "Email:": "email"}
+DETAIL_LABELS = {"INVOICE DATE:": "sale_date", "DELIVERY DATE:": "delivery_date", "INVOICE NO.:": "invoice_no"}
+TOTAL_LABEL = "TOTAL (Incl. Tax):"
+
+
+def find_invoice_files(paths):
+    """Yields the absolute path of every Invoice_*.xlsx in paths (files or folders, searched recursively)."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+            continue
+        for folder, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]  # e.g. .invoice_cache
+            for name in fnmatch.filter(files, INVOICE_FILE_PATTERN):
+                yield os.path.abspath(os.path.join(folder, name))
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d-%m-%Y")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_invoice_workbook(path):
+    """Reads an invoice workbook. Returns (party_details, invoice_details, items, file_total).
+
+    file_total is the printed grand total in paise (None if missing).
+    Raises ValueError if the file does not have the invoice layout.
+    """
+    import openpyxl
+
+    party_details = dict.fromkeys(PARTY_LABELS.values(), "")
+    invoice_details = {"sale_date": "", "delivery_date": ""}
+    items, file_total = [], None
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(max_col=len(ITEM_HEADERS), values_only=True)
+        for row_no, row in enumerate(rows, start=1):
+            row = tuple(row) + (None,) * (len(ITEM_HEADERS) - len(row))
+            if row_no < FIRST_ITEM_ROW - 1:
+                # --- Buyer & date details ---
+                text = _text(row[0])
+                for label, field in PARTY_LABELS.items():
+                    if text.startswith(label):
+                        party_details[field] = text[len(label):].strip()
+                field = DETAIL_LABELS.get(_text(row[6]))
+                if field:
+                    invoice_details[field] = _text(row[7])
+            elif row_no == FIRST_ITEM_ROW - 1:
+                if _text(row[0]) != ITEM_HEADERS[0] or _text(row[2]) != ITEM_HEADERS[2]:
+                    raise ValueError(f"no item table headings on row {row_no}")
+            elif isinstance(row[0], (int, float)) and file_total is None:
+                # --- Item rows: Sr., HSN, Description, Quantity, Rate, Subtotal, Discount, CGST, SGST, Total ---
+                items.append(build_item_from_row({
+                    "hsn": _text(row[1]), "description": _text(row[2]), "quantity": row[3], "rate": row[4],
+                    "discount": _text(row[6]), "cgst": _text(row[7]), "sgst": _text(row[8]),
+                }))
+            elif _text(row[6]) == TOTAL_LABEL:
+                file_total = to_fixed(row[7], PAISE_PER_RUPEE)
+                break
+    finally:
+        wb.close()
+
+    if not party_details["name"]:
+        raise ValueError("no party name")
+    if not items:
+        raise ValueError("no items")
+    return party_details, invoice_details, items, file_total
+
+
+def read_invoice_file(job):
+    """Reads one workbook. Runs in a worker process; returns (path, signature, invoice, error)."""
+    path, signature = job
+    try:
+        return path, signature, read_invoice_workbook(path), None
+    except Exception as e:
+        return path, signature, None, f"{type(e).__name__}: {e}"
+
+
+def backfill(paths, register, workers=None, chunksize=8):
+    """Indexes new and changed invoice workbooks into register.
+
+    Yields (path, error) for each file read; files unchanged since the last
+    run are skipped.
+    """
+    known = register.source_signatures()
+    jobs = []
+    for path in find_invoice_files(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if known.get(path) != signature:
+            jobs.append((path, signature))
+    if not jobs:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, signature, invoice, error in executor.map(read_invoice_file, jobs, chunksize=chunksize):
+            register.record_file(path, signature, invoice, error)
+            yield path, error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index existing invoice workbooks into the invoice register.")
+    parser.add_argument("paths", nargs="*", help="invoice files or folders to search (default: current directory)")
+    parser.add_argument("--register", default=REGISTER_FILE, help="register to load into (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="reader processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=8, help="files handed to a worker at a time")
+    args = parser.parse_args(argv)
+
+    register = InvoiceRegister(args.register)
+    read = failed = 0
+    try:
+        for path, error in backfill(args.paths or [os.getcwd()], register, args.workers, args.chunksize):
+            read += 1
+            if error:
+                failed += 1
+                print(f"FAIL {path}: {error}")
+    finally:
+        register.close()
+    print(f"\n{read - failed} indexed, {failed} failed ({read} new or changed files)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""Headless batch invoice generation.
+
+Renders many invoices in parallel from a CSV or JSONL file of invoice specs,
+without creating a Tk root.
+
+JSONL: one invoice per line, e.g.
+    {"invoice": "A-1", "party_key": "ALPHA", "sale_date": "01-04-2025",
+     "delivery_date": "02-04-2025", "items": [{"hsn": "8541", "description": "Panel",
+     "quantity": 2, "rate": 1500, "discount": 5, "cgst": 9, "sgst": 9}]}
+  A spec may carry an inline "party" dict instead of (or as well as) "party_key".
+
+CSV: one line item per row with the columns
+    invoice, party_key, sale_date, delivery_date, hsn, description,
+    quantity, rate, discount, cgst, sgst
+  Consecutive rows with the same "invoice" value (or, if that column is blank,
+  the same party/dates) make up one invoice.
+
+Invoices are numbered from invoice_numbers.db (see invoice_numbers.py), which
+may be shared with the desktop app and other batch runs; a spec or CSV row
+can set "invoice_no" to use its own number instead. The numbers are taken
+in one block before rendering starts and given out in sale-date order, so a
+run's invoices get consecutive numbers.
+
+--format pdf writes PDF invoices instead of Excel files (see invoice_pdf.py).
+
+Rendered invoices go into the render cache (see render_cache.py) in the
+output folder: running the same specs again reuses the files and their
+numbers, and a --format pdf run after an Excel run gives each invoice the
+number it already has instead of a new one.
+
+With --archive day|month, the invoices of each day or month are written as
+sheets of one workbook (Invoices_2025-04.xlsx), after an index sheet that
+links to each of them. A period whose workbook already exists gets a new
+one (Invoices_2025-04_2.xlsx) rather than overwriting it.
+
+Usage:
+    python invoice_batch.py specs.jsonl --workers 8 --output-dir out
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from customer_store import open_customer_repository
+from invoice_engine import (ITEM_FIELDS, RENDERERS, archive_filename, build_item_from_row, generate_invoice,
+                            generate_invoice_archive, invoice_filename)
+from invoice_numbers import NUMBERS_FILE, InvoiceNumberAllocator
+from invoice_pdf import check_printable
+from invoice_register import REGISTER_FILE, InvoiceRegister, parse_invoice_date, period_of
+from render_cache import CACHE_DIR, RenderCache, invoice_cache_key, known_invoice_no
+
+# --archive choices: how the sale date names the workbook an invoice goes into
+ARCHIVE_PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+# --- Reading Invoice Specs ---
+def read_specs(path):
+    """Reads invoice specs from a .csv or .jsonl file."""
+    if path.lower().endswith(".csv"):
+        return _read_csv_specs(path)
+    return _read_jsonl_specs(path)
+
+
+def _read_jsonl_specs(path):
+    specs = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            spec = json.loads(line)
+            spec.setdefault("invoice", str(line_no))
+            specs.append(spec)
+    return specs
+
+
+def _read_csv_specs(path):
+    specs = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row_no, row in enumerate(csv.DictReader(f), start=2):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            group = row.get("invoice") or (row.get("party_key"), row.get("sale_date"), row.get("delivery_date"))
+            if not specs or specs[-1]["_group"] != group:
+                specs.append({
+                    "_group": group,
+                    "invoice": row.get("invoice") or f"row{row_no}",
+                    "party_key": row.get("party_key", ""),
+                    "sale_date": row.get("sale_date", ""),
+                    "delivery_date": row.get("delivery_date", ""),
+                    "invoice_no": row.get("invoice_no", ""),
+                    "items": [],
+                })
+            specs[-1]["items"].append({field: row.get(field, "") for field in ITEM_FIELDS})
+    for spec in specs:
+        del spec["_group"]
+    return specs
+
+
+def resolve_spec(spec, customers):
+    """Turns a raw spec into (invoice_id, party, invoice_details, raw_items)."""
+    party = dict(customers.get(spec.get("party_key"), {}))
+    party.update(spec.get("party") or {})
+    if not party.get("name"):
+        raise ValueError(f"Unknown party key '{spec.get('party_key')}'")
+
+    # Dates are normalised to the app's DD-MM-YYYY, whichever accepted format the spec uses
+    sale_date = parse_invoice_date(spec["sale_date"]) if spec.get("sale_date") else date.today()
+    delivery_date = parse_invoice_date(spec["delivery_date"]) if spec.get("delivery_date") else sale_date
+    invoice_details = {
+        "sale_date": sale_date.strftime('%d-%m-%Y'),
+        "delivery_date": delivery_date.strftime('%d-%m-%Y'),
+    }
+    if spec.get("invoice_no"):
+        invoice_details["invoice_no"] = str(spec["invoice_no"])
+    return str(spec["invoice"]), party, invoice_details, spec.get("items") or []
+
+
+# --- Worker ---
+# Per-process connections, opened on first use: numbers file -> allocator, register file -> register,
+# cache directory -> render cache
+_allocators = {}
+_registers = {}
+_caches = {}
+
+
+def _allocator(numbers_path):
+    if numbers_path not in _allocators:
+        _allocators[numbers_path] = InvoiceNumberAllocator(numbers_path)
+    return _allocators[numbers_path]
+
+
+def _register(register_path):
+    if register_path not in _registers:
+        _registers[register_path] = InvoiceRegister(register_path)
+    return _registers[register_path]
+
+
+def _cache(cache_dir):
+    if cache_dir not in _caches:
+        _caches[cache_dir] = RenderCache(cache_dir)
+    return _caches[cache_dir]
+
+
+def _build_items(raw_items):
+    items = [build_item_from_row(raw) for raw in raw_items]
+    if not items:
+        raise ValueError("At least one item must be added to the invoice.")
+    return items
+
+
+def _check_job(party, invoice_details, raw_items, output_format):
+    """Builds the items, raising ValueError for an invoice that cannot be rendered, before it is numbered."""
+    items = _build_items(raw_items)
+    if output_format == "pdf":
+        check_printable(party, invoice_details, items)
+    return items
+
+
+def _number(invoice_details, options):
+    """Gives the invoice the number run_batch set aside for it (or the next number) unless it has one."""
+    if not invoice_details.get("invoice_no"):
+        if options.get("invoice_no"):
+            invoice_details = dict(invoice_details, invoice_no=options["invoice_no"])
+        elif options.get("numbers_path"):
+            invoice_details = dict(invoice_details, invoice_no=_allocator(options["numbers_path"]).next_invoice_no())
+    return invoice_details
+
+
+def _prepare(invoice_details, raw_items, options):
+    """Builds the items and numbers the invoice. Returns (invoice_details, items)."""
+    items = _build_items(raw_items)
+    return _number(invoice_details, options), items
+
+
+def _error(e):
+    return f"{type(e).__name__}: {e}"
+
+
+def render_job(job):
+    """Builds the items and renders one invoice. Runs in a worker process.
+
+    job is (invoice_id, party, invoice_details, raw_items, options); options
+    holds output_dir, output_format (default xlsx) and streaming, plus
+    invoice_no (the number set aside for it) or numbers_path to number the
+    invoice, register_path to record it and cache_dir for the render cache
+    (any may be None).
+    """
+    invoice_id, party, invoice_details, raw_items, options = job
+    try:
+        output_format = options.get("output_format") or "xlsx"
+        items = _check_job(party, invoice_details, raw_items, output_format)
+        cache = key = None
+        if options.get("cache_dir"):
+            cache = _cache(options["cache_dir"])
+            key = invoice_cache_key(party, invoice_details, items, output_format=output_format)
+            entry = cache.get(key)
+            if entry is not None:
+                try:
+                    return invoice_id, cache.restore(key, entry, options["output_dir"]), None
+                except OSError:
+                    pass  # Evicted meanwhile: render it again
+            if not invoice_details.get("invoice_no"):
+                # Rendered before in another format: keep its number (and its single register entry)
+                invoice_no = known_invoice_no(cache, party, invoice_details, items, output_format=output_format)
+                if invoice_no:
+                    invoice_details = dict(invoice_details, invoice_no=invoice_no)
+        invoice_details = _number(invoice_details, options)
+        filename = invoice_filename(party, parse_invoice_date(invoice_details['sale_date']).isoformat(),
+                                    invoice_details.get('invoice_no'), output_format)
+        render_options = {"streaming": options.get("streaming")} if output_format == "xlsx" else {}
+        path = generate_invoice(party, invoice_details, items, output_format, output_dir=options["output_dir"],
+                                filename=filename, **render_options)
+        if options.get("register_path"):
+            _register(options["register_path"]).record(party, invoice_details, items, path)
+        if key is not None:
+            cache.put(key, path, invoice_details["invoice_no"])
+        return invoice_id, path, None
+    except Exception as e:
+        return invoice_id, None, _error(e)
+
+
+def _claim_archive_path(output_dir, period):
+    """Claims a free workbook name for period by creating it empty; the render then replaces it."""
+    name, ext = os.path.splitext(archive_filename(period))
+    for copy in itertools.count(1):
+        path = os.path.join(output_dir, name + (f"_{copy}" if copy > 1 else "") + ext)
+        try:
+            with open(path, "x"):
+                return path
+        except FileExistsError:
+            continue
+
+
+def archive_job(job):
+    """Renders a day's or month's invoices into one workbook. Runs in a worker process.
+
+    job is (period, [(invoice_id, party, invoice_details, raw_items), ...], options)
+    with options as for render_job. Returns a list of (invoice_id, path, error).
+    """
+    period, invoices, options = job
+    results, ready = [], []
+    for invoice_id, party, invoice_details, raw_items in invoices:
+        try:
+            ready.append((invoice_id, party) + _prepare(invoice_details, raw_items, options))
+        except Exception as e:
+            results.append((invoice_id, None, _error(e)))
+    if not ready:
+        return results
+
+    path = None
+    try:
+        path = _claim_archive_path(options["output_dir"], period)
+        generate_invoice_archive([(party, invoice_details, items) for _, party, invoice_details, items in ready], path)
+    except Exception as e:
+        if path and os.path.exists(path) and os.path.getsize(path) == 0:
+            os.remove(path)
+        return results + [(invoice_id, None, _error(e)) for invoice_id, *_ in ready]
+
+    for invoice_id, party, invoice_details, items in ready:
+        try:
+            if options.get("register_path"):
+                _register(options["register_path"]).record(party, invoice_details, items, path)
+            results.append((invoice_id, path, None))
+        except Exception as e:
+            results.append((invoice_id, None, _error(e)))
+    return results
+
+
+def _set_aside_numbers(jobs, numbers_path, cache_dir, output_format):
+    """Reserves one number per job that needs a new one, in job order, and puts it in the job's options.
+
+    Jobs with their own invoice_no, jobs whose invoice the render cache
+    already holds (in any format) and jobs that cannot be rendered (the
+    worker reports those) get none.
+    """
+    cache = RenderCache(cache_dir) if cache_dir else None
+    pending = []
+    for index, (invoice_id, party, invoice_details, raw_items, options) in enumerate(jobs):
+        if invoice_details.get("invoice_no"):
+            continue
+        try:
+            items = _check_job(party, invoice_details, raw_items, output_format)
+        except Exception:
+            continue
+        if cache is not None and (
+                cache.get(invoice_cache_key(party, invoice_details, items, output_format=output_format)) is not None
+                or known_invoice_no(cache, party, invoice_details, items, output_format=output_format)):
+            continue
+        pending.append(index)
+    if not pending:
+        return
+    allocator = InvoiceNumberAllocator(numbers_path, block_size=len(pending))
+    try:
+        for index in pending:
+            invoice_id, party, invoice_details, raw_items, options = jobs[index]
+            jobs[index] = (invoice_id, party, invoice_details, raw_items,
+                           dict(options, invoice_no=allocator.next_invoice_no()))
+    finally:
+        allocator.close()
+
+
+def run_batch(specs, customers, output_dir, workers=None, chunksize=1, streaming=None,
+              numbers_path=NUMBERS_FILE, register_path=REGISTER_FILE, archive=None,
+              output_format="xlsx", cache_dir=None):
+    """Renders all specs over a process pool and yields (invoice_id, path, error).
+
+    Invoices without an "invoice_no" are numbered from numbers_path,
+    consecutively in sale-date order (see _set_aside_numbers). Every invoice is
+    recorded in the register at register_path (None to skip). With
+    cache_dir, invoices rendered before (in any format) keep their numbers
+    and are not rendered again in the same format. archive
+    ("day" or "month", see ARCHIVE_PERIODS) writes each period's invoices
+    into one workbook, one period per job (xlsx only).
+    """
+    options = {
+        "output_dir": output_dir,
+        "output_format": output_format,
+        "streaming": streaming,
+        "numbers_path": os.path.abspath(numbers_path) if numbers_path else None,
+        "register_path": os.path.abspath(register_path) if register_path else None,
+        "cache_dir": os.path.abspath(cache_dir) if cache_dir else None,
+    }
+    jobs = []
+    for spec in specs:
+        try:
+            invoice_id, party, invoice_details, raw_items = resolve_spec(spec, customers)
+        except Exception as e:
+            yield str(spec.get("invoice")), None, f"{type(e).__name__}: {e}"
+            continue
+        jobs.append((invoice_id, party, invoice_details, raw_items, options))
+    jobs.sort(key=lambda job: parse_invoice_date(job[2]["sale_date"]))
+    if numbers_path:
+        _set_aside_numbers(jobs, options["numbers_path"], None if archive else options["cache_dir"], output_format)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if not archive:
+            yield from executor.map(render_job, jobs, chunksize=chunksize)
+            return
+        periods = {}
+        for invoice_id, party, invoice_details, raw_items, job_options in jobs:
+            period = period_of(invoice_details["sale_date"], ARCHIVE_PERIODS[archive])
+            periods.setdefault(period, []).append((invoice_id, party, _number(invoice_details, job_options), raw_items))
+        for results in executor.map(archive_job, [(period, group, options) for period, group in periods.items()]):
+            yield from results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render invoices in parallel from a CSV/JSONL spec file.")
+    parser.add_argument("specs", help="CSV or JSONL file of invoice specs")
+    parser.add_argument("--customers", default="customer_data.xlsx", help="customer database, .xlsx or .db (default: %(default)s)")
+    parser.add_argument("--output-dir", default=os.getcwd(), help="where to write invoices (default: current directory)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=1, help="specs handed to a worker at a time")
+    parser.add_argument("--streaming", action="store_true", default=None,
+                        help="always use the write-only renderer (default: only for large invoices)")
+    parser.add_argument("--numbers", default=NUMBERS_FILE, help="invoice number counter file (default: %(default)s)")
+    parser.add_argument("--register", default=REGISTER_FILE, help="invoice register to record into (default: %(default)s)")
+    parser.add_argument("--archive", choices=sorted(ARCHIVE_PERIODS),
+                        help="write each day's or month's invoices as sheets of one workbook")
+    parser.add_argument("--format", dest="output_format", choices=sorted(RENDERERS), default="xlsx",
+                        help="invoice file format (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"always render and number afresh, without the render cache ({CACHE_DIR} in the output folder)")
+    args = parser.parse_args(argv)
+    if args.archive and args.output_format != "xlsx":
+        parser.error("--archive writes Excel workbooks; it cannot be combined with --format " + args.output_format)
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    specs = read_specs(args.specs)
+    customers = open_customer_repository(args.customers)
+
+    succeeded = failed = 0
+    for invoice_id, path, error in run_batch(specs, customers, output_dir, args.workers, args.chunksize, args.streaming,
+                                            args.numbers, args.register, args.archive,
+                                            args.output_format,
+                                            None if args.no_cache else os.path.join(output_dir, CACHE_DIR)):
+        if error:
+            failed += 1
+            print(f"FAIL {invoice_id}: {error}")
+        else:
+            succeeded += 1
+            print(f"OK   {invoice_id}: {path}")
+
+    customers.close()
+    print(f"\n{succeeded} succeeded, {failed} failed ({len(specs)} invoices)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
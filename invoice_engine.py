@@ -0,0 +1,355 @@
+from datetime import date
+import os
+import re
+
+from file_utils import write_atomic
+from invoice_metrics import span
+from invoice_template import (FIRST_ITEM_ROW, ITEM_ROW_STYLES, STYLE_TABLE_HEADER, get_template,
+                              save_workbook)
+from line_items import PAISE_PER_RUPEE, PERCENT_SCALE, QTY_SCALE, InvoiceTotals, LineItem, calculate, rupees, to_fixed
+
+# --- Invoice Calculation & Excel Rendering (no GUI) ---
+# Everything in this module is safe to use without a Tk root, so it can be
+# shared by the desktop app, the batch CLI and worker processes. openpyxl is
+# imported on first render so that importing this module stays cheap.
+
+
+class InvalidItemError(ValueError):
+    """Raised when a line item parses but fails validation."""
+
+
+def parse_percent(value):
+    """Parses a percentage like '18' or '18%' into hundredths of a percent. Blank means 0."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = value.strip().rstrip('%')
+        if not value:
+            return 0
+    return to_fixed(value, PERCENT_SCALE)
+
+
+def build_item(hsn, description, quantity, rate, discount_percent=0.0, cgst_percent=0.0, sgst_percent=0.0):
+    """Validates a line item and returns it as a fixed-point LineItem."""
+    hsn = str(hsn or "").strip()
+    description = str(description or "").strip()
+    quantity_milli = to_fixed(quantity, QTY_SCALE)
+    rate_paise = to_fixed(rate, PAISE_PER_RUPEE)
+    discount_bp = parse_percent(discount_percent)
+    cgst_bp = parse_percent(cgst_percent)
+    sgst_bp = parse_percent(sgst_percent)
+
+    if not description or quantity_milli <= 0 or rate_paise <= 0 or discount_bp < 0 or cgst_bp < 0 or sgst_bp < 0:
+        raise InvalidItemError("All fields must be filled, and Quantity/Rate/Discount/CGST/SGST must be valid positive numbers.")
+
+    return LineItem(hsn, description, quantity_milli, rate_paise, discount_bp, cgst_bp, sgst_bp)
+
+
+# Field names for a line item given as a dict (batch specs, CSV imports)
+ITEM_FIELDS = ("hsn", "description", "quantity", "rate", "discount", "cgst", "sgst")
+
+
+def build_item_from_row(raw):
+    """Builds a LineItem from a dict keyed by ITEM_FIELDS ('gst' is accepted for cgst)."""
+    return build_item(
+        raw.get("hsn", ""),
+        raw.get("description", ""),
+        raw.get("quantity"),
+        raw.get("rate"),
+        raw.get("discount", ""),
+        raw.get("cgst", raw.get("gst", "")),
+        raw.get("sgst", ""),
+    )
+
+
+# --- Customer Data ---
+def customer_key_for(party_name):
+    """Generates the customer key used in customer_data.xlsx from a party name."""
+    return party_name.split()[0].upper().replace(".", "").replace(",", "")
+
+
+# Invoices with at least this many items are rendered with the streaming writer
+STREAMING_THRESHOLD = 500
+
+
+# --- Invoice Generation ---
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+
+
+def _filename_part(text):
+    """Keeps letters, digits, '_', '.' and '-' (anything else becomes '-'), so no part can leave the folder."""
+    part = _UNSAFE_FILENAME_CHARS.sub("-", str(text))
+    while ".." in part:
+        part = part.replace("..", ".")
+    return part.strip(".") or "-"
+
+
+def invoice_filename(party_details, suffix=None, invoice_no=None, output_format="xlsx"):
+    """Returns the default invoice file name for a party (unique per invoice number)."""
+    first_word = (str(party_details['name']).split() or ["INVOICE"])[0]
+    name = f"Invoice_{_filename_part(first_word.replace('.', '').upper())}_{_filename_part(suffix or date.today())}"
+    if invoice_no:
+        name += f"_{_filename_part(invoice_no)}"
+    return f"{name}.{output_format}"
+
+
+def default_logo_path():
+    return os.path.join(os.getcwd(), "logo.jpg")
+
+
+def generate_invoice(party_details, invoice_details, items, output_format="xlsx", output_dir=None, filename=None,
+                     logo_path=None, calculation=None, **options):
+    """Renders the invoice with the renderer for output_format (see RENDERERS) and returns its full path.
+
+    calculation is a line_items.Calculation already made for these items
+    (the app's ItemList.calculation()); without it the items are calculated
+    while rendering.
+    Other options go to the renderer, e.g. streaming for xlsx.
+
+    The file is written under a temporary name and renamed into place, so
+    other processes never see a half-written invoice.
+    """
+    try:
+        render = RENDERERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown invoice format '{output_format}'") from None
+    if filename is None:
+        filename = invoice_filename(party_details, invoice_no=invoice_details.get('invoice_no'), output_format=output_format)
+    path = os.path.join(output_dir or os.getcwd(), filename)
+    with span("render.template"):
+        template = get_template(logo_path or default_logo_path())
+    render(template, party_details, invoice_details, items, path, calculation, **options)
+    return path
+
+
+def generate_invoice_excel(party_details, invoice_details, items, output_dir=None, filename=None, logo_path=None, streaming=None,
+                           calculation=None):
+    """Generates the invoice Excel file and returns its full path.
+
+    streaming=None picks the write-only renderer for invoices with
+    STREAMING_THRESHOLD or more items (or when items is not a sized
+    sequence); True/False forces one renderer or the other.
+    """
+    return generate_invoice(party_details, invoice_details, items, "xlsx", output_dir, filename, logo_path, calculation,
+                            streaming=streaming)
+
+
+def _render_xlsx(template, party_details, invoice_details, items, path, calculation=None, streaming=None):
+    if streaming is None:
+        streaming = not hasattr(items, '__len__') or len(items) >= STREAMING_THRESHOLD
+    if streaming:
+        _render_streaming(template, party_details, invoice_details, items, path, calculation)
+    else:
+        _render_standard(template, party_details, invoice_details, items, path, calculation)
+
+
+def _render_pdf(template, party_details, invoice_details, items, path, calculation=None):
+    from invoice_pdf import render_invoice_pdf
+    with span("render.pdf"):
+        render_invoice_pdf(template, party_details, invoice_details, items, path, calculation)
+
+
+# Renderers by output format (the file extension). Each is called as
+# render(template, party_details, invoice_details, items, path, calculation, **options)
+# and writes the invoice to path, e.g. with write_atomic.
+RENDERERS = {
+    "xlsx": _render_xlsx,
+    "pdf": _render_pdf,
+}
+
+
+def _save_atomic(wb, path):
+    """Saves the workbook to a temporary file beside path, then renames it over path."""
+    write_atomic(path, lambda temp_path: save_workbook(wb, temp_path))
+
+
+# Items are calculated in chunks so that generators stay streamed
+CALCULATION_CHUNK = 4096
+
+
+def _chunks(items):
+    if isinstance(items, (list, tuple)):
+        for start in range(0, len(items), CALCULATION_CHUNK):
+            yield items[start:start + CALCULATION_CHUNK]
+        return
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == CALCULATION_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def item_rows(items, totals, calculation=None):
+    """Yields the ten cell values of each item row, adding the amounts to totals.
+
+    Shared by every renderer, so all formats show the same values. Uses
+    calculation for the amounts if given, else calculates the items in chunks.
+    """
+    if calculation is not None:
+        batches = [(items, calculation)]
+    else:
+        batches = ((chunk, calculate(chunk)) for chunk in _chunks(items))
+    index = 0
+    for chunk, chunk_calculation in batches:
+        totals += chunk_calculation.totals
+        for item, subtotal, total in zip(chunk, chunk_calculation.subtotal, chunk_calculation.total):
+            index += 1
+            yield (
+                index,
+                item.hsn,
+                item.description,
+                item.quantity,
+                item.rate,
+                rupees(subtotal),
+                # Discount is shown as a percentage, or left blank if there is none
+                f"{item.discount_percent:.2f}%" if item.discount_bp > 0 else None,
+                f"{item.cgst_percent:.2f}%",
+                f"{item.sgst_percent:.2f}%",
+                rupees(total),
+            )
+
+
+def footer_fields(totals):
+    """Returns the template's footer fields (GST, discount and invoice totals) for the summed totals."""
+    return {
+        "total_gst": rupees(totals.gst),
+        "total_discount": rupees(totals.discount),
+        "total_invoice_amount": rupees(totals.total),
+    }
+
+
+def _render_standard(template, party_details, invoice_details, items, path, calculation=None):
+    """Renders the invoice into a regular in-memory workbook."""
+    with span("render.layout"):  # Styles, logo and page setup
+        wb, ws = template.new_workbook()
+
+    def stamp(rows, first_row):
+        for row_idx, row in enumerate(rows, start=first_row):
+            for col_idx, spec in enumerate(row, start=1):
+                if spec is not None:
+                    cell = ws.cell(row=row_idx, column=col_idx, value=spec[0])
+                    if spec[1] is not None:
+                        cell.style = spec[1]
+
+    with span("render.cells", writer="standard") as cells:
+        # --- Header, buyer & date details, table headers (rows 1-13) ---
+        stamp(template.resolve_rows(template.header_rows, template.header_fields(party_details, invoice_details)), 1)
+
+        # --- Table Data ---
+        totals = InvoiceTotals()
+        row_idx = FIRST_ITEM_ROW
+        for values in item_rows(items, totals, calculation):
+            for col_idx, (value, style) in enumerate(zip(values, ITEM_ROW_STYLES), start=1):
+                ws.cell(row=row_idx, column=col_idx, value=value).style = style
+            row_idx += 1
+        cells.set(items=row_idx - FIRST_ITEM_ROW)
+
+        # --- Summary, Signature & Bank Details ---
+        stamp(template.resolve_rows(template.footer_rows, footer_fields(totals)), row_idx)
+
+    with span("render.save"):
+        _save_atomic(wb, path)
+
+
+def _render_streaming(template, party_details, invoice_details, items, path, calculation=None):
+    """Renders the invoice with openpyxl's write-only worksheet.
+
+    Rows are streamed to disk as they are appended and every item row is
+    emitted exactly once, so memory stays flat however many items there are.
+    items may be any iterable, including a generator.
+    """
+    with span("render.layout"):
+        wb, ws = template.new_workbook(write_only=True)
+    with span("render.cells", writer="streaming"):
+        _write_streaming_sheet(template, ws, party_details, invoice_details, items, calculation)
+    with span("render.save"):
+        _save_atomic(wb, path)
+
+
+def _write_streaming_sheet(template, ws, party_details, invoice_details, items, calculation=None):
+    """Appends one invoice to a write-only invoice sheet and returns its totals."""
+    from openpyxl.cell import WriteOnlyCell
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    def write(rows):
+        for row in rows:
+            ws.append([
+                None if spec is None else (spec[0] if spec[1] is None else styled(*spec))
+                for spec in row
+            ])
+
+    write(template.resolve_rows(template.header_rows, template.header_fields(party_details, invoice_details)))
+
+    totals = InvoiceTotals()
+    for values in item_rows(items, totals, calculation):
+        ws.append([styled(value, style) for value, style in zip(values, ITEM_ROW_STYLES)])
+
+    write(template.resolve_rows(template.footer_rows, footer_fields(totals)))
+    return totals
+
+
+# --- Multi-Invoice Workbooks ---
+ARCHIVE_INDEX_TITLE = "Index"
+ARCHIVE_INDEX_HEADERS = ["Invoice No.", "Invoice Date", "Party Name", "GST No.", "Items", "Total (Incl. Tax)"]
+ARCHIVE_INDEX_WIDTHS = {'A': 16, 'B': 14, 'C': 35, 'D': 20, 'E': 8, 'F': 18}
+_SHEET_TITLE_INVALID = str.maketrans({c: "-" for c in "[]:*?/\\'"})
+
+
+def archive_filename(period):
+    """Returns the file name of the workbook holding a day's or month's invoices, e.g. Invoices_2025-04.xlsx."""
+    return f"Invoices_{period}.xlsx"
+
+
+def _sheet_title(invoice_details, number, used):
+    title = str(invoice_details.get('invoice_no') or f"Invoice {number}").translate(_SHEET_TITLE_INVALID)[:31]
+    base, copy = title, 1
+    while title.lower() in used:
+        copy += 1
+        title = f"{base[:31 - len(str(copy)) - 3]} ({copy})"
+    used.add(title.lower())
+    return title
+
+
+def generate_invoice_archive(invoices, path, logo_path=None):
+    """Writes several invoices into one workbook, one sheet each, after an index sheet linking to them.
+
+    invoices is an iterable of (party_details, invoice_details, items).
+    Named styles and the logo are stored once for the whole workbook, and
+    every sheet is streamed with the write-only renderer. Returns a list of
+    (sheet_title, totals), one per invoice.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.worksheet.hyperlink import Hyperlink
+
+    template = get_template(logo_path or default_logo_path())
+    wb = template.empty_workbook(write_only=True)
+    index = wb.create_sheet(ARCHIVE_INDEX_TITLE)
+    for column, width in ARCHIVE_INDEX_WIDTHS.items():
+        index.column_dimensions[column].width = width
+    header = []
+    for value in ARCHIVE_INDEX_HEADERS:
+        cell = WriteOnlyCell(index, value=value)
+        cell.style = STYLE_TABLE_HEADER
+        header.append(cell)
+    index.append(header)
+
+    sheets, used = [], {ARCHIVE_INDEX_TITLE.lower()}
+    for number, (party_details, invoice_details, items) in enumerate(invoices, start=1):
+        title = _sheet_title(invoice_details, number, used)
+        totals = _write_streaming_sheet(template, template.add_sheet(wb, title), party_details, invoice_details, items)
+        link = WriteOnlyCell(index, value=invoice_details.get('invoice_no') or title)
+        link.hyperlink = Hyperlink(ref="", location=f"'{title}'!A1")
+        link.style = "Hyperlink"
+        index.append([link, invoice_details['sale_date'], party_details['name'], party_details['gst'],
+                      len(items) if hasattr(items, '__len__') else None, rupees(totals.total)])
+        sheets.append((title, totals))
+
+    _save_atomic(wb, path)
+    return sheets
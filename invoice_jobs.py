@@ -0,0 +1,72 @@
+"""Background job queue for invoice generation.
+
+Jobs run on worker threads fed by a queue.Queue. Results are collected in a
+second queue and picked up with poll(), which the GUI calls from Tk's
+after() loop so that widgets are only ever touched on the Tk thread.
+"""
+import itertools
+import queue
+import threading
+
+_STOP = object()
+
+
+class InvoiceJobQueue:
+    """Runs submitted callables on worker threads and hands back their results."""
+
+    def __init__(self, workers=1):
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Non-daemon threads: an invoice being written when the window is
+        # closed still gets finished before the process exits.
+        self._threads = [
+            threading.Thread(target=self._work, name=f"invoice-worker-{n}")
+            for n in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending(self):
+        """Number of submitted jobs whose results have not been polled yet."""
+        with self._lock:
+            return self._pending
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(*args, **kwargs) and returns the job id."""
+        job_id = next(self._ids)
+        with self._lock:
+            self._pending += 1
+        self._jobs.put((job_id, func, args, kwargs))
+        return job_id
+
+    def poll(self):
+        """Returns [(job_id, result, error)] for every job finished since the last poll."""
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            self._pending -= len(finished)
+        return finished
+
+    def close(self):
+        """Lets queued jobs finish, then stops the workers (does not wait)."""
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            job_id, func, args, kwargs = job
+            try:
+                self._results.put((job_id, func(*args, **kwargs), None))
+            except Exception as e:
+                self._results.put((job_id, None, e))
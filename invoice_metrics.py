@@ -0,0 +1,276 @@
+"""Timing spans for the invoice pipeline, a JSON-lines metrics log and opt-in profiling.
+
+Code marks its phases with span():
+
+    with span("render.save"):
+        _save_atomic(wb, path)
+
+Spans do nothing until enable_metrics() is called (the app's --metrics
+flag); until then span() hands back a shared no-op object, so a phase costs
+one function call. Once enabled, every finished span is appended as one
+JSON line to invoice_metrics.jsonl, with its duration, the enclosing span
+and any fields set on it. The log is rotated at METRICS_MAX_BYTES, keeping
+METRICS_BACKUPS old files. The last METRICS_WINDOW durations of each span
+are also kept in memory for latency_summary(), which the app shows in its
+Timings window.
+
+enable_profiling() (the app's --profile flag) also captures a cProfile of
+every profiled() block, i.e. each invoice written, into its own .prof file
+for python -m pstats or snakeviz.
+
+Usage:
+    python invoice_metrics.py summary invoice_metrics.jsonl
+"""
+import collections
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = "invoice_metrics.jsonl"
+METRICS_MAX_BYTES = 1024 * 1024
+METRICS_BACKUPS = 3
+# Durations kept per span name for latency_summary()
+METRICS_WINDOW = 200
+PROFILE_DIR = "profiles"
+
+
+# --- Spans ---
+class _NoSpan:
+    """What span() returns while metrics are off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+_recorder = None
+_local = threading.local()
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "fields", "parent", "start")
+
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _local.stack.pop()
+        self.recorder.record(self.name, elapsed, self.parent, exc_type, self.fields)
+        return False
+
+    def set(self, **fields):
+        """Adds fields (e.g. items=120) to the span's log line."""
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    """Returns a context manager that times the block as span name (a no-op while metrics are off)."""
+    recorder = _recorder
+    if recorder is None:
+        return _NO_SPAN
+    return _Span(recorder, name, fields)
+
+
+def metrics_enabled():
+    return _recorder is not None
+
+
+# --- Metrics Log ---
+class MetricsRecorder:
+    """Appends finished spans to a rotating JSON-lines file and keeps recent durations per span."""
+
+    def __init__(self, path=METRICS_FILE, max_bytes=METRICS_MAX_BYTES, backups=METRICS_BACKUPS, window=METRICS_WINDOW):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.window = window
+        self._file = None
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, parent=None, exc_type=None, fields=None):
+        entry = {"ts": round(time.time(), 3), "span": name, "ms": round(seconds * 1000, 3)}
+        if parent:
+            entry["parent"] = parent
+        entry["thread"] = threading.current_thread().name
+        if exc_type is not None:
+            entry["error"] = exc_type.__name__
+        if fields:
+            entry.update(fields)
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            recent = self._recent.get(name)
+            if recent is None:
+                recent = self._recent[name] = collections.deque(maxlen=self.window)
+            recent.append(seconds)
+            try:
+                self._write(line)
+            except OSError:
+                pass  # Metrics must never break invoice generation
+
+    def _write(self, line):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Renames invoice_metrics.jsonl to .1 (and .1 to .2, ...), dropping the oldest."""
+        self._file.close()
+        self._file = None
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def summary(self):
+        """Returns latency stats in ms for each span seen, over its last window durations."""
+        with self._lock:
+            recent = {name: list(durations) for name, durations in self._recent.items()}
+        return [_stats(name, [seconds * 1000 for seconds in durations], durations[-1] * 1000)
+                for name, durations in sorted(recent.items())]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _stats(name, values, last):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return {
+        "span": name,
+        "count": len(ordered),
+        "last_ms": last,
+        "median_ms": ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2,
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max_ms": ordered[-1],
+    }
+
+
+def enable_metrics(path=METRICS_FILE, **options):
+    """Turns spans on, logging them to path. Returns the recorder."""
+    global _recorder
+    disable_metrics()
+    _recorder = MetricsRecorder(path, **options)
+    return _recorder
+
+
+def disable_metrics():
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+
+
+def latency_summary():
+    """Rolling latency stats per span (see MetricsRecorder.summary); empty while metrics are off."""
+    recorder = _recorder
+    return recorder.summary() if recorder is not None else []
+
+
+# --- Profiling ---
+_profile_dir = None
+_profile_ids = itertools.count(1)
+# cProfile follows one thread, and only one profiler can run at a time
+_profiling = threading.Lock()
+
+
+def enable_profiling(directory=PROFILE_DIR):
+    """Captures a cProfile of each profiled() block into directory."""
+    global _profile_dir
+    os.makedirs(directory, exist_ok=True)
+    _profile_dir = directory
+
+
+@contextmanager
+def profiled(label):
+    """Profiles the block into <label>_<time>_<n>.prof while profiling is on.
+
+    Yields the .prof path, or None if the block is not profiled (profiling
+    off, or another block is being profiled already).
+    """
+    directory = _profile_dir
+    if directory is None or not _profiling.acquire(blocking=False):
+        yield None
+        return
+    import cProfile
+
+    path = os.path.join(directory, f"{label}_{time.strftime('%Y%m%d-%H%M%S')}_{next(_profile_ids)}.prof")
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+        try:
+            yield path
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+    finally:
+        _profiling.release()
+
+
+# --- Log Summary ---
+def summarize_log(paths):
+    """Returns latency stats per span over every line of the given metrics logs."""
+    durations = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by a crash
+                durations.setdefault(entry["span"], []).append(entry["ms"])
+    return [_stats(name, values, values[-1]) for name, values in sorted(durations.items())]
+
+
+def format_summary(rows):
+    lines = [f"{'span':<24} {'count':>7} {'last ms':>10} {'median ms':>10} {'p95 ms':>10} {'max ms':>10}"]
+    for row in rows:
+        lines.append(f"{row['span']:<24} {row['count']:>7} {row['last_ms']:>10.1f} {row['median_ms']:>10.1f}"
+                     f" {row['p95_ms']:>10.1f} {row['max_ms']:>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] != "summary":
+        print(__doc__.strip().split("Usage:")[1])
+        return 2
+    print(format_summary(summarize_log(argv[1:])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Invoice number allocation shared by every app window and batch process.
+
+Numbers come from a counter row in a small SQLite file. A process reserves
+a block of numbers in one short write transaction (BEGIN IMMEDIATE, so two
+processes can never reserve the same block) and then hands them out from
+memory, so the file lock is taken once per block rather than once per
+invoice. close() gives the unused rest of the block back to the file if no
+other process has reserved numbers since; otherwise those numbers are
+skipped, so use block_size=1 where gaps are never acceptable.
+
+Usage:
+    python invoice_numbers.py show invoice_numbers.db
+    python invoice_numbers.py set invoice_numbers.db 1001
+"""
+import sqlite3
+import sys
+import threading
+
+NUMBERS_FILE = "invoice_numbers.db"
+DEFAULT_SERIES = "invoice"
+INVOICE_NUMBER_FORMAT = "INV-{:05d}"
+
+
+def format_invoice_number(number):
+    return INVOICE_NUMBER_FORMAT.format(number)
+
+
+class InvoiceNumberAllocator:
+    """Hands out unique, increasing invoice numbers, reserving them from the file in blocks."""
+
+    def __init__(self, file_path=NUMBERS_FILE, block_size=1, series=DEFAULT_SERIES):
+        self.file_path = file_path
+        self.block_size = block_size
+        self.series = series
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        # Autocommit mode, so the BEGIN IMMEDIATE below is the only transaction
+        self._conn = sqlite3.connect(file_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+
+    def next_number(self):
+        """Returns the next invoice number as an int."""
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve(self.block_size)
+            number = self._next
+            self._next += 1
+            return number
+
+    def next_invoice_no(self):
+        """Returns the next invoice number formatted for the invoice, e.g. 'INV-00042'."""
+        return format_invoice_number(self.next_number())
+
+    def _reserve(self, count):
+        """Reserves count numbers in the file and returns the range (start, end)."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next FROM sequences WHERE name = ?", (self.series,)).fetchone()
+            start = row[0] if row else 1
+            conn.execute("INSERT OR REPLACE INTO sequences (name, next) VALUES (?, ?)", (self.series, start + count))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return start, start + count
+
+    def peek(self):
+        """Returns the next number the file would hand out (ignoring this process's reserved block)."""
+        row = self._conn.execute("SELECT next FROM sequences WHERE name = ?", (self.series,)).fetchone()
+        return row[0] if row else 1
+
+    def reset(self, next_number):
+        """Sets the next number the file will hand out, e.g. at the start of a financial year."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sequences (name, next) VALUES (?, ?)", (self.series, next_number))
+            self._next = self._end = 0
+
+    def release(self):
+        """Gives the unused rest of the reserved block back, if it is still the last block reserved in the file."""
+        with self._lock:
+            if self._next >= self._end:
+                return
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE sequences SET next = ? WHERE name = ? AND next = ?",
+                             (self._next, self.series, self._end))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._next = self._end = 0
+
+    def close(self):
+        self.release()
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not ((len(argv) == 2 and argv[0] == "show") or (len(argv) == 3 and argv[0] == "set" and argv[2].isdigit())):
+        print(__doc__.strip().split("Usage:")[1])
+        return 2
+
+    allocator = InvoiceNumberAllocator(argv[1])
+    if argv[0] == "set":
+        allocator.reset(int(argv[2]))
+    print(f"Next invoice number: {format_invoice_number(allocator.peek())}")
+    allocator.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""Direct PDF renderer for invoices.
+
+Draws the same layout as the Excel invoice (company header and logo, buyer
+and date details, the 10-column item table, totals, bank details and
+signatory) straight into a PDF file, with no spreadsheet application
+involved. Only the standard library is used: text is set in the PDF base
+fonts Helvetica and Helvetica-Bold (nothing embedded), and a JPEG logo is
+embedded as-is with DCTDecode.
+
+The base fonts only cover Western European text (WinAnsi, i.e. cp1252).
+Rather than print other characters (Devanagari, '₹') as '?', rendering
+refuses such an invoice with a ValueError; check_printable tells callers
+beforehand, so no invoice number is spent on it.
+
+The page is sized like the Excel print setup: Letter, default margins, the
+sheet's columns scaled to fit one page width. Long invoices continue on
+further pages with the table headings repeated. Each page is written to the
+file as soon as it is full, so memory stays flat for any number of items.
+
+This is the "pdf" renderer of invoice_engine.RENDERERS; use
+invoice_engine.generate_invoice(..., output_format="pdf").
+"""
+from functools import lru_cache
+import io
+import struct
+import zlib
+
+from file_utils import write_atomic
+from invoice_engine import footer_fields, item_rows
+from invoice_template import COLUMN_WIDTHS, ITEM_ROW_STYLES
+from line_items import InvoiceTotals
+
+# --- Page Setup (points) ---
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # Letter, as in the Excel page setup
+MARGIN_X, MARGIN_Y = 50.4, 54  # Excel's default 0.7" / 0.75" margins
+ROW_HEIGHT = 15  # Excel's default row height, before scaling
+CELL_PADDING = 2
+TEXT_SIZE_FACTOR = 0.85  # Helvetica runs wider than the sheet's Calibri
+LOGO_COLUMN = 'E'
+
+# Advance widths (1/1000 em) of the base fonts for characters 32-126
+_HELVETICA_WIDTHS = [int(w) for w in """
+278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556
+278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 667 778 722 667
+611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833
+556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584""".split()]
+_HELVETICA_BOLD_WIDTHS = [int(w) for w in """
+278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556
+333 333 584 584 584 611 975 722 722 722 722 667 611 778 722 278 556 722 611 833 722 778 667 778 722 667
+611 722 667 944 667 667 611 333 278 333 584 556 333 556 611 556 611 556 333 611 611 278 278 556 278 889
+611 611 611 611 389 556 333 611 556 778 556 556 500 389 280 389 584""".split()]
+_DEFAULT_WIDTH = 556
+# Text encoding of the base fonts (WinAnsiEncoding)
+PDF_ENCODING = "cp1252"
+
+
+class _Font:
+    def __init__(self, resource, base_font, widths):
+        self.resource = resource
+        self.base_font = base_font
+        self.widths = widths
+
+    def text_width(self, text, size):
+        widths = self.widths
+        return sum(widths[code - 32] if 32 <= code <= 126 else _DEFAULT_WIDTH for code in _encode(text)) * size / 1000
+
+
+REGULAR = _Font("F1", "Helvetica", _HELVETICA_WIDTHS)
+BOLD = _Font("F2", "Helvetica-Bold", _HELVETICA_BOLD_WIDTHS)
+
+
+class _CellStyle:
+    """A template style (font, alignment, border, fill) in PDF terms."""
+
+    def __init__(self, definition=None):
+        definition = definition or {}
+        font = definition.get("font")
+        alignment = definition.get("alignment")
+        fill = definition.get("fill")
+        self.font = BOLD if font is not None and font.bold else REGULAR
+        self.size = font.size if font is not None and font.size else 11
+        self.center = alignment is not None and alignment.horizontal == "center"
+        self.wrap = alignment is not None and bool(alignment.wrap_text)
+        self.border = definition.get("border") is not None
+        self.fill = None
+        if fill is not None and fill.fill_type == "solid":
+            rgb = str(fill.start_color.rgb)[-6:]
+            self.fill = tuple(int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _column_widths():
+    """Column widths in points, as Excel converts character widths to pixels."""
+    return [int(COLUMN_WIDTHS[column] * 7 + 5) * 0.75 for column in sorted(COLUMN_WIDTHS)]
+
+
+def _display(value):
+    """Formats a cell value like Excel's General number format."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.10g}"
+    return str(value)
+
+
+def unprintable_characters(text):
+    """Returns the characters of text the PDF fonts cannot print, without repeats, e.g. '₹'."""
+    return "".join(dict.fromkeys(char for char in text if not _printable(char)))
+
+
+@lru_cache(maxsize=4096)
+def _printable(char):
+    try:
+        char.encode(PDF_ENCODING)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def check_printable(party_details, invoice_details, items):
+    """Raises ValueError if the party, invoice or item text has characters the PDF fonts cannot print."""
+    texts = [(f"party {field}", value) for field, value in party_details.items()]
+    texts += [(field.replace("_", " "), value) for field, value in invoice_details.items()]
+    for number, item in enumerate(items, start=1):
+        texts += [(f"item {number} HSN", item.hsn), (f"item {number} description", item.description)]
+    for label, value in texts:
+        chars = unprintable_characters(str(value or ""))
+        if chars:
+            raise ValueError(f"The {label} has characters a PDF invoice cannot print ({chars}); "
+                             "generate an Excel invoice instead")
+
+
+def _encode(text):
+    try:
+        return text.encode(PDF_ENCODING)
+    except UnicodeEncodeError:
+        raise ValueError(f"'{text}' has characters a PDF invoice cannot print ({unprintable_characters(text)})") from None
+
+
+def _escape(text):
+    data = _encode(text)
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"").replace(b"\n", b" ")
+
+
+@lru_cache(maxsize=1024)
+def _wrap(text, font, size, width):
+    """Splits text into lines that fit width (words longer than a line are broken).
+
+    Cached, since each row is measured before it is drawn and item
+    descriptions tend to repeat.
+    """
+    lines = []
+    space = font.text_width(" ", size)
+    for paragraph in text.split("\n"):
+        line, line_width = "", 0
+        for word in paragraph.split(" "):
+            word_width = font.text_width(word, size)
+            if not line and word_width <= width:
+                line, line_width = word, word_width
+                continue
+            if line and line_width + space + word_width <= width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line:
+                lines.append(line)
+            line, line_width = "", 0
+            for char in word:
+                char_width = font.text_width(char, size)
+                if line and line_width + char_width > width:
+                    lines.append(line)
+                    line, line_width = "", 0
+                line, line_width = line + char, line_width + char_width
+        lines.append(line)
+    return tuple(lines)
+
+
+# --- Logo ---
+def _jpeg_info(data):
+    """Returns (width, height, components) from a JPEG's frame header, or None."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # Fill byte
+            position += 1
+            continue
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width, components = struct.unpack(">HHB", data[position + 5:position + 10])
+            return width, height, components
+        position += 2 + length
+    return None
+
+
+@lru_cache(maxsize=4)
+def _pdf_image(data, fmt):
+    """Returns (jpeg bytes, width, height, components) for a logo, converting non-JPEG logos with Pillow."""
+    info = _jpeg_info(data) if fmt in ("jpeg", "jpg") else None
+    if info is None:
+        from PIL import Image as PILImage
+
+        with PILImage.open(io.BytesIO(data)) as image:
+            out = io.BytesIO()
+            image.convert("RGB").save(out, format="JPEG", quality=90)
+        data = out.getvalue()
+        info = _jpeg_info(data)
+    return (data,) + info
+
+
+# --- PDF File Structure ---
+class _PdfFile:
+    """Writes numbered objects to a file and the cross-reference table at the end."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.count = 0
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    def write(self, number, body):
+        self.offsets[number] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def write_stream(self, number, data, entries=b"", compress=True):
+        if compress:
+            data = zlib.compress(data, 6)
+            entries += b" /Filter /FlateDecode"
+        self.write(number, b"<< /Length %d%s >>\nstream\n" % (len(data), entries) + data + b"\nendstream")
+
+    def finish(self, root, info):
+        xref = self.f.tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (self.count + 1))
+        for number in range(1, self.count + 1):
+            self.f.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.f.write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (self.count + 1, root, info, xref))
+
+
+class _InvoicePdf:
+    """Lays the invoice rows out on pages and writes each page when it is full."""
+
+    def __init__(self, pdf, template):
+        self.pdf = pdf
+        self.styles = {name: _CellStyle(definition) for name, definition in template.styles.items()}
+        self.plain = _CellStyle()
+        widths = _column_widths()
+        self.scale = (PAGE_WIDTH - 2 * MARGIN_X) / sum(widths)
+        self.widths = [width * self.scale for width in widths]
+        self.lefts = [MARGIN_X + sum(self.widths[:i]) for i in range(len(self.widths))]
+
+        self.pages_ref = pdf.reserve()
+        self.fonts_ref = {font.resource: pdf.reserve() for font in (REGULAR, BOLD)}
+        for font in (REGULAR, BOLD):
+            pdf.write(self.fonts_ref[font.resource],
+                      b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % font.base_font.encode())
+        self.logo_ref = None
+        if template.logo_source is not None:
+            data, fmt, size = template.logo_source
+            jpeg, width, height, components = _pdf_image(data, fmt)
+            colorspace = {1: b"/DeviceGray", 4: b"/DeviceCMYK"}.get(components, b"/DeviceRGB")
+            self.logo_ref = pdf.reserve()
+            pdf.write_stream(self.logo_ref, jpeg, b" /Type /XObject /Subtype /Image /Width %d /Height %d"
+                             b" /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode" % (width, height, colorspace),
+                             compress=False)
+            self.logo_size = tuple(pixels * 0.75 * self.scale for pixels in size)
+        self.page_refs = []
+        self.ops = None
+        self.y = 0
+
+    # --- Pages ---
+    def new_page(self):
+        if self.ops is not None:
+            self.end_page()
+        self.ops = []
+        self.y = PAGE_HEIGHT - MARGIN_Y
+
+    def end_page(self):
+        content_ref, page_ref = self.pdf.reserve(), self.pdf.reserve()
+        self.pdf.write_stream(content_ref, b"\n".join(self.ops))
+        resources = b"/Font << /F1 %d 0 R /F2 %d 0 R >>" % (self.fonts_ref["F1"], self.fonts_ref["F2"])
+        if self.logo_ref is not None:
+            resources += b" /XObject << /Logo %d 0 R >>" % self.logo_ref
+        self.pdf.write(page_ref, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>"
+                       % (self.pages_ref, PAGE_WIDTH, PAGE_HEIGHT, resources, content_ref))
+        self.page_refs.append(page_ref)
+        self.ops = None
+
+    def fits(self, height):
+        return self.y - height >= MARGIN_Y
+
+    # --- Drawing ---
+    def draw_logo(self):
+        if self.logo_ref is not None:
+            width, height = self.logo_size
+            x = self.lefts[ord(LOGO_COLUMN) - ord('A')]
+            self.ops.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /Logo Do Q" % (width, height, x, self.y - height))
+
+    def row_height(self, row):
+        """Height of a row of (value, style) specs: taller fonts and wrapped cells grow it."""
+        height = ROW_HEIGHT
+        for column, spec in enumerate(row):
+            if spec is None:
+                continue
+            style = self.styles.get(spec[1], self.plain)
+            lines = 1
+            if style.wrap:
+                lines = len(_wrap(_display(spec[0]), style.font, style.size * TEXT_SIZE_FACTOR * self.scale,
+                                  self.widths[column] - 2 * CELL_PADDING * self.scale))
+            height = max(height, style.size * 1.3 * lines)
+        return height * self.scale
+
+    def draw_row(self, row, height=None):
+        """Draws one sheet row at the current position and moves below it."""
+        height = height or self.row_height(row)
+        bottom = self.y - height
+        ops = self.ops
+        for column, spec in enumerate(row):
+            if spec is None:
+                continue
+            value, style = _display(spec[0]), self.styles.get(spec[1], self.plain)
+            left, width = self.lefts[column], self.widths[column]
+            if style.fill is not None:
+                ops.append(b"%.3f %.3f %.3f rg %.2f %.2f %.2f %.2f re f 0 g" % (style.fill + (left, bottom, width, height)))
+            if style.border:
+                ops.append(b"%.2f w %.2f %.2f %.2f %.2f re S" % (0.5 * self.scale, left, bottom, width, height))
+            if not value:
+                continue
+            size = style.size * TEXT_SIZE_FACTOR * self.scale
+            padding = CELL_PADDING * self.scale
+            lines = _wrap(value, style.font, size, width - 2 * padding) if style.wrap else [value]
+            line_height = size * 1.2
+            # Vertically centred, like the template's cell alignment
+            baseline = bottom + (height + line_height * len(lines)) / 2 - size
+            # Text runs on into empty cells to the right but is cut off at a filled one, as in Excel
+            clip = column + 1 < len(row) and row[column + 1] is not None and row[column + 1][0] not in (None, "")
+            if clip:
+                ops.append(b"q %.2f %.2f %.2f %.2f re W n" % (left, bottom, width, height))
+            for line in lines:
+                x = left + padding
+                if style.center:
+                    x = left + (width - style.font.text_width(line, size)) / 2
+                ops.append(b"BT /%s %.2f Tf %.2f %.2f Td (%s) Tj ET"
+                           % (style.font.resource.encode(), size, x, baseline, _escape(line)))
+                baseline -= line_height
+            if clip:
+                ops.append(b"Q")
+        self.y = bottom
+
+    def finish(self):
+        self.end_page()
+        pdf = self.pdf
+        pdf.write(self.pages_ref, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                  % (b" ".join(b"%d 0 R" % ref for ref in self.page_refs), len(self.page_refs)))
+        root, info = pdf.reserve(), pdf.reserve()
+        pdf.write(root, b"<< /Type /Catalog /Pages %d 0 R >>" % self.pages_ref)
+        pdf.write(info, b"<< /Producer (Invoice Generator) /Title (Tax Invoice) >>")
+        pdf.finish(root, info)
+
+
+def render_invoice_pdf(template, party_details, invoice_details, items, path, calculation=None):
+    """Renders the invoice as a PDF file at path (see invoice_engine.RENDERERS).
+
+    Raises ValueError if any text cannot be printed (see check_printable).
+    """
+    check_printable(party_details, invoice_details, items)
+
+    def write(temp_path):
+        with open(temp_path, "wb") as f:
+            _write_pdf(f, template, party_details, invoice_details, items, calculation)
+    write_atomic(path, write)
+
+
+def _write_pdf(f, template, party_details, invoice_details, items, calculation):
+    document = _InvoicePdf(_PdfFile(f), template)
+    document.new_page()
+    document.draw_logo()
+
+    # --- Header, buyer & date details, table headers ---
+    header_rows = list(template.resolve_rows(template.header_rows, template.header_fields(party_details, invoice_details)))
+    for row in header_rows:
+        document.draw_row(row)
+    table_header = header_rows[-1]
+
+    # --- Table Data ---
+    totals = InvoiceTotals()
+    for values in item_rows(items, totals, calculation):
+        row = list(zip(values, ITEM_ROW_STYLES))
+        height = document.row_height(row)
+        if not document.fits(height):
+            document.new_page()
+            document.draw_row(table_header)
+        document.draw_row(row, height)
+
+    # --- Summary, Signature & Bank Details ---
+    footer_rows = list(template.resolve_rows(template.footer_rows, footer_fields(totals)))
+    if not document.fits(sum(document.row_height(row) for row in footer_rows)):
+        document.new_page()
+    for row in footer_rows:
+        document.draw_row(row)
+    document.finish()
+
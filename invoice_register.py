@@ -0,0 +1,260 @@
+"""Invoice register and GST summary reports.
+
+Every generated invoice is recorded in a SQLite register: one header row
+(number, dates, party, totals, file) and one row per line item with its
+HSN code and tax amounts. Amounts are stored as integer paise, exactly as
+calculated for the invoice.
+
+The report streams the line rows of a period through a single cursor and
+builds the month-wise, party-wise and HSN-wise CGST/SGST aggregates in one
+pass. Memory depends only on the number of groups, so it handles hundreds
+of thousands of lines.
+
+Usage:
+    python invoice_register.py report invoice_register.db [--from 2025-04] [--to 2025-06] [--csv gst_q1]
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from line_items import calculate, rupees
+
+REGISTER_FILE = "invoice_register.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    invoice_no TEXT UNIQUE,
+    period TEXT NOT NULL,            -- yyyy-mm of the sale date
+    sale_date TEXT, delivery_date TEXT,
+    party_name TEXT, party_gst TEXT, party_address TEXT,
+    subtotal INTEGER, cgst INTEGER, sgst INTEGER, discount INTEGER, total INTEGER,
+    path TEXT,
+    recorded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS invoices_period ON invoices (period);
+CREATE INDEX IF NOT EXISTS invoices_path ON invoices (path);
+CREATE TABLE IF NOT EXISTS invoice_lines (
+    invoice_id INTEGER NOT NULL REFERENCES invoices (id) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL,
+    hsn TEXT, description TEXT,
+    quantity_milli INTEGER, rate_paise INTEGER, discount_bp INTEGER, cgst_bp INTEGER, sgst_bp INTEGER,
+    subtotal INTEGER, cgst INTEGER, sgst INTEGER, discount INTEGER, total INTEGER,
+    PRIMARY KEY (invoice_id, line_no)
+);
+CREATE TABLE IF NOT EXISTS source_files (  -- invoice workbooks indexed by invoice_backfill.py
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER, size INTEGER,
+    invoice_id INTEGER,              -- NULL if the file could not be read
+    file_total INTEGER,              -- grand total printed on the invoice, in paise
+    error TEXT,
+    indexed_at TEXT,
+    inserted INTEGER                 -- 1 if invoice_id was added from this file, not recorded by the app
+);
+"""
+
+
+DATE_FORMATS = ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y")
+
+
+def parse_invoice_date(text):
+    """Parses a DD-MM-YYYY (or YYYY-MM-DD, DD/MM/YYYY) date string. Raises ValueError if it is none of these."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(text).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{text}' (expected DD-MM-YYYY)")
+
+
+def period_of(sale_date, period_format="%Y-%m"):
+    """Returns 'yyyy-mm' (or period_format) for a DD-MM-YYYY (or YYYY-MM-DD) date string."""
+    try:
+        return parse_invoice_date(sale_date).strftime(period_format)
+    except ValueError:
+        return "unknown"
+
+
+class InvoiceRegister:
+    """SQLite register of issued invoices and their lines."""
+
+    def __init__(self, file_path=REGISTER_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(source_files)")}
+        if "inserted" not in columns:  # Registers made before the column existed
+            self._conn.execute("ALTER TABLE source_files ADD COLUMN inserted INTEGER")
+
+    def record(self, party_details, invoice_details, items, path=None):
+        """Records one invoice (items are LineItems). Returns False if its number is already registered."""
+        with self._lock, self._conn:
+            return self._insert(party_details, invoice_details, items, path) is not None
+
+    def _insert(self, party_details, invoice_details, items, path):
+        """Inserts an invoice and its lines; returns its id, or None if the number is taken. Caller holds the lock."""
+        calculation = calculate(items)
+        totals = calculation.totals
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO invoices (invoice_no, period, sale_date, delivery_date, party_name, party_gst,"
+            " party_address, subtotal, cgst, sgst, discount, total, path, recorded_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))",
+            (invoice_details.get("invoice_no") or None, period_of(invoice_details.get("sale_date")),
+             invoice_details.get("sale_date"), invoice_details.get("delivery_date"),
+             party_details.get("name", ""), party_details.get("gst", ""), party_details.get("address", ""),
+             totals.subtotal, totals.cgst, totals.sgst, totals.discount, totals.total, path),
+        )
+        if cursor.rowcount != 1:
+            return None
+        invoice_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO invoice_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((invoice_id, index + 1, item.hsn, item.description, item.quantity_milli, item.rate_paise,
+              item.discount_bp, item.cgst_bp, item.sgst_bp) + calculation.row(index)
+             for index, item in enumerate(items)),
+        )
+        return invoice_id
+
+    # --- Indexed Files ---
+    def source_signatures(self):
+        """Returns {path: (mtime_ns, size)} for every workbook indexed so far."""
+        with self._lock:
+            return {path: (mtime_ns, size) for path, mtime_ns, size in
+                    self._conn.execute("SELECT path, mtime_ns, size FROM source_files")}
+
+    def record_file(self, path, signature, invoice=None, error=None):
+        """Records an indexed workbook; invoice is (party_details, invoice_details, items, file_total).
+
+        A file indexed before is replaced, along with the invoice entry made
+        from it. If the invoice is already in the register (the app recorded
+        it when it was generated), the file is linked to that entry instead
+        of being counted twice; re-indexing the file never deletes it.
+        """
+        with self._lock, self._conn:
+            conn = self._conn
+            row = conn.execute("SELECT invoice_id, inserted FROM source_files WHERE path = ?", (path,)).fetchone()
+            if row and row[0] is not None and row[1]:
+                conn.execute("DELETE FROM invoices WHERE id = ?", (row[0],))
+            invoice_id = file_total = None
+            inserted = 0
+            if invoice is not None:
+                party_details, invoice_details, items, file_total = invoice
+                invoice_no = invoice_details.get("invoice_no") or None
+                row = conn.execute("SELECT id FROM invoices WHERE path = ? OR invoice_no = ?", (path, invoice_no)).fetchone()
+                if row:
+                    invoice_id = row[0]
+                else:
+                    invoice_id = self._insert(party_details, invoice_details, items, path)
+                    inserted = int(invoice_id is not None)
+            conn.execute(
+                "INSERT OR REPLACE INTO source_files (path, mtime_ns, size, invoice_id, file_total, error, indexed_at,"
+                " inserted) VALUES (?, ?, ?, ?, ?, ?, datetime('now'), ?)",
+                (path, signature[0], signature[1], invoice_id, file_total, error, inserted))
+
+    def iter_lines(self, start_period=None, end_period=None):
+        """Yields (period, party_gst, party_name, hsn, subtotal, cgst, sgst, discount, total) per line, streamed."""
+        where, params = [], []
+        if start_period:
+            where.append("i.period >= ?")
+            params.append(start_period)
+        if end_period:
+            where.append("i.period <= ?")
+            params.append(end_period)
+        # A separate connection, so a long report never holds up record()
+        conn = sqlite3.connect(self.file_path, timeout=30)
+        try:
+            yield from conn.execute(
+                "SELECT i.period, i.party_gst, i.party_name, l.hsn, l.subtotal, l.cgst, l.sgst, l.discount, l.total"
+                " FROM invoice_lines l JOIN invoices i ON i.id = l.invoice_id"
+                + (" WHERE " + " AND ".join(where) if where else ""), params)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- GST Summary ---
+class _Sums:
+    __slots__ = ("lines", "taxable", "cgst", "sgst", "discount", "total")
+
+    def __init__(self):
+        self.lines = self.taxable = self.cgst = self.sgst = self.discount = self.total = 0
+
+
+def gst_summary(lines):
+    """Aggregates line rows (see iter_lines) by period, by party and by HSN in one pass.
+
+    Taxable is the value CGST and SGST were charged on: the line subtotal,
+    before the discount (which comes off the total after tax). So
+    Total = Taxable + CGST + SGST - Discount.
+    """
+    by_period, by_party, by_hsn = {}, {}, {}
+    party_names = {}
+    for period, party_gst, party_name, hsn, subtotal, cgst, sgst, discount, total in lines:
+        party = party_gst or party_name
+        party_names.setdefault(party, party_name)
+        for groups, key in ((by_period, period), (by_party, party), (by_hsn, hsn or "")):
+            sums = groups.get(key)
+            if sums is None:
+                sums = groups[key] = _Sums()
+            sums.lines += 1
+            sums.taxable += subtotal
+            sums.cgst += cgst
+            sums.sgst += sgst
+            sums.discount += discount
+            sums.total += total
+    return {"period": by_period, "party": by_party, "hsn": by_hsn}, party_names
+
+
+def _report_rows(groups):
+    for key in sorted(groups):
+        sums = groups[key]
+        yield [key, sums.lines, f"{rupees(sums.taxable):.2f}", f"{rupees(sums.cgst):.2f}",
+               f"{rupees(sums.sgst):.2f}", f"{rupees(sums.discount):.2f}", f"{rupees(sums.total):.2f}"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GST summary of the invoice register.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("register", nargs="?", default=REGISTER_FILE)
+    parser.add_argument("--from", dest="start", help="first period, yyyy-mm")
+    parser.add_argument("--to", dest="end", help="last period, yyyy-mm")
+    parser.add_argument("--csv", metavar="PREFIX", help="also write PREFIX_period.csv, PREFIX_party.csv and PREFIX_hsn.csv")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.register):
+        print(f"No register at {args.register}")
+        return 1
+    register = InvoiceRegister(args.register)
+    summary, party_names = gst_summary(register.iter_lines(args.start, args.end))
+    register.close()
+
+    headers = {"period": "Period", "party": "Party GSTIN", "hsn": "HSN/SAC"}
+    for name, groups in summary.items():
+        columns = [headers[name], "Lines", "Taxable", "CGST", "SGST", "Discount", "Total"]
+        rows = list(_report_rows(groups))
+        print(f"\nBy {name}:")
+        print("  " + "".join(f"{column:>16}" for column in columns))
+        for row in rows:
+            print("  " + "".join(f"{str(value):>16}" for value in row))
+        if args.csv:
+            with open(f"{args.csv}_{name}.csv", "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns + (["Party Name"] if name == "party" else []))
+                for row in rows:
+                    writer.writerow(row + ([party_names.get(row[0], "")] if name == "party" else []))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""Local HTTP service that renders invoices on demand (e.g. for an ERP).
+
+POST /invoices with a JSON body shaped like the app's form data:
+
+    {"party": {"name": ..., "gst": ..., "address": ..., "phone": ..., "email": ...},
+     "invoice": {"sale_date": "01-04-2025", "delivery_date": "02-04-2025"},
+     "items": [{"hsn": "8541", "description": "Panel", "quantity": 2, "rate": 1500,
+                "discount": 5, "cgst": 9, "sgst": 9}]}
+
+"party_key" may be given instead of (or as well as) "party" to use a saved
+customer, and "invoice_no" in "invoice" overrides the next number. The
+response is the xlsx file itself (the PDF with ?format=pdf), or with
+?return=path a JSON object with the saved file's path and invoice number. GET /health reports the load.
+An invoice identical to one rendered before is served from the render cache
+(see render_cache.py) with its original number.
+
+Invoices render on a bounded process pool. When --queue-limit renders are
+already in flight or queued, new requests get 503 with Retry-After straight
+away instead of piling up; a render that takes longer than
+--render-timeout gets 504, and slow clients are dropped after --timeout.
+A timed-out render keeps its slot until it finishes and is then registered
+and cached, so retrying the request returns it with its number.
+If a render worker dies, the request gets 503 and the pool is replaced
+(GET /health counts this as pool_restarts).
+
+Usage:
+    python invoice_service.py --port 8765 --workers 4 --output-dir invoices
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from customer_store import CUSTOMER_FIELDS, MemoryCustomerRepository, open_customer_repository
+from invoice_batch import render_job, resolve_spec
+from invoice_numbers import NUMBERS_FILE, InvoiceNumberAllocator
+from invoice_pdf import check_printable
+from invoice_register import REGISTER_FILE, InvoiceRegister
+from item_import import build_items
+from render_cache import CACHE_DIR, RenderCache, invoice_cache_key, known_invoice_no
+
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+MAX_BODY_BYTES = 10 * 1024 * 1024
+RENDER_QUEUE_LIMIT_PER_WORKER = 4
+# Invoice numbers reserved from the counter file at a time; the unused rest goes back on shutdown
+NUMBER_BLOCK_SIZE = 50
+# Expected JSON types of the request body's fields: field -> (types, description)
+_PAYLOAD_TYPES = {
+    "invoice": (dict, "an object"),
+    "party": (dict, "an object"),
+    "party_key": (str, "a string"),
+    "items": (list, "a list"),
+}
+_INVOICE_FIELD_TYPES = {
+    "sale_date": (str, "a string"),
+    "delivery_date": (str, "a string"),
+    "invoice_no": ((str, int), "a string or number"),
+}
+
+
+def _payload_error(payload):
+    """Returns what is wrong with the shape of a request body, or None if it is usable."""
+    checks = [(payload, _PAYLOAD_TYPES, "")]
+    if isinstance(payload.get("invoice"), dict):
+        checks.append((payload["invoice"], _INVOICE_FIELD_TYPES, "invoice."))
+    for fields, types, prefix in checks:
+        for field, (expected, description) in types.items():
+            value = fields.get(field)
+            if value is not None and (not isinstance(value, expected) or isinstance(value, bool)):
+                return f"'{prefix}{field}' must be {description}"
+    party = payload.get("party") or {}
+    for field, value in party.items():
+        if field == "name" and value is not None and not isinstance(value, str):
+            return "'party.name' must be a string"
+        if value is not None and (not isinstance(value, (str, int, float)) or isinstance(value, bool)):
+            return f"'party.{field}' must be a string"
+    return None
+
+
+class InvoiceService:
+    """The render pool plus the admission limit shared by all request threads."""
+
+    def __init__(self, output_dir, customers, workers=None, queue_limit=None, render_timeout=60.0,
+                 numbers_path=NUMBERS_FILE, number_block=NUMBER_BLOCK_SIZE, cache=None, register=None):
+        self.output_dir = output_dir
+        self.customers = customers
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit or self.workers * RENDER_QUEUE_LIMIT_PER_WORKER
+        self.render_timeout = render_timeout
+        self.numbers = InvoiceNumberAllocator(numbers_path, block_size=number_block)
+        self.cache = cache
+        self.register = register
+        self._slots = threading.BoundedSemaphore(self.queue_limit)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.pool_restarts = 0
+
+    def render(self, payload, output_format="xlsx"):
+        """Renders one payload. Returns (200, (path, invoice_no)) or (error status, message)."""
+        if output_format not in CONTENT_TYPES:
+            return 400, f"Unknown format '{output_format}'"
+        error = _payload_error(payload)
+        if error:
+            return 400, error
+        invoice = payload.get("invoice") or {}
+        spec = {
+            "invoice": f"req{next(self._ids)}",
+            "party_key": payload.get("party_key"),
+            "party": payload.get("party"),
+            "sale_date": invoice.get("sale_date"),
+            "delivery_date": invoice.get("delivery_date"),
+            "invoice_no": invoice.get("invoice_no"),
+            "items": payload.get("items") or [],
+        }
+        try:
+            invoice_id, party, invoice_details, raw_items = resolve_spec(spec, self.customers)
+        except ValueError as e:
+            return 400, str(e)
+        if not isinstance(party.get("name"), str) or not party["name"].strip():
+            return 400, "'party.name' must be a non-blank string"
+        for field in CUSTOMER_FIELDS:
+            value = party.get(field)
+            party[field] = "" if value is None else str(value)  # e.g. a phone number sent as a number
+        if not isinstance(raw_items, list) or not all(isinstance(raw, dict) for raw in raw_items):
+            return 400, "'items' must be a list of objects"
+        items, errors = build_items(enumerate(raw_items, start=1))
+        if errors:
+            return 400, "; ".join(f"item {number}: {error}" for number, error in errors)
+        if not items:
+            return 400, "At least one item must be added to the invoice."
+        if output_format == "pdf":
+            try:
+                check_printable(party, invoice_details, items)
+            except ValueError as e:
+                return 400, str(e)
+
+        key = None
+        if self.cache is not None:
+            key = invoice_cache_key(party, invoice_details, items, output_format=output_format)
+            entry = self.cache.get(key)
+            if entry is not None:
+                try:
+                    path = self.cache.restore(key, entry, self.output_dir)
+                except OSError:
+                    pass  # Evicted meanwhile: render it again
+                else:
+                    with self._lock:
+                        self.cache_hits += 1
+                    return 200, (path, entry["invoice_no"])
+
+        # Admission control: refuse rather than queue without bound
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return 503, "Too many invoices being rendered, retry shortly"
+        with self._lock:
+            self.in_flight += 1
+        abandoned = False
+
+        def finished(future):
+            # The slot is held until the worker is really done, even if the request gave up on it
+            try:
+                with self._lock:
+                    late = abandoned
+                if late:
+                    self._finish_late(future, party, invoice_details, items, key)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self._slots.release()
+
+        pool = self._pool
+        try:
+            if not invoice_details.get("invoice_no") and self.cache is not None:
+                invoice_details["invoice_no"] = known_invoice_no(self.cache, party, invoice_details, items,
+                                                                 output_format=output_format)
+            if not invoice_details.get("invoice_no"):
+                invoice_details["invoice_no"] = self.numbers.next_invoice_no()
+            future = pool.submit(render_job, (invoice_id, party, invoice_details, raw_items,
+                                              {"output_dir": self.output_dir, "output_format": output_format}))
+        except BrokenProcessPool:
+            finished(None)
+            self._restart_pool(pool)
+            return 503, "Render workers restarted, retry shortly"
+        except BaseException:
+            finished(None)
+            raise
+        future.add_done_callback(finished)
+        try:
+            try:
+                _, path, error = future.result(timeout=self.render_timeout)
+            except FutureTimeout:
+                with self._lock:
+                    # Unless it finished just now, the worker's result is recorded by finished()
+                    abandoned = not future.done()
+                if abandoned:
+                    return 504, "Rendering timed out"
+                _, path, error = future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed or out of memory) and took the pool with it
+            self._restart_pool(pool)
+            return 503, "Render workers restarted, retry shortly"
+        if error:
+            return 500, error
+        self._record(party, invoice_details, items, path, key)
+        return 200, (path, invoice_details["invoice_no"])
+
+    def _restart_pool(self, broken):
+        """Replaces a pool that lost a worker, where every later render would fail, unless that is done already."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self.pool_restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, party, invoice_details, items, path, key):
+        """Registers a rendered invoice and adds it to the cache."""
+        if self.register is not None:
+            self.register.record(party, invoice_details, items, path)
+        if key is not None:
+            self.cache.put(key, path, invoice_details["invoice_no"])
+
+    def _finish_late(self, future, party, invoice_details, items, key):
+        """Records a render that finished after its request timed out, so its number and file are not lost.
+
+        A retry of the same request is then served from the cache with that number.
+        """
+        try:
+            _, path, error = future.result()
+        except Exception:
+            return  # The worker died; nothing was written
+        if not error:
+            self._record(party, invoice_details, items, path, key)
+
+    def health(self):
+        with self._lock:
+            return {"status": "ok", "workers": self.workers, "in_flight": self.in_flight,
+                    "queue_limit": self.queue_limit, "rejected": self.rejected, "cache_hits": self.cache_hits,
+                    "pool_restarts": self.pool_restarts}
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.numbers.close()
+        if self.register is not None:
+            self.register.close()
+        self.customers.close()
+
+
+class InvoiceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "InvoiceService/1.0"
+    protocol_version = "HTTP/1.1"
+    timeout = 30  # seconds a client may take to send its request
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/invoices":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_json(411, {"error": "Content-Length required"})
+            return
+        if length < 0:
+            self._send_json(400, {"error": "Invalid Content-Length"})
+            self.close_connection = True
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "Request body too large"})
+            self.close_connection = True
+            return
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Expected a JSON object"})
+            return
+
+        query = parse_qs(url.query)
+        output_format = query.get("format", ["xlsx"])[0]
+        try:
+            status, result = self.service.render(payload, output_format)
+        except Exception as e:
+            # Still answer the client, rather than dropping the connection
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        if status != 200:
+            headers = {"Retry-After": "1"} if status == 503 else {}
+            self._send_json(status, {"error": result}, headers)
+            return
+        path, invoice_no = result
+        if query.get("return") == ["path"]:
+            self._send_json(200, {"path": path, "invoice_no": invoice_no})
+        else:
+            with open(path, "rb") as f:
+                body = f.read()
+            self._send(200, body, CONTENT_TYPES[output_format], {
+                "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"',
+                "X-Invoice-Path": path,
+                "X-Invoice-No": invoice_no,
+            })
+
+    def _send_json(self, status, obj, headers=None):
+        self._send(status, json.dumps(obj).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host, port, service, quiet=False):
+    """Returns a ThreadingHTTPServer for service (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), InvoiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve invoice rendering over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--queue-limit", type=int, default=None,
+                        help="renders in flight before returning 503 (default: 4 per worker)")
+    parser.add_argument("--render-timeout", type=float, default=60.0, help="seconds before a render returns 504")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds a client may take to send a request")
+    parser.add_argument("--customers", default=None, help="customer database for party_key lookups (.xlsx or .db)")
+    parser.add_argument("--output-dir", default=os.getcwd(), help="where to write invoices (default: current directory)")
+    parser.add_argument("--numbers", default=NUMBERS_FILE, help="invoice number counter file (default: %(default)s)")
+    parser.add_argument("--register", default=REGISTER_FILE, help="invoice register to record into (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="always render, even for a repeated invoice")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    args = parser.parse_args(argv)
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    customers = open_customer_repository(args.customers) if args.customers else MemoryCustomerRepository()
+    cache = None if args.no_cache else RenderCache(os.path.join(output_dir, CACHE_DIR))
+    service = InvoiceService(output_dir, customers, args.workers, args.queue_limit, args.render_timeout, args.numbers,
+                             cache=cache, register=InvoiceRegister(args.register))
+    InvoiceRequestHandler.timeout = args.timeout
+    server = make_server(args.host, args.port, service, args.quiet)
+    print(f"Serving invoices on http://{args.host}:{server.server_address[1]}/invoices "
+          f"({service.workers} workers, queue limit {service.queue_limit})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Invoice template: the static parts of the Excel invoice, built once per process.
+
+An InvoiceTemplate holds the style definitions (registered as NamedStyles in
+each new workbook), the logo bytes read and measured once, and the header
+and footer as prebuilt cell specs. Renderers stamp an invoice from it and
+only have to produce the item rows and totals themselves.
+
+A workbook may hold several invoice sheets (see invoice_engine.generate_invoice_archive). Every
+sheet's logo points at the same media part, and save_workbook writes that
+part once.
+"""
+from functools import lru_cache
+import os
+
+from invoice_metrics import span
+
+# Bump whenever the rendered output changes, so cached renders are not reused
+TEMPLATE_VERSION = 2
+
+# --- Invoice Layout ---
+COMPANY_NAME = "Anant Enterprises"
+COMPANY_ADDRESS_LINES = [
+    "18/560, New industrial estate",
+    "Ichalkaranji Opp. ASC College, Kolhapur, Maharashtra, 416115",
+    "GSTIN: 27FQLPP6106G1ZK",
+]
+BANK_DETAILS_LINES = [
+    "A/C: ANANT ENTERPRISES",
+    "A/C No.: 50200104022360",
+    "IFSC Code: HDFC0007957",
+    "Branch: Ichalkaranji",
+]
+ITEM_HEADERS = ["Sr.", "HSN/SAC Code", "Description of Goods", "Quantity", "Rate", "Subtotal", "Discount (%)", "CGST (%)", "SGST (%)", "Total (Incl. Tax)"]
+COLUMN_WIDTHS = {'A': 5, 'B': 13, 'C': 30, 'D': 10, 'E': 10, 'F': 9, 'G': 15, 'H': 13, 'I': 13, 'J': 15}
+LOGO_MERGED_RANGES = ['E1:G1', 'E2:G2', 'E3:G3']
+LOGO_SIZE = (250, 80)  # pixels, approximately the merged cells
+LOGO_MEDIA_PATH = "/xl/media/logo.{}"
+INVOICE_SHEET_TITLE = "Tax Invoice"
+FIRST_ITEM_ROW = 14
+
+# --- Named Styles ---
+STYLE_HEADING = "Invoice Heading"
+STYLE_BOLD = "Invoice Bold"
+STYLE_TABLE_HEADER = "Invoice Table Header"
+STYLE_CELL = "Invoice Cell"
+STYLE_CELL_WRAP = "Invoice Cell Wrapped"
+STYLE_TOTAL = "Invoice Total"
+
+# Item row styles, column A..J
+ITEM_ROW_STYLES = [STYLE_CELL, STYLE_CELL_WRAP, STYLE_CELL_WRAP] + [STYLE_CELL] * 7
+
+# Cell specs are (value, style). A _Text value is filled in with str.format_map
+# and a _Field value is replaced as-is (numbers stay numbers) per invoice.
+
+
+class _Text(str):
+    pass
+
+
+class _Field(str):
+    pass
+
+
+def _resolve(value, fields):
+    if isinstance(value, _Field):
+        return fields[value]
+    if isinstance(value, _Text):
+        return value.format_map(fields)
+    return value
+
+
+def _style_definitions():
+    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+
+    regular = Font(name='Calibri', size=11)
+    bold = Font(name='Calibri', size=11, bold=True)
+    border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                    top=Side(style='thin'), bottom=Side(style='thin'))
+    center = Alignment(horizontal='center', vertical='center')
+    return {
+        STYLE_HEADING: dict(font=Font(name='Calibri', size=16, bold=True)),
+        STYLE_BOLD: dict(font=bold),
+        STYLE_TABLE_HEADER: dict(font=bold, border=border,
+                                 fill=PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")),
+        STYLE_CELL: dict(font=regular, alignment=center, border=border),
+        STYLE_CELL_WRAP: dict(font=regular, alignment=Alignment(horizontal='center', vertical='center', wrap_text=True), border=border),
+        STYLE_TOTAL: dict(font=bold, alignment=center),
+    }
+
+
+def _read_logo(logo_path):
+    """Returns (bytes, format, size) for the logo, or None if there is no logo file."""
+    if not os.path.exists(logo_path):
+        return None
+    from PIL import Image as PILImage
+
+    with open(logo_path, "rb") as f:
+        data = f.read()
+    with PILImage.open(logo_path) as image:
+        fmt = (image.format or "png").lower()
+    return data, fmt, LOGO_SIZE
+
+
+def _header_rows():
+    """Rows 1-13: company header, buyer and date details, item table headings."""
+    blank = [None] * 5
+    return [
+        [(COMPANY_NAME, STYLE_HEADING)],
+        *[[(line, None)] for line in COMPANY_ADDRESS_LINES],
+        [],
+        [("BILL TO:", STYLE_BOLD), *blank, ("INVOICE DATE:", STYLE_BOLD), (_Field("sale_date"), None)],
+        [(_Text("Party Name: {name}"), None), *blank, ("DELIVERY DATE:", STYLE_BOLD), (_Field("delivery_date"), None)],
+        [(_Text("GST No.: {gst}"), None), *blank, ("INVOICE NO.:", STYLE_BOLD), (_Field("invoice_no"), None)],
+        [(_Text("Address: {address}"), None)],
+        [(_Text("Phone: {phone}"), None)],
+        [(_Text("Email: {email}"), None)],
+        [],
+        [(header, STYLE_TABLE_HEADER) for header in ITEM_HEADERS],
+    ]
+
+
+def _footer_rows():
+    """The rows after the items: a blank row, then totals, signature and bank details."""
+    blank = [None] * 5
+    return [
+        [],
+        [("Bank Details:", STYLE_BOLD), None, None, (f"For {COMPANY_NAME}", STYLE_BOLD), None, None,
+         ("Total GST:", STYLE_BOLD), (_Field("total_gst"), STYLE_TOTAL)],
+        [(BANK_DETAILS_LINES[0], None), *blank, ("Total Discount:", STYLE_BOLD), (_Field("total_discount"), STYLE_TOTAL)],
+        [(BANK_DETAILS_LINES[1], None), *blank, ("TOTAL (Incl. Tax):", STYLE_BOLD), (_Field("total_invoice_amount"), STYLE_TOTAL)],
+        [(BANK_DETAILS_LINES[2], None)],
+        [(BANK_DETAILS_LINES[3], None), None, None, ("Authority Signatory", STYLE_BOLD)],
+    ]
+
+
+class _CachedLogo:
+    """Factory for openpyxl images that reuse one in-memory copy of the logo."""
+
+    def __init__(self, data, fmt, size):
+        from openpyxl.drawing.image import Image as XLImage
+
+        class CachedImage(XLImage):
+            def __init__(self):
+                # Skips XLImage.__init__, which would reopen and decode the file
+                self.ref = None
+                self.format = fmt
+                self.width, self.height = size
+
+            @property
+            def path(self):
+                # One media part for every sheet in the workbook
+                return LOGO_MEDIA_PATH.format(fmt)
+
+            def _data(self):
+                return data
+
+        self._image_class = CachedImage
+
+    def new_image(self):
+        return self._image_class()
+
+
+class InvoiceTemplate:
+    """The static invoice parts, prepared once and stamped onto each new workbook."""
+
+    def __init__(self, logo_path):
+        self.styles = _style_definitions()
+        logo = _read_logo(logo_path)
+        self.logo_source = logo  # (bytes, format, size) for other renderers, or None
+        self.logo = _CachedLogo(*logo) if logo else None
+        self.header_rows = _header_rows()
+        self.footer_rows = _footer_rows()
+
+    def new_workbook(self, write_only=False):
+        """Returns (workbook, worksheet) with the named styles, logo and page layout in place."""
+        wb = self.empty_workbook(write_only)
+        if write_only:
+            ws = self.add_sheet(wb, INVOICE_SHEET_TITLE)
+        else:
+            ws = wb.active
+            ws.title = INVOICE_SHEET_TITLE
+            self._lay_out(ws)
+        return wb, ws
+
+    def empty_workbook(self, write_only=False):
+        """Returns a workbook with the named styles registered and no invoice sheets."""
+        import openpyxl
+        from openpyxl.styles import NamedStyle
+
+        wb = openpyxl.Workbook(write_only=write_only)
+        # NamedStyle objects are bound to a single workbook, so each one gets
+        # its own; the Font/Border/Fill/Alignment objects inside are shared.
+        for name, definition in self.styles.items():
+            wb.add_named_style(NamedStyle(name=name, **definition))
+        return wb
+
+    def add_sheet(self, wb, title):
+        """Adds an invoice sheet (logo and page layout in place) to a workbook from empty_workbook."""
+        ws = wb.create_sheet(title)
+        self._lay_out(ws)
+        return ws
+
+    def _lay_out(self, ws):
+        from openpyxl.worksheet.worksheet import Worksheet
+
+        # --- Merge cells for logo & insert logo image ---
+        for cell_range in LOGO_MERGED_RANGES:
+            ws.merged_cells.add(cell_range)
+        if self.logo is not None:
+            ws.add_image(self.logo.new_image(), 'E1')
+
+        # --- Column Widths for readability ---
+        for column, width in COLUMN_WIDTHS.items():
+            ws.column_dimensions[column].width = width
+
+        # --- Page Layout: Scale to Fit (1 page width) ---
+        ws.page_setup.paperSize = Worksheet.PAPERSIZE_LETTER
+        ws.print_options.horizontalCentered = True
+        ws.page_setup.fitToPage = True
+        ws.page_setup.fitToHeight = 0
+        ws.page_setup.fitToWidth = 1
+
+    @staticmethod
+    def header_fields(party_details, invoice_details):
+        """Per-invoice values for the header placeholders."""
+        return {
+            "name": party_details['name'],
+            "gst": party_details['gst'],
+            "address": party_details['address'],
+            "phone": party_details.get('phone', ''),
+            "email": party_details.get('email', ''),
+            "sale_date": invoice_details['sale_date'],
+            "delivery_date": invoice_details['delivery_date'],
+            "invoice_no": invoice_details.get('invoice_no', ''),
+        }
+
+    @staticmethod
+    def resolve_rows(rows, fields):
+        """Yields each row as a list of (value, style) or None, placeholders filled in."""
+        for row in rows:
+            yield [None if spec is None else (_resolve(spec[0], fields), spec[1]) for spec in row]
+
+
+def save_workbook(wb, path):
+    """Saves wb like Workbook.save, but writes media shared by several sheets (the logo) only once."""
+    import datetime
+    from zipfile import ZipFile, ZIP_DEFLATED
+    from openpyxl.writer.excel import ExcelWriter
+
+    class SharedMediaWriter(ExcelWriter):
+        def _write_images(self):
+            written = set()
+            with span("render.logo"):
+                for image in self._images:
+                    if image.path not in written:
+                        written.add(image.path)
+                        self._archive.writestr(image.path[1:], image._data())
+
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    with ZipFile(path, 'w', ZIP_DEFLATED, allowZip64=True) as archive:
+        SharedMediaWriter(wb, archive).save()
+
+
+@lru_cache(maxsize=4)
+def _load_template(logo_path, logo_mtime):
+    return InvoiceTemplate(logo_path)
+
+
+def get_template(logo_path):
+    """Returns the process-wide template, rebuilt only if logo.jpg changes."""
+    try:
+        logo_mtime = os.stat(logo_path).st_mtime
+    except OSError:
+        logo_mtime = None
+    return _load_template(os.path.abspath(logo_path), logo_mtime)
@@ -0,0 +1,145 @@
+"""Virtualized item table for the invoice window.
+
+ItemGrid shows an ItemList in a ttk.Treeview that only ever holds the rows
+currently on screen. Scrolling moves a window over the list and re-fills
+those few rows, so a 20,000-line invoice costs the same to display as a
+20-line one. Treeview row ids are the ItemList ids.
+"""
+from tkinter import ttk
+
+from line_items import rupees
+
+COLUMNS = [
+    # (column, heading, width, anchor)
+    ("HSN/SAC", "HSN/SAC Code", 100, "center"),
+    ("Description", "Description", 200, "w"),
+    ("Qty", "Quantity", 80, "center"),
+    ("Rate", "Rate", 100, "e"),
+    ("Discount", "Discount", 80, "center"),
+    ("CGST", "CGST", 80, "center"),
+    ("SGST", "SGST", 80, "center"),
+    ("Total", "Total Amount", 120, "e"),
+]
+DEFAULT_ROW_HEIGHT = 20
+HEADING_HEIGHT = 25
+
+
+def row_values(item, amounts):
+    """The Treeview values shown for one item."""
+    subtotal, cgst_amount, sgst_amount, discount_amount, total_with_tax = amounts
+    return (
+        item.hsn,
+        item.description,
+        f"{item.quantity:.2f}",
+        f"{item.rate:.2f}",
+        f"{item.discount_percent:.2f}",
+        f"{rupees(cgst_amount):.2f}",
+        f"{rupees(sgst_amount):.2f}",
+        f"{rupees(total_with_tax):.2f}"
+    )
+
+
+class ItemGrid(ttk.Frame):
+    """A Treeview with its own scrollbar that materializes only the visible rows."""
+
+    def __init__(self, parent, items, height=10):
+        super().__init__(parent)
+        self.items = items
+        self.offset = 0
+        self.rows = height
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in COLUMNS], show="headings", height=height)
+        for column, heading, width, anchor in COLUMNS:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor=anchor)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.rows))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.rows))
+
+    def bind_rows(self, sequence, func):
+        self.tree.bind(sequence, func, add="+")
+
+    def selection(self):
+        """Returns the selected item ids."""
+        return self.tree.selection()
+
+    def refresh(self):
+        """Re-fills the visible rows from the item list."""
+        self.offset = max(0, min(self.offset, len(self.items) - self.rows))
+        selected = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        for item_id in self.items.ids(self.offset, self.offset + self.rows):
+            self.tree.insert("", "end", iid=item_id,
+                             values=row_values(self.items[item_id], self.items.amounts(item_id)))
+        visible = [item_id for item_id in selected if self.tree.exists(item_id)]
+        if visible:
+            self.tree.selection_set(visible)
+        self._update_scrollbar()
+
+    def refresh_row(self, item_id):
+        """Redraws one item in place if it is on screen."""
+        if self.tree.exists(item_id):
+            self.tree.item(item_id, values=row_values(self.items[item_id], self.items.amounts(item_id)))
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.refresh()
+        return "break"
+
+    def scroll_to_end(self):
+        self.offset = len(self.items)
+        self.refresh()
+
+    def _update_scrollbar(self):
+        count = len(self.items)
+        if count <= self.rows:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / count, (self.offset + self.rows) / count)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.items))
+            self.refresh()
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.rows if unit == "pages" else 1))
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_resize(self, event):
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        row_height = int(row_height) if row_height else DEFAULT_ROW_HEIGHT
+        rows = max(1, (event.height - HEADING_HEIGHT) // row_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def _move_selection(self, step):
+        """Moves the selection one row, scrolling when it leaves the visible window."""
+        children = self.tree.get_children()
+        selected = self.tree.selection()
+        if not children or not selected:
+            return None
+        position = children.index(selected[0]) + step
+        if 0 <= position < len(children):
+            target = children[position]
+        else:
+            # Step past the window: scroll one row and select the new edge row
+            self.scroll(step)
+            children = self.tree.get_children()
+            if not children:
+                return "break"
+            target = children[0] if step < 0 else children[-1]
+        self.tree.selection_set(target)
+        self.tree.focus(target)
+        return "break"
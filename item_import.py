@@ -0,0 +1,99 @@
+"""Bulk line-item import from a CSV file or rows pasted from a spreadsheet.
+
+Rows are comma- or tab-separated. If the first row names at least two
+columns (e.g. "HSN/SAC Code, Description, Qty, Rate, Discount, CGST, SGST")
+they may come in any order and unknown columns are ignored; otherwise the
+columns are taken in ITEM_FIELDS order. Every row is validated before
+anything is added, and all bad rows are reported together, with the
+problem in each field (e.g. "Quantity is required").
+"""
+import csv
+import io
+
+from invoice_engine import ITEM_FIELDS, build_item_from_row
+from item_preview import REQUIRED_FIELDS, check_field
+
+# Other column headings accepted for each item field
+COLUMN_ALIASES = {
+    "hsn": "hsn", "hsn/sac": "hsn", "hsn/sac code": "hsn", "hsn code": "hsn", "sac": "hsn",
+    "description": "description", "description of goods": "description", "desc": "description", "item": "description",
+    "quantity": "quantity", "qty": "quantity",
+    "rate": "rate", "price": "rate",
+    "discount": "discount", "disc": "discount",
+    "cgst": "cgst", "gst": "cgst",
+    "sgst": "sgst",
+}
+# How each field is named in error messages
+FIELD_LABELS = {
+    "hsn": "HSN/SAC", "description": "Description", "quantity": "Quantity", "rate": "Rate",
+    "discount": "Discount", "cgst": "CGST", "sgst": "SGST",
+}
+# A first row naming at least this many known columns is taken as the headings
+MIN_HEADING_COLUMNS = 2
+
+
+def _column_field(heading):
+    heading = heading.strip().lower().replace("(%)", "").replace("%", "").strip()
+    return COLUMN_ALIASES.get(heading)
+
+
+def read_item_rows(text):
+    """Splits CSV or tab-separated text into [(line_no, {field: value})], skipping blank rows."""
+    lines = text.splitlines()
+    if not lines:
+        return []
+    delimiter = "\t" if "\t" in lines[0] else ","
+    rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+    fields = [_column_field(cell) for cell in rows[0]] if rows else []
+    first_row = 0
+    if len(set(fields) - {None}) >= MIN_HEADING_COLUMNS:
+        first_row = 1
+    else:
+        fields = list(ITEM_FIELDS)
+
+    parsed = []
+    for line_no, row in enumerate(rows[first_row:], start=first_row + 1):
+        if not any(cell.strip() for cell in row):
+            continue
+        parsed.append((line_no, {field: cell.strip() for field, cell in zip(fields, row) if field}))
+    return parsed
+
+
+def read_item_file(path):
+    """Reads item rows from a CSV (or tab-separated) file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return read_item_rows(f.read())
+
+
+def _row_error(raw):
+    """Returns the problems with each field of a raw row, e.g. "Quantity is required", or None."""
+    problems = []
+    for field in ITEM_FIELDS:
+        value = raw.get(field)
+        if field == "cgst" and value is None:
+            value = raw.get("gst")
+        text = "" if value is None else str(value)
+        if not text.strip():
+            if field in REQUIRED_FIELDS:
+                problems.append(f"{FIELD_LABELS[field]} is required")
+            continue
+        error = check_field(field, text)
+        if error:
+            problems.append(f"{FIELD_LABELS[field]}: {error}")
+    return "; ".join(problems) or None
+
+
+def build_items(rows):
+    """Validates [(line_no, raw)] in one pass. Returns (items, [(line_no, error)])."""
+    items, errors = [], []
+    for line_no, raw in rows:
+        error = _row_error(raw)
+        if error:
+            errors.append((line_no, error))
+            continue
+        try:
+            items.append(build_item_from_row(raw))
+        except ValueError as e:
+            errors.append((line_no, str(e)))
+    return items, errors
@@ -0,0 +1,85 @@
+"""Live validation and calculation of the line item being typed.
+
+preview_item() takes the item form's text as it stands and returns the
+parsed item with its amounts, or the problem with each field, using the
+same rules as build_item(). Blank required fields are reported separately
+from invalid ones, so the form can mark a bad number straight away without
+flagging fields the operator simply has not reached yet.
+
+Both the per-field parsing and the whole preview are memoised on the exact
+text, so a keystroke only parses the field that changed, and retyping a
+value seen before (or re-checking an unchanged form on Enter) costs a dict
+lookup.
+"""
+from functools import lru_cache
+
+from invoice_engine import ITEM_FIELDS, build_item, parse_percent
+from line_items import PAISE_PER_RUPEE, QTY_SCALE, calculate_item, to_fixed
+
+# Texts remembered per field, and whole forms
+FIELD_CACHE_SIZE = 1024
+PREVIEW_CACHE_SIZE = 256
+
+REQUIRED_FIELDS = ("description", "quantity", "rate")
+_PERCENT_FIELDS = ("discount", "cgst", "sgst")
+
+
+class ItemPreview:
+    """The item form's parse result: item and amounts when valid, otherwise the problems per field."""
+
+    __slots__ = ("item", "amounts", "errors", "missing")
+
+    def __init__(self, item=None, amounts=None, errors=None, missing=()):
+        self.item = item
+        self.amounts = amounts  # (subtotal, cgst, sgst, discount, total) in paise
+        self.errors = errors or {}  # field -> message, for fields holding an invalid value
+        self.missing = missing  # required fields left blank
+
+    @property
+    def valid(self):
+        return self.item is not None
+
+    @property
+    def blank(self):
+        """True if nothing has been typed that could be checked yet."""
+        return self.item is None and not self.errors and len(self.missing) == len(REQUIRED_FIELDS)
+
+
+@lru_cache(maxsize=FIELD_CACHE_SIZE)
+def check_field(field, text):
+    """Returns an error message for one field's text, or None if it is valid (or blank)."""
+    text = text.strip()
+    if not text or field in ("hsn", "description"):
+        return None
+    if field in _PERCENT_FIELDS:
+        try:
+            value = parse_percent(text)
+        except ValueError:
+            return "enter a percentage like 18 or 18%"
+        return "cannot be negative" if value < 0 else None
+    try:
+        value = to_fixed(text, QTY_SCALE if field == "quantity" else PAISE_PER_RUPEE)
+    except ValueError:
+        return "enter a number"
+    return "must be more than 0" if value <= 0 else None
+
+
+@lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def preview_item(hsn, description, quantity, rate, discount, cgst, sgst):
+    """Validates and calculates the typed item (all arguments are the fields' text). Returns an ItemPreview.
+
+    The same ItemPreview (and LineItem) is returned for the same text, so
+    treat both as read-only.
+    """
+    texts = (hsn, description, quantity, rate, discount, cgst, sgst)
+    errors = {}
+    for field, text in zip(ITEM_FIELDS, texts):
+        error = check_field(field, text)
+        if error:
+            errors[field] = error
+    missing = tuple(field for field, text in zip(ITEM_FIELDS, texts)
+                    if field in REQUIRED_FIELDS and not text.strip())
+    if errors or missing:
+        return ItemPreview(errors=errors, missing=missing)
+    item = build_item(*texts)
+    return ItemPreview(item, calculate_item(item))
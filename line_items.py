@@ -0,0 +1,322 @@
+"""Compact fixed-point line items and the batched invoice calculation.
+
+Line items are __slots__ records holding exact integers: money in paise,
+quantities in thousandths of a unit and percentages in hundredths of a
+percent. calculate() works out every row amount and all invoice totals in a
+single pass, vectorised with NumPy for large batches when it is installed.
+
+Per row, each amount is rounded half-up to the paisa:
+    subtotal = qty * rate
+    cgst     = subtotal * CGST% / 100
+    sgst     = subtotal * SGST% / 100
+    discount = subtotal * Discount% / 100
+    total    = subtotal + cgst + sgst - discount
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import itertools
+
+PAISE_PER_RUPEE = 100
+QTY_SCALE = 1000       # quantities in thousandths of a unit
+PERCENT_SCALE = 100    # percentages in hundredths of a percent
+
+# Below this many rows the NumPy set-up costs more than it saves
+NUMPY_MIN_ROWS = 64
+
+# NumPy is imported on the first batch big enough to use it, so small
+# invoices (and app start-up) never pay for it; False once found missing
+_numpy = None
+_INT64_MAX = 2 ** 63 - 1
+
+
+def to_fixed(value, scale):
+    """Converts a number or numeric string to an integer count of 1/scale units."""
+    if isinstance(value, int):
+        return value * scale
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"could not convert {value!r} to a number")
+    if not number.is_finite():
+        raise ValueError(f"could not convert {value!r} to a number")
+    return int((number * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def fixed_text(value, scale):
+    """Formats an integer count of 1/scale units exactly, e.g. 1234567 paise -> "12345.67", 2500 milli -> "2.5"."""
+    return format(Decimal(value) / scale, "f")
+
+
+def rupees(paise):
+    """Converts paise to a rupee float for display and Excel."""
+    return paise / PAISE_PER_RUPEE
+
+
+class LineItem:
+    """One invoice line, stored as exact integers."""
+
+    __slots__ = ("hsn", "description", "quantity_milli", "rate_paise", "discount_bp", "cgst_bp", "sgst_bp")
+
+    def __init__(self, hsn, description, quantity_milli, rate_paise, discount_bp=0, cgst_bp=0, sgst_bp=0):
+        self.hsn = hsn
+        self.description = description
+        self.quantity_milli = quantity_milli
+        self.rate_paise = rate_paise
+        self.discount_bp = discount_bp
+        self.cgst_bp = cgst_bp
+        self.sgst_bp = sgst_bp
+
+    @property
+    def quantity(self):
+        return self.quantity_milli / QTY_SCALE
+
+    @property
+    def rate(self):
+        return self.rate_paise / PAISE_PER_RUPEE
+
+    @property
+    def discount_percent(self):
+        return self.discount_bp / PERCENT_SCALE
+
+    @property
+    def cgst_percent(self):
+        return self.cgst_bp / PERCENT_SCALE
+
+    @property
+    def sgst_percent(self):
+        return self.sgst_bp / PERCENT_SCALE
+
+    def __repr__(self):
+        return (f"LineItem({self.hsn!r}, {self.description!r}, {self.quantity_milli}, {self.rate_paise}, "
+                f"{self.discount_bp}, {self.cgst_bp}, {self.sgst_bp})")
+
+
+class InvoiceTotals:
+    """Invoice-level sums in paise. Integer amounts keep add/remove exact, with no drift."""
+
+    __slots__ = ("subtotal", "cgst", "sgst", "discount", "total")
+
+    def __init__(self, subtotal=0, cgst=0, sgst=0, discount=0, total=0):
+        self.subtotal = subtotal
+        self.cgst = cgst
+        self.sgst = sgst
+        self.discount = discount
+        self.total = total
+
+    @property
+    def gst(self):
+        return self.cgst + self.sgst
+
+    def add(self, amounts):
+        """Adds one row's (subtotal, cgst, sgst, discount, total)."""
+        subtotal, cgst, sgst, discount, total = amounts
+        self.subtotal += subtotal
+        self.cgst += cgst
+        self.sgst += sgst
+        self.discount += discount
+        self.total += total
+
+    def remove(self, amounts):
+        """Takes one row's (subtotal, cgst, sgst, discount, total) back out."""
+        subtotal, cgst, sgst, discount, total = amounts
+        self.subtotal -= subtotal
+        self.cgst -= cgst
+        self.sgst -= sgst
+        self.discount -= discount
+        self.total -= total
+
+    def copy(self):
+        return InvoiceTotals(self.subtotal, self.cgst, self.sgst, self.discount, self.total)
+
+    def __iadd__(self, other):
+        self.subtotal += other.subtotal
+        self.cgst += other.cgst
+        self.sgst += other.sgst
+        self.discount += other.discount
+        self.total += other.total
+        return self
+
+    def __repr__(self):
+        return (f"InvoiceTotals(subtotal={self.subtotal}, cgst={self.cgst}, sgst={self.sgst}, "
+                f"discount={self.discount}, total={self.total})")
+
+
+class Calculation:
+    """Per-row amounts (lists of paise, in item order) plus the invoice totals."""
+
+    __slots__ = ("subtotal", "cgst", "sgst", "discount", "total", "totals")
+
+    def __init__(self, subtotal, cgst, sgst, discount, total, totals):
+        self.subtotal = subtotal
+        self.cgst = cgst
+        self.sgst = sgst
+        self.discount = discount
+        self.total = total
+        self.totals = totals
+
+    def __len__(self):
+        return len(self.total)
+
+    def row(self, index):
+        """Returns (subtotal, cgst, sgst, discount, total) for one row."""
+        return self.subtotal[index], self.cgst[index], self.sgst[index], self.discount[index], self.total[index]
+
+
+def _div_round(numerator, denominator):
+    """Integer division rounded half-up (operands are non-negative)."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def _calculate_python(items):
+    subtotals, cgsts, sgsts, discounts, totals = [], [], [], [], []
+    sums = InvoiceTotals()
+    percent_denominator = 100 * PERCENT_SCALE
+    for item in items:
+        subtotal = _div_round(item.quantity_milli * item.rate_paise, QTY_SCALE)
+        cgst = _div_round(subtotal * item.cgst_bp, percent_denominator)
+        sgst = _div_round(subtotal * item.sgst_bp, percent_denominator)
+        discount = _div_round(subtotal * item.discount_bp, percent_denominator)
+        subtotals.append(subtotal)
+        cgsts.append(cgst)
+        sgsts.append(sgst)
+        discounts.append(discount)
+        total = subtotal + cgst + sgst - discount
+        totals.append(total)
+        sums.subtotal += subtotal
+        sums.cgst += cgst
+        sums.sgst += sgst
+        sums.discount += discount
+        sums.total += total
+    return Calculation(subtotals, cgsts, sgsts, discounts, totals, sums)
+
+
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+
+def _calculate_numpy(items, np):
+    """Vectorised calculate(); returns None if the amounts could overflow int64 (Python ints never do)."""
+    count = len(items)
+    try:
+        columns = np.array(
+            [(i.quantity_milli, i.rate_paise, i.cgst_bp, i.sgst_bp, i.discount_bp) for i in items],
+            dtype=np.int64,
+        ).reshape(count, 5)
+    except OverflowError:
+        return None
+    quantity, rate, cgst_bp, sgst_bp, discount_bp = columns.T
+    percent_denominator = 100 * PERCENT_SCALE
+
+    # The largest intermediate values (row products and column sums), worked out exactly in Python ints
+    largest_qty, largest_rate, *percents = (int(value) for value in np.abs(columns).max(axis=0))
+    largest_subtotal = _div_round(largest_qty * largest_rate, QTY_SCALE)
+    largest_bp = max(percents)
+    largest_row = largest_subtotal + 3 * _div_round(largest_subtotal * largest_bp, percent_denominator)
+    if max(2 * largest_qty * largest_rate + QTY_SCALE, 2 * largest_subtotal * largest_bp + percent_denominator,
+           largest_row * count) > _INT64_MAX:
+        return None
+
+    subtotal = (2 * quantity * rate + QTY_SCALE) // (2 * QTY_SCALE)
+    cgst = (2 * subtotal * cgst_bp + percent_denominator) // (2 * percent_denominator)
+    sgst = (2 * subtotal * sgst_bp + percent_denominator) // (2 * percent_denominator)
+    discount = (2 * subtotal * discount_bp + percent_denominator) // (2 * percent_denominator)
+    total = subtotal + cgst + sgst - discount
+    sums = InvoiceTotals(*(int(column.sum()) for column in (subtotal, cgst, sgst, discount, total)))
+    return Calculation(subtotal.tolist(), cgst.tolist(), sgst.tolist(), discount.tolist(), total.tolist(), sums)
+
+
+def calculate(items):
+    """Calculates every row amount and the invoice totals in one pass over items."""
+    if not isinstance(items, (list, tuple)):
+        items = list(items)
+    if len(items) >= NUMPY_MIN_ROWS:
+        np = _load_numpy()
+        if np:
+            calculation = _calculate_numpy(items, np)
+            if calculation is not None:
+                return calculation
+    return _calculate_python(items)
+
+
+def calculate_item(item):
+    """Returns (subtotal, cgst, sgst, discount, total) in paise for a single item."""
+    return _calculate_python((item,)).row(0)
+
+
+class ItemList:
+    """The items of one invoice, keyed by a stable id in the order they were added.
+
+    Adding, replacing and removing an item are dict operations, and each
+    one adjusts the running totals by that row's amounts only.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._amounts = {}
+        self._ids = itertools.count(1)
+        self.totals = InvoiceTotals()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def __getitem__(self, item_id):
+        return self._items[item_id]
+
+    def amounts(self, item_id):
+        """Returns (subtotal, cgst, sgst, discount, total) in paise for one item."""
+        return self._amounts[item_id]
+
+    def calculation(self):
+        """Returns the stored amounts of every item, in order, as a Calculation (nothing is recalculated)."""
+        columns = [list(column) for column in zip(*self._amounts.values())] or [[], [], [], [], []]
+        return Calculation(*columns, self.totals.copy())
+
+    def ids(self, start=0, stop=None):
+        """Returns the ids of items start..stop in invoice order."""
+        return list(itertools.islice(self._items, start, stop))
+
+    def add(self, item, amounts=None):
+        """Appends an item and returns its id."""
+        item_id = f"I{next(self._ids)}"
+        self._store(item_id, item, amounts)
+        return item_id
+
+    def extend(self, items):
+        """Appends many items, calculating them in one batch. Returns their ids."""
+        calculation = calculate(items)
+        ids = []
+        for index, item in enumerate(items):
+            item_id = f"I{next(self._ids)}"
+            self._items[item_id] = item
+            self._amounts[item_id] = calculation.row(index)
+            ids.append(item_id)
+        self.totals += calculation.totals
+        return ids
+
+    def replace(self, item_id, item, amounts=None):
+        """Replaces an item in place, keeping its id and position."""
+        self.totals.remove(self._amounts[item_id])
+        self._store(item_id, item, amounts)
+
+    def remove(self, item_id):
+        del self._items[item_id]
+        self.totals.remove(self._amounts.pop(item_id))
+
+    def _store(self, item_id, item, amounts):
+        if amounts is None:
+            amounts = calculate_item(item)
+        self._items[item_id] = item
+        self._amounts[item_id] = amounts
+        self.totals.add(amounts)
@@ -0,0 +1,139 @@
+"""Search index for the saved-party picker.
+
+PartyIndex answers a query two ways:
+
+- prefix: the customer key and every word of the name, the GST number and
+  the phone digits are kept in one sorted list, so all terms starting with
+  the query are found with a bisect and a short forward scan;
+- fuzzy: each customer's text is split into trigrams with posting lists,
+  so misspelt or partial names, GSTINs and phone numbers still match. Only
+  the rarest trigrams of the query are used to pick candidates, which keeps
+  the work per keystroke small even with 100k parties.
+
+Prefix matches are listed first, then fuzzy matches by score.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+import re
+
+FUZZY_MIN_SCORE = 0.5      # share of the query's trigrams a fuzzy match must contain
+FUZZY_MAX_CANDIDATES = 500
+PREFIX_MAX_SCAN = 2000     # terms examined per prefix query
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def _normalize(text):
+    return _NON_WORD.sub(" ", str(text or "").lower()).strip()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PartyIndex:
+    """Prefix and trigram index over customer key, name, GST number and phone."""
+
+    def __init__(self, customers=()):
+        self._terms = []                 # sorted (term, customer_key)
+        self._words = {}                 # customer_key -> normalized words
+        self._postings = defaultdict(list)  # trigram -> [customer_key]
+        for customer_key, customer_data in customers:
+            self._terms.extend(self._index(customer_key, customer_data))
+        self._terms.sort()
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, customer_key, customer_data):
+        """Indexes one more customer."""
+        for term in self._index(customer_key, customer_data):
+            insort(self._terms, term)
+
+    def remove(self, customer_key):
+        """Drops a customer from the index (no-op if it is not indexed)."""
+        words = self._words.pop(customer_key, None)
+        if words is None:
+            return
+        for word in set(words):
+            position = bisect_left(self._terms, (word, customer_key))
+            if position < len(self._terms) and self._terms[position] == (word, customer_key):
+                del self._terms[position]
+        for gram in _trigrams(" ".join(words)):
+            postings = self._postings.get(gram)
+            if postings and customer_key in postings:
+                postings.remove(customer_key)
+
+    def update(self, changed, removed=()):
+        """Re-indexes the changed customers (a key -> data mapping) and drops the removed keys."""
+        for customer_key in removed:
+            self.remove(customer_key)
+        for customer_key, customer_data in changed.items():
+            self.remove(customer_key)
+            self.add(customer_key, customer_data)
+
+    def _index(self, customer_key, customer_data):
+        if customer_key in self._words:
+            return []
+        phone = re.sub(r"\D", "", str(customer_data.get("phone") or ""))
+        words = _normalize(f"{customer_key} {customer_data.get('name', '')} {customer_data.get('gst', '')}").split()
+        if phone:
+            words.append(phone)
+        self._words[customer_key] = tuple(words)
+        for gram in _trigrams(" ".join(words)):
+            self._postings[gram].append(customer_key)
+        return [(word, customer_key) for word in set(words)]
+
+    def search(self, query, limit=50):
+        """Returns up to limit customer keys matching query, best matches first."""
+        query = _normalize(query)
+        if not query:
+            return []
+        results = self._prefix_matches(query, limit)
+        if len(results) < limit and len(query) >= 3:
+            for customer_key in self._fuzzy_matches(query):
+                if customer_key not in results:
+                    results[customer_key] = None
+                    if len(results) == limit:
+                        break
+        return list(results)
+
+    def _term_range(self, prefix):
+        return bisect_left(self._terms, (prefix,)), bisect_left(self._terms, (prefix + "\uffff",))
+
+    def _prefix_matches(self, query, limit):
+        # Every word of the query must prefix some word of the customer;
+        # the word with the fewest matching terms drives the scan.
+        words = query.split()
+        ranges = {word: self._term_range(word) for word in words}
+        lead = min(words, key=lambda word: ranges[word][1] - ranges[word][0])
+        others = [word for word in words if word != lead]
+        start, stop = ranges[lead]
+        matches = {}
+        for term, customer_key in self._terms[start:min(stop, start + PREFIX_MAX_SCAN)]:
+            if customer_key not in matches and all(
+                    any(part.startswith(word) for part in self._words[customer_key]) for word in others):
+                matches[customer_key] = None
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def _fuzzy_matches(self, query):
+        grams = _trigrams(query)
+        needed = max(1, int(len(grams) * FUZZY_MIN_SCORE + 0.999))
+        # A key holding `needed` of the query's trigrams must hold at least
+        # one of the (len(grams) - needed + 1) rarest ones.
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))[:len(grams) - needed + 1]
+        candidates = {}
+        for gram in rarest:
+            for customer_key in self._postings.get(gram, ()):
+                candidates[customer_key] = None
+                if len(candidates) >= FUZZY_MAX_CANDIDATES:
+                    break
+        scored = []
+        for customer_key in candidates:
+            shared = len(grams & _trigrams(" ".join(self._words[customer_key])))
+            if shared >= needed:
+                scored.append((-shared, customer_key))
+        scored.sort()
+        return [customer_key for _, customer_key in scored]
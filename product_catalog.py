@@ -0,0 +1,162 @@
+"""Product/HSN catalog used to autocomplete line items.
+
+The catalog is an Excel file (product_catalog.xlsx, next to the customer
+database) with the columns
+
+    HSN/SAC Code | Description | Rate | CGST (%) | SGST (%)
+
+It is read once into memory and indexed by HSN code and by description
+(sorted lists searched with bisect). Completions are memoized in an LRU
+cache. Every lookup checks the file's mtime and size first, and the
+catalog, index and cache are rebuilt only when the file has changed.
+
+Usage:
+    python product_catalog.py template product_catalog.xlsx
+"""
+from bisect import bisect_left
+from functools import lru_cache
+import os
+import sys
+import threading
+
+CATALOG_FILE = "product_catalog.xlsx"
+CATALOG_HEADERS = ["HSN/SAC Code", "Description", "Rate", "CGST (%)", "SGST (%)"]
+CATALOG_COLUMN_WIDTHS = {'A': 15, 'B': 45, 'C': 12, 'D': 12, 'E': 12}
+COMPLETION_CACHE_SIZE = 512
+MAX_COMPLETIONS = 20
+
+
+class Product:
+    """One catalog entry. Rate and tax percentages are kept as typed, e.g. '1500' or '9'."""
+
+    __slots__ = ("hsn", "description", "rate", "cgst", "sgst")
+
+    def __init__(self, hsn, description, rate="", cgst="", sgst=""):
+        self.hsn = hsn
+        self.description = description
+        self.rate = rate
+        self.cgst = cgst
+        self.sgst = sgst
+
+    def __repr__(self):
+        return f"Product({self.hsn!r}, {self.description!r}, {self.rate!r}, {self.cgst!r}, {self.sgst!r})"
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_catalog_xlsx(file_path):
+    """Reads the products from a product_catalog.xlsx file."""
+    import openpyxl
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        products = []
+        for row in wb.active.iter_rows(min_row=2, max_col=len(CATALOG_HEADERS), values_only=True):
+            row = [_text(value) for value in row] + [""] * (len(CATALOG_HEADERS) - len(row))
+            if row[1]:  # Description is required
+                products.append(Product(*row))
+        return products
+    finally:
+        wb.close()
+
+
+def write_catalog_template(file_path):
+    """Writes an empty product_catalog.xlsx with the expected headers."""
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Products"
+    ws.append(CATALOG_HEADERS)
+    for cell in ws[1]:
+        cell.font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    for column, width in CATALOG_COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+    wb.save(file_path)
+    wb.close()
+
+
+class ProductCatalog:
+    """In-memory product index that follows changes to the catalog file."""
+
+    def __init__(self, file_path=CATALOG_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._load([])
+
+    def _load(self, products):
+        self._products = products
+        self._by_description = sorted((p.description.lower(), i) for i, p in enumerate(products))
+        self._by_hsn = sorted((p.hsn.lower(), i) for i, p in enumerate(products) if p.hsn)
+        # A fresh cache per load, so stale completions are dropped with the old index
+        self._complete = lru_cache(maxsize=COMPLETION_CACHE_SIZE)(self._search)
+
+    def __len__(self):
+        self.refresh()
+        return len(self._products)
+
+    def refresh(self):
+        """Reloads the catalog if the file's mtime or size changed. Returns True if it did."""
+        try:
+            stat = os.stat(self.file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if signature == self._signature:
+            return False
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._load(read_catalog_xlsx(self.file_path) if signature else [])
+            self._signature = signature
+        return True
+
+    def complete(self, field, prefix, limit=MAX_COMPLETIONS):
+        """Returns up to limit products whose field ('hsn' or 'description') starts with prefix."""
+        self.refresh()
+        return self._complete(field, prefix.strip().lower(), limit)
+
+    def find(self, field, value):
+        """Returns the product whose field equals value (case-insensitive), or None."""
+        value = value.strip().lower()
+        for product in self.complete(field, value):
+            if getattr(product, field).lower() == value:
+                return product
+        return None
+
+    def _search(self, field, prefix, limit):
+        index = self._by_hsn if field == "hsn" else self._by_description
+        matches = []
+        position = bisect_left(index, (prefix,))
+        while position < len(index) and len(matches) < limit:
+            key, product_index = index[position]
+            if not key.startswith(prefix):
+                break
+            matches.append(self._products[product_index])
+            position += 1
+        return tuple(matches)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "template":
+        print(__doc__.strip().split("Usage:")[1])
+        return 2
+    if os.path.exists(argv[1]):
+        print(f"{argv[1]} already exists")
+        return 1
+    write_catalog_template(argv[1])
+    print(f"Wrote an empty catalog to {argv[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
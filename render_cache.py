@@ -0,0 +1,178 @@
+"""Content-addressed cache of rendered invoices.
+
+An invoice's cache key is a SHA-256 over its normalized party details,
+dates, line items (as exact fixed-point integers), TEMPLATE_VERSION and the
+logo file's size and mtime. The allocated invoice number is not part of the
+key: generating the same invoice again (a double click, or re-issuing
+yesterday's invoice) returns the file already rendered, with its original
+number, instead of rebuilding it and using up a new number. A number given
+explicitly in invoice_details is part of the key, and so is the output
+format when it is not xlsx; the same invoice rendered in another format
+(a PDF after the Excel file) keeps the number it was first given.
+
+Entries are stored as <key>.xlsx (or .pdf) plus <key>.json in the cache directory,
+written via temporary files and os.replace so that several processes can
+share one cache. When the directory grows past max_bytes the least
+recently used entries are evicted.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from customer_store import CUSTOMER_FIELDS
+from file_utils import write_atomic
+from invoice_engine import RENDERERS, default_logo_path, generate_invoice
+from invoice_metrics import span
+from invoice_template import TEMPLATE_VERSION
+
+CACHE_DIR = ".invoice_cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _logo_signature(logo_path):
+    try:
+        stat = os.stat(logo_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def invoice_cache_key(party_details, invoice_details, items, logo_path=None, output_format="xlsx"):
+    """Returns the hex cache key for an invoice (items are LineItems)."""
+    payload = {
+        "template": TEMPLATE_VERSION,
+        "logo": _logo_signature(logo_path or default_logo_path()),
+        "party": [str(party_details.get(field) or "").strip() for field in CUSTOMER_FIELDS],
+        "invoice": [invoice_details.get("sale_date"), invoice_details.get("delivery_date"),
+                    invoice_details.get("invoice_no") or None],
+        "items": [[item.hsn, item.description, item.quantity_milli, item.rate_paise,
+                   item.discount_bp, item.cgst_bp, item.sgst_bp] for item in items],
+    }
+    if output_format != "xlsx":
+        payload["format"] = output_format  # xlsx keys stay as they were before other formats
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Rendered invoice files keyed by content hash, with size-bounded LRU eviction."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key, filename):
+        """Returns the paths of the cached file (with filename's extension) and of the entry for key."""
+        base = os.path.join(self.directory, key)
+        return base + os.path.splitext(filename)[1], base + ".json"
+
+    def get(self, key):
+        """Returns the entry {"invoice_no", "filename"} for key, or None."""
+        meta_path = os.path.join(self.directory, key + ".json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(meta_path)  # Marks the entry as recently used
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(self._paths(key, entry["filename"])[0]) else None
+
+    def restore(self, key, entry, output_dir):
+        """Puts the cached file for key in output_dir (unless an identical copy is there) and returns its path."""
+        cached_path, _ = self._paths(key, entry["filename"])
+        path = os.path.join(output_dir, entry["filename"])
+        try:
+            if os.path.getsize(path) == os.path.getsize(cached_path):
+                return path
+        except OSError:
+            pass
+        write_atomic(path, lambda temp_path: shutil.copyfile(cached_path, temp_path))
+        return path
+
+    def put(self, key, path, invoice_no):
+        """Adds a freshly rendered file to the cache, then evicts old entries if over max_bytes."""
+        cached_path, meta_path = self._paths(key, path)
+        write_atomic(cached_path, lambda temp_path: shutil.copyfile(path, temp_path))
+        entry = {"invoice_no": invoice_no, "filename": os.path.basename(path)}
+
+        def write_meta(temp_path):
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+        write_atomic(meta_path, write_meta)
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            # key -> [json mtime, total size, file names]; temporary files start with ".~"
+            entries, total = {}, 0
+            with os.scandir(self.directory) as scan:
+                for dir_entry in scan:
+                    if dir_entry.name.startswith("."):
+                        continue
+                    try:
+                        stat = dir_entry.stat()
+                    except OSError:
+                        continue
+                    key, extension = os.path.splitext(dir_entry.name)
+                    entry = entries.setdefault(key, [0, 0, []])
+                    if extension == ".json":
+                        entry[0] = stat.st_mtime
+                    entry[1] += stat.st_size
+                    entry[2].append(dir_entry.name)
+                    total += stat.st_size
+            for _, size, names in sorted(entries.values()):
+                if total <= self.max_bytes:
+                    break
+                # The entry goes first, so a concurrent get() never finds it without its file
+                for name in sorted(names, key=lambda name: not name.endswith(".json")):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+                total -= size
+
+
+def known_invoice_no(cache, party_details, invoice_details, items, logo_path=None, output_format="xlsx"):
+    """Returns the number the same invoice got when it was rendered in another format, or None."""
+    for other_format in RENDERERS:
+        if other_format != output_format:
+            entry = cache.get(invoice_cache_key(party_details, invoice_details, items, logo_path, other_format))
+            if entry is not None:
+                return entry["invoice_no"]
+    return None
+
+
+def generate_invoice_cached(cache, party_details, invoice_details, items, next_invoice_no, output_dir=None,
+                            output_format="xlsx", **options):
+    """Returns (path, invoice_no, cached) for an invoice, rendering it only if it is not in the cache.
+
+    next_invoice_no is called for a number only when the invoice has to be
+    rendered and invoice_details carries no number of its own; other
+    options go to generate_invoice.
+    """
+    output_dir = output_dir or os.getcwd()
+    with span("cache.lookup") as lookup:
+        key = invoice_cache_key(party_details, invoice_details, items, options.get("logo_path"), output_format)
+        entry = cache.get(key)
+        lookup.set(hit=entry is not None)
+        if entry is not None:
+            try:
+                return cache.restore(key, entry, output_dir), entry["invoice_no"], True
+            except OSError:
+                pass  # Evicted meanwhile: render it again below
+
+    with span("invoice.number"):
+        invoice_no = (invoice_details.get("invoice_no")
+                      or known_invoice_no(cache, party_details, invoice_details, items, options.get("logo_path"),
+                                          output_format)
+                      or next_invoice_no())
+    path = generate_invoice(party_details, dict(invoice_details, invoice_no=invoice_no), items, output_format,
+                            output_dir=output_dir, **options)
+    with span("cache.store"):
+        cache.put(key, path, invoice_no)
+    return path, invoice_no, False
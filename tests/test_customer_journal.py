@@ -0,0 +1,92 @@
+"""Customer journal shared by several app instances (python -m unittest discover tests)."""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import customer_store  # noqa: E402
+from customer_store import ExcelCustomerRepository, read_customers_xlsx, write_customers_xlsx  # noqa: E402
+
+# Adds customers <prefix>0000.. from a separate process, compacting every tenth one
+_ADD_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from customer_store import ExcelCustomerRepository
+repo = ExcelCustomerRepository(sys.argv[2])
+for n in range(int(sys.argv[4])):
+    repo.add(f"{sys.argv[3]}{n:04d}", {"name": f"Customer {n}"})
+    if n % 10 == 9:
+        repo.compact()
+repo.close()
+"""
+
+
+class CustomerJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "customer_data.xlsx")
+        write_customers_xlsx(self.path, [("SEED", {"name": "Seed Traders"})])
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def open_repository(self):
+        repo = ExcelCustomerRepository(self.path)
+        self.addCleanup(repo.close)
+        return repo
+
+    def assertAllSaved(self, keys):
+        self.assertEqual(set(self.open_repository()), keys)
+        self.open_repository().compact()
+        self.assertEqual(set(read_customers_xlsx(self.path)), keys)
+
+    def test_add_during_another_instances_compaction(self):
+        a = self.open_repository()
+        b = self.open_repository()
+        a.add("ALPHA", {"name": "Alpha"})
+        b.add("BETA", {"name": "Beta"})
+        merge = customer_store.merge_customers_xlsx
+
+        def add_then_merge(file_path, batch):
+            # A saves a customer after B has moved the journal aside
+            self.assertTrue(a.add("GAMMA", {"name": "Gamma"}))
+            return merge(file_path, batch)
+
+        with mock.patch.object(customer_store, "merge_customers_xlsx", add_then_merge):
+            self.assertEqual(b.compact(), 2)
+        self.assertIn("GAMMA", a)
+        self.assertAllSaved({"SEED", "ALPHA", "BETA", "GAMMA"})
+
+    def test_one_compaction_at_a_time(self):
+        a = self.open_repository()
+        b = self.open_repository()
+        a.add("ALPHA", {"name": "Alpha"})
+        merge = customer_store.merge_customers_xlsx
+        skipped = []
+
+        def merge_while_other_compacts(file_path, batch):
+            skipped.append(b.compact())
+            return merge(file_path, batch)
+
+        with mock.patch.object(customer_store, "merge_customers_xlsx", merge_while_other_compacts):
+            self.assertEqual(a.compact(), 1)
+        self.assertEqual(skipped, [0])
+        self.assertAllSaved({"SEED", "ALPHA"})
+
+    def test_processes_adding_and_compacting(self):
+        count = 40
+        processes = [subprocess.Popen([sys.executable, "-c", _ADD_SCRIPT, ROOT, self.path, prefix, str(count)])
+                     for prefix in ("P", "Q", "R")]
+        for process in processes:
+            self.assertEqual(process.wait(timeout=300), 0)
+        expected = {"SEED"} | {f"{prefix}{n:04d}" for prefix in "PQR" for n in range(count)}
+        self.assertAllSaved(expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
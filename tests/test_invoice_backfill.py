@@ -0,0 +1,126 @@
+"""Back-filling the register from existing invoice workbooks (python -m unittest discover tests)."""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from invoice_backfill import backfill, read_invoice_workbook  # noqa: E402
+from invoice_engine import generate_invoice  # noqa: E402
+from invoice_register import InvoiceRegister  # noqa: E402
+from invoice_template import ITEM_HEADERS  # noqa: E402
+from line_items import LineItem, calculate  # noqa: E402
+
+_PARTY = {"name": "Alpha Traders", "gst": "27AAAAA0000A1Z5", "address": "1 Main Road", "phone": "98200 00000",
+          "email": "accounts@alpha.example"}
+
+
+def write_baseline_invoice(path, party, sale_date, delivery_date, items):
+    """Writes a workbook in the layout of invoices made before the register existed (no invoice number).
+
+    items are (hsn, description, quantity, rate, discount %, cgst %, sgst %).
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["A1"] = "Anant Enterprises"
+    ws["A6"] = "BILL TO:"
+    ws["A7"] = f"Party Name: {party['name']}"
+    ws["A8"] = f"GST No.: {party['gst']}"
+    ws["A9"] = f"Address: {party['address']}"
+    ws["A10"] = f"Phone: {party['phone']}"
+    ws["A11"] = f"Email: {party['email']}"
+    ws["G6"], ws["H6"] = "INVOICE DATE:", sale_date
+    ws["G7"], ws["H7"] = "DELIVERY DATE:", delivery_date
+    for column, header in enumerate(ITEM_HEADERS, start=1):
+        ws.cell(row=13, column=column, value=header)
+    row = 14
+    grand_total = gst = discount_total = 0
+    for index, (hsn, description, quantity, rate, discount, cgst, sgst) in enumerate(items, start=1):
+        subtotal = quantity * rate
+        discount_amount = subtotal * discount / 100
+        tax = subtotal * (cgst + sgst) / 100
+        total = subtotal + tax - discount_amount
+        ws.append([index, hsn, description, quantity, rate, subtotal, f"{discount:.2f}%" if discount else None,
+                   f"{cgst:.2f}%", f"{sgst:.2f}%", total])
+        grand_total += total
+        gst += tax
+        discount_total += discount_amount
+        row += 1
+    ws[f"G{row + 1}"], ws[f"H{row + 1}"] = "Total GST:", gst
+    ws[f"G{row + 2}"], ws[f"H{row + 2}"] = "Total Discount:", discount_total
+    ws[f"G{row + 3}"], ws[f"H{row + 3}"] = "TOTAL (Incl. Tax):", grand_total
+    ws[f"A{row + 1}"] = "Bank Details:"
+    wb.save(path)
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tempdir.name, "Generated Invoices")
+        os.makedirs(self.folder)
+        self.register = InvoiceRegister(os.path.join(self.tempdir.name, "invoice_register.db"))
+
+    def tearDown(self):
+        self.register.close()
+        self.tempdir.cleanup()
+
+    def run_backfill(self):
+        return dict(backfill([self.folder], self.register, workers=1))
+
+    def invoices(self):
+        return self.register._conn.execute(
+            "SELECT invoice_no, sale_date, party_name, subtotal, cgst, sgst, discount, total FROM invoices").fetchall()
+
+    def test_baseline_layout_workbook(self):
+        path = os.path.join(self.folder, "Invoice_ALPHA_01-04-2025.xlsx")
+        write_baseline_invoice(path, _PARTY, "01-04-2025", "02-04-2025", [
+            ("8541", "Panel 540W", 2, 1500.5, 5, 9, 9),
+            ("", "Installation", 1, 2500, 0, 2.5, 2.5),
+        ])
+        party, invoice, items, file_total = read_invoice_workbook(path)
+        self.assertEqual(party, _PARTY)
+        self.assertEqual(invoice, {"sale_date": "01-04-2025", "delivery_date": "02-04-2025"})
+        self.assertEqual([(item.hsn, item.description, item.quantity_milli, item.rate_paise, item.discount_bp,
+                           item.cgst_bp, item.sgst_bp) for item in items],
+                         [("8541", "Panel 540W", 2000, 150050, 500, 900, 900),
+                          ("", "Installation", 1000, 250000, 0, 250, 250)])
+        totals = calculate(items).totals
+        self.assertEqual(file_total, totals.total)
+
+        self.assertEqual(self.run_backfill(), {path: None})
+        self.assertEqual(self.invoices(), [(None, "01-04-2025", "Alpha Traders", totals.subtotal, totals.cgst,
+                                            totals.sgst, totals.discount, totals.total)])
+        # Unchanged files are not read again
+        self.assertEqual(self.run_backfill(), {})
+
+    def test_generated_invoice_is_linked_not_counted_twice(self):
+        items = [LineItem("8541", "Panel", 2000, 150000, 500, 900, 900)]
+        invoice = {"sale_date": "03-04-2025", "delivery_date": "03-04-2025", "invoice_no": "INV-00007"}
+        path = generate_invoice(_PARTY, invoice, items, output_dir=self.folder)
+        self.register.record(_PARTY, invoice, items, path)
+
+        self.assertEqual(self.run_backfill(), {path: None})
+        self.assertEqual([row[0] for row in self.invoices()], ["INV-00007"])
+        # Re-indexing the changed file keeps the app's entry
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(self.run_backfill(), {path: None})
+        self.assertEqual([row[0] for row in self.invoices()], ["INV-00007"])
+
+    def test_unreadable_workbook_is_reported(self):
+        import openpyxl
+
+        path = os.path.join(self.folder, "Invoice_notes.xlsx")
+        wb = openpyxl.Workbook()
+        wb.active["A13"] = "Meeting notes"
+        wb.save(path)
+        error = self.run_backfill()[path]
+        self.assertIn("no item table headings", error)
+        self.assertEqual(self.invoices(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Invoice numbers shared by several processes (python -m unittest discover tests)."""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from invoice_batch import run_batch  # noqa: E402
+from invoice_numbers import InvoiceNumberAllocator  # noqa: E402
+
+# Takes numbers from a separate process and prints them, one per line
+_ALLOCATE_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from invoice_numbers import InvoiceNumberAllocator
+allocator = InvoiceNumberAllocator(sys.argv[2], block_size=int(sys.argv[3]))
+for _ in range(int(sys.argv[4])):
+    print(allocator.next_number())
+allocator.close()
+"""
+
+_PARTY = {"name": "Alpha Traders", "gst": "27AAAAA0000A1Z5", "address": "1 Main Road", "phone": "", "email": ""}
+
+
+def _spec(invoice, sale_date):
+    return {"invoice": invoice, "party": _PARTY, "sale_date": sale_date,
+            "items": [{"hsn": "8541", "description": f"Panel {invoice}", "quantity": 1, "rate": 100,
+                       "discount": 0, "cgst": 9, "sgst": 9}]}
+
+
+class InvoiceNumberAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "invoice_numbers.db")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def open_allocator(self, block_size=1):
+        allocator = InvoiceNumberAllocator(self.path, block_size=block_size)
+        self.addCleanup(allocator.close)
+        return allocator
+
+    def test_numbers_are_unique_across_processes(self):
+        count = 60
+        processes = [subprocess.Popen([sys.executable, "-c", _ALLOCATE_SCRIPT, ROOT, self.path, block, str(count)],
+                                      stdout=subprocess.PIPE, text=True)
+                     for block in ("1", "7", "25")]
+        numbers = []
+        for process in processes:
+            output, _ = process.communicate(timeout=300)
+            self.assertEqual(process.returncode, 0)
+            per_process = [int(line) for line in output.split()]
+            self.assertEqual(per_process, sorted(per_process))
+            numbers += per_process
+        self.assertEqual(len(numbers), 3 * count)
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_close_gives_the_unused_block_back(self):
+        allocator = InvoiceNumberAllocator(self.path, block_size=10)
+        self.assertEqual([allocator.next_number() for _ in range(3)], [1, 2, 3])
+        allocator.close()
+        self.assertEqual(self.open_allocator().next_number(), 4)
+
+    def test_block_reserved_after_ours_is_not_given_back(self):
+        first = InvoiceNumberAllocator(self.path, block_size=10)
+        self.assertEqual(first.next_number(), 1)
+        second = self.open_allocator(block_size=10)
+        self.assertEqual(second.next_number(), 11)
+        first.close()
+        self.assertEqual(self.open_allocator().peek(), 21)
+
+    def test_reset(self):
+        allocator = self.open_allocator(block_size=5)
+        allocator.next_number()
+        allocator.reset(1001)
+        self.assertEqual(allocator.next_invoice_no(), "INV-01001")
+
+
+class BatchNumberingTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.numbers = os.path.join(self.tempdir.name, "invoice_numbers.db")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_batch(self, specs, name):
+        output_dir = os.path.join(self.tempdir.name, name)
+        os.makedirs(output_dir)
+        results = list(run_batch(specs, {}, output_dir, workers=2, numbers_path=self.numbers, register_path=None))
+        self.assertEqual([error for _, _, error in results], [None] * len(specs))
+        return {invoice_id: os.path.basename(path) for invoice_id, path, _ in results}
+
+    def test_runs_are_numbered_consecutively_in_sale_date_order(self):
+        specs = [_spec("c", "05-04-2025"), _spec("a", "01-04-2025"), _spec("b", "03-04-2025")]
+        files = self.run_batch(specs, "first")
+        self.assertTrue(files["a"].endswith("_INV-00001.xlsx"))
+        self.assertTrue(files["b"].endswith("_INV-00002.xlsx"))
+        self.assertTrue(files["c"].endswith("_INV-00003.xlsx"))
+
+        files = self.run_batch([_spec("d", "06-04-2025"), _spec("e", "07-04-2025")], "second")
+        self.assertTrue(files["d"].endswith("_INV-00004.xlsx"))
+        self.assertTrue(files["e"].endswith("_INV-00005.xlsx"))
+
+    def test_own_numbers_take_none_from_the_counter(self):
+        specs = [dict(_spec("a", "01-04-2025"), invoice_no="X-1"), _spec("b", "02-04-2025")]
+        files = self.run_batch(specs, "own")
+        self.assertTrue(files["a"].endswith("_X-1.xlsx"))
+        self.assertTrue(files["b"].endswith("_INV-00001.xlsx"))
+        allocator = InvoiceNumberAllocator(self.numbers)
+        self.addCleanup(allocator.close)
+        self.assertEqual(allocator.peek(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Invoice register and GST summary sums (python -m unittest discover tests)."""
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from invoice_register import InvoiceRegister, gst_summary, main, period_of  # noqa: E402
+from line_items import LineItem, calculate  # noqa: E402
+
+_ALPHA = {"name": "Alpha Traders", "gst": "27AAAAA0000A1Z5", "address": "1 Main Road"}
+_BETA = {"name": "Beta Stores", "gst": "", "address": "2 Station Road"}
+
+
+def _invoice(invoice_no, sale_date):
+    return {"invoice_no": invoice_no, "sale_date": sale_date, "delivery_date": sale_date}
+
+
+_INVOICES = [
+    (_ALPHA, _invoice("INV-00001", "01-04-2025"),
+     [LineItem("8541", "Panel", 2000, 150000, 500, 900, 900), LineItem("8544", "Cable", 10500, 2550, 0, 600, 600)]),
+    (_BETA, _invoice("INV-00002", "15-04-2025"), [LineItem("8541", "Panel", 1000, 150000, 0, 900, 900)]),
+    (_ALPHA, _invoice("INV-00003", "02-05-2025"), [LineItem("", "Service", 1000, 99999, 1000, 250, 250)]),
+]
+
+
+class InvoiceRegisterTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "invoice_register.db")
+        self.register = InvoiceRegister(self.path)
+        for party, invoice, items in _INVOICES:
+            self.assertTrue(self.register.record(party, invoice, items, f"{invoice['invoice_no']}.xlsx"))
+
+    def tearDown(self):
+        self.register.close()
+        self.tempdir.cleanup()
+
+    def expected(self, invoices):
+        """Returns (lines, taxable, cgst, sgst, discount, total) worked out from the items directly."""
+        items = [item for _, _, invoice_items in invoices for item in invoice_items]
+        totals = calculate(items).totals
+        return len(items), totals.subtotal, totals.cgst, totals.sgst, totals.discount, totals.total
+
+    def assertSums(self, sums, invoices):
+        self.assertEqual((sums.lines, sums.taxable, sums.cgst, sums.sgst, sums.discount, sums.total),
+                         self.expected(invoices))
+        self.assertEqual(sums.total, sums.taxable + sums.cgst + sums.sgst - sums.discount)
+
+    def test_a_number_is_recorded_once(self):
+        party, invoice, items = _INVOICES[0]
+        self.assertFalse(self.register.record(party, invoice, items))
+        self.assertEqual(len(list(self.register.iter_lines())), 4)
+
+    def test_summary_sums_by_period_party_and_hsn(self):
+        summary, party_names = gst_summary(self.register.iter_lines())
+        self.assertEqual(set(summary["period"]), {"2025-04", "2025-05"})
+        self.assertSums(summary["period"]["2025-04"], _INVOICES[:2])
+        self.assertSums(summary["period"]["2025-05"], _INVOICES[2:])
+
+        # Parties without a GSTIN are grouped by name
+        self.assertEqual(set(summary["party"]), {_ALPHA["gst"], _BETA["name"]})
+        self.assertSums(summary["party"][_ALPHA["gst"]], [_INVOICES[0], _INVOICES[2]])
+        self.assertEqual(party_names[_ALPHA["gst"]], _ALPHA["name"])
+
+        panels = [(None, None, [item for item in items if item.hsn == "8541"]) for _, _, items in _INVOICES]
+        self.assertSums(summary["hsn"]["8541"], panels)
+        self.assertEqual(summary["hsn"][""].lines, 1)
+
+        for groups in summary.values():
+            self.assertEqual(sum(sums.total for sums in groups.values()), self.expected(_INVOICES)[-1])
+
+    def test_period_filter(self):
+        summary, _ = gst_summary(self.register.iter_lines("2025-05", "2025-05"))
+        self.assertEqual(list(summary["period"]), ["2025-05"])
+        self.assertSums(summary["period"]["2025-05"], _INVOICES[2:])
+
+    def test_csv_report(self):
+        self.register.close()
+        prefix = os.path.join(self.tempdir.name, "gst")
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(main(["report", self.path, "--csv", prefix]), 0)
+        with open(f"{prefix}_period.csv", encoding="utf-8") as f:
+            rows = f.read().splitlines()
+        self.assertEqual(rows[0], "Period,Lines,Taxable,CGST,SGST,Discount,Total")
+        self.assertEqual(len(rows), 3)
+        self.register = InvoiceRegister(self.path)
+
+    def test_period_of(self):
+        self.assertEqual(period_of("15-04-2025"), "2025-04")
+        self.assertEqual(period_of("2025-04-15"), "2025-04")
+        self.assertEqual(period_of("15/04/2025"), "2025-04")
+        self.assertEqual(period_of("April"), "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
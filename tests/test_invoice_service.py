@@ -0,0 +1,167 @@
+"""Rendering service responses: 200, 400, 503 and 504 (python -m unittest discover tests)."""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import invoice_service  # noqa: E402
+from customer_store import MemoryCustomerRepository  # noqa: E402
+from invoice_batch import render_job  # noqa: E402
+from invoice_service import InvoiceService, make_server  # noqa: E402
+from render_cache import RenderCache  # noqa: E402
+
+SLOW_RENDER_SECONDS = 1.0
+
+
+def _slow_render_job(job):
+    """A render that takes SLOW_RENDER_SECONDS (runs in a worker process)."""
+    time.sleep(SLOW_RENDER_SECONDS)
+    return render_job(job)
+
+
+def _crash_once_render_job(job):
+    """Kills its worker process the first time, like an out-of-memory kill, then renders normally."""
+    marker = os.path.join(job[4]["output_dir"], "crashed")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return render_job(job)
+
+
+def _payload(name="Alpha Traders", description="Panel"):
+    return {"party": {"name": name, "gst": "27AAAAA0000A1Z5", "address": "1 Main Road", "phone": 9820000000},
+            "invoice": {"sale_date": "01-04-2025", "delivery_date": "02-04-2025"},
+            "items": [{"hsn": "8541", "description": description, "quantity": 2, "rate": 1500,
+                       "discount": 5, "cgst": 9, "sgst": 9}]}
+
+
+class InvoiceServiceTest(unittest.TestCase):
+    workers = 1
+    queue_limit = 4
+    render_timeout = 30.0
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tempdir.name, "invoices")
+        os.makedirs(self.output_dir)
+        self.service = InvoiceService(self.output_dir, MemoryCustomerRepository(), self.workers, self.queue_limit,
+                                      self.render_timeout, os.path.join(self.tempdir.name, "invoice_numbers.db"),
+                                      cache=RenderCache(os.path.join(self.output_dir, ".invoice_cache")))
+        self.server = make_server("127.0.0.1", 0, self.service, quiet=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+        self.tempdir.cleanup()
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, headers, decoded JSON body)."""
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), json.loads(response.read() or b"null")
+        finally:
+            connection.close()
+
+    def post(self, payload, query="?return=path"):
+        return self.request("POST", "/invoices" + query, json.dumps(payload).encode("utf-8"),
+                            {"Content-Type": "application/json"})
+
+    def health(self):
+        return self.request("GET", "/health")[2]
+
+
+class ServiceResponsesTest(InvoiceServiceTest):
+    def test_renders_and_serves_repeats_from_the_cache(self):
+        status, _, body = self.post(_payload())
+        self.assertEqual(status, 200)
+        self.assertTrue(os.path.exists(body["path"]))
+        self.assertEqual(body["invoice_no"], "INV-00001")
+        self.assertEqual(self.post(_payload())[2], body)
+        self.assertEqual(self.health()["cache_hits"], 1)
+
+    def test_bad_requests_get_400(self):
+        bad_payloads = {
+            "items": dict(_payload(), items="Panel"),
+            "party": dict(_payload(), party=["Alpha"]),
+            "sale_date": dict(_payload(), invoice={"sale_date": 20250401}),
+            "party.name": _payload(name=123),
+            "non-blank": _payload(name="   "),
+            "Quantity is required": dict(_payload(), items=[{"description": "Panel", "rate": 10}]),
+            "Invalid date": dict(_payload(), invoice={"sale_date": "April"}),
+        }
+        for expected, payload in bad_payloads.items():
+            with self.subTest(expected):
+                status, _, body = self.post(payload)
+                self.assertEqual(status, 400)
+                self.assertIn(expected, body["error"])
+
+        status, _, body = self.post(_payload(description="पैनल"), "?format=pdf&return=path")
+        self.assertEqual(status, 400)
+        self.assertIn("cannot print", body["error"])
+        status, _, _ = self.request("POST", "/invoices", b"{not json", {"Content-Length": "9"})
+        self.assertEqual(status, 400)
+        status, _, _ = self.request("POST", "/invoices", b"", {"Content-Length": "-1"})
+        self.assertEqual(status, 400)
+        # No invoice number was spent on any of them
+        self.assertEqual(self.post(_payload())[2]["invoice_no"], "INV-00001")
+
+    def test_crashed_worker_gets_503_then_fresh_workers(self):
+        with mock.patch.object(invoice_service, "render_job", _crash_once_render_job):
+            status, headers, body = self.post(_payload())
+            self.assertEqual(status, 503)
+            self.assertEqual(headers.get("Retry-After"), "1")
+            status, _, body = self.post(_payload())
+        self.assertEqual(status, 200)
+        self.assertEqual(self.health()["pool_restarts"], 1)
+
+
+class QueueLimitTest(InvoiceServiceTest):
+    queue_limit = 1
+
+    def test_full_queue_gets_503(self):
+        results = []
+        with mock.patch.object(invoice_service, "render_job", _slow_render_job):
+            first = threading.Thread(target=lambda: results.append(self.post(_payload())))
+            first.start()
+            deadline = time.monotonic() + 10
+            while self.health()["in_flight"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            status, headers, body = self.post(_payload(description="Cable"))
+            first.join()
+        self.assertEqual(status, 503)
+        self.assertEqual(headers.get("Retry-After"), "1")
+        self.assertEqual(results[0][0], 200)
+        self.assertEqual(self.health()["rejected"], 1)
+
+
+class RenderTimeoutTest(InvoiceServiceTest):
+    render_timeout = 0.2
+
+    def test_slow_render_gets_504_and_keeps_its_number(self):
+        with mock.patch.object(invoice_service, "render_job", _slow_render_job):
+            status, _, body = self.post(_payload())
+            self.assertEqual(status, 504)
+            deadline = time.monotonic() + 10
+            while self.health()["in_flight"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(self.health()["in_flight"], 0)
+            # The late render was cached, so the retry gets it with its number
+            status, _, body = self.post(_payload())
+        self.assertEqual(status, 200)
+        self.assertEqual(body["invoice_no"], "INV-00001")
+
+
+if __name__ == "__main__":
+    unittest.main()
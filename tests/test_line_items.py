@@ -0,0 +1,133 @@
+"""Fixed-point line items and the batched calculation (python -m unittest discover tests)."""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import line_items  # noqa: E402
+from line_items import (NUMPY_MIN_ROWS, PAISE_PER_RUPEE, PERCENT_SCALE, QTY_SCALE, ItemList, LineItem,  # noqa: E402
+                        calculate, calculate_item, fixed_text, to_fixed)
+
+
+def _columns(calculation):
+    return [calculation.subtotal, calculation.cgst, calculation.sgst, calculation.discount, calculation.total]
+
+
+def _sums(totals):
+    return totals.subtotal, totals.cgst, totals.sgst, totals.discount, totals.total
+
+
+def _random_items(count, seed, max_rate_paise=10 ** 7):
+    rng = random.Random(seed)
+    return [LineItem("8541", f"Item {n}", rng.randint(1, 10 ** 6), rng.randint(1, max_rate_paise),
+                     rng.randint(0, 5000), rng.randint(0, 1400), rng.randint(0, 1400))
+            for n in range(count)]
+
+
+class RoundingTest(unittest.TestCase):
+    def test_to_fixed_rounds_half_up(self):
+        self.assertEqual(to_fixed("0.005", PAISE_PER_RUPEE), 1)
+        self.assertEqual(to_fixed("0.015", PAISE_PER_RUPEE), 2)
+        self.assertEqual(to_fixed("0.0049", PAISE_PER_RUPEE), 0)
+        self.assertEqual(to_fixed("2.0005", QTY_SCALE), 2001)
+        self.assertEqual(to_fixed(3, PAISE_PER_RUPEE), 300)
+
+    def test_to_fixed_rejects_non_numbers(self):
+        for value in ("abc", "", None, "nan", "inf"):
+            with self.assertRaises(ValueError):
+                to_fixed(value, PAISE_PER_RUPEE)
+
+    def test_row_amounts_round_half_up_to_the_paisa(self):
+        # 0.5 x 1 paisa = 0.5 paise -> 1; 5% of 10 paise = 0.5 -> 1; 2.5% of 10 paise = 0.25 -> 0
+        self.assertEqual(calculate_item(LineItem("", "Half", 500, 1)), (1, 0, 0, 0, 1))
+        self.assertEqual(calculate_item(LineItem("", "Tax", 1000, 10, 0, 500, 250)), (10, 1, 0, 0, 11))
+        self.assertEqual(calculate_item(LineItem("", "Disc", 1000, 10, 500)), (10, 0, 0, 1, 9))
+
+    def test_worked_example(self):
+        # README: 2 x 100, CGST 2.5%, SGST 3%, discount 5% -> 201
+        item = LineItem("", "Example", 2 * QTY_SCALE, 100 * PAISE_PER_RUPEE, 5 * PERCENT_SCALE,
+                        250, 3 * PERCENT_SCALE)
+        self.assertEqual(calculate_item(item), (20000, 500, 600, 1000, 20100))
+
+    def test_fixed_text_round_trips(self):
+        for text, scale in (("12345.67", PAISE_PER_RUPEE), ("2.5", QTY_SCALE), ("0.001", QTY_SCALE),
+                            ("18", PERCENT_SCALE), ("1234567890123.45", PAISE_PER_RUPEE)):
+            value = to_fixed(text, scale)
+            self.assertEqual(to_fixed(fixed_text(value, scale), scale), value)
+
+
+class CalculationParityTest(unittest.TestCase):
+    def setUp(self):
+        self.np = line_items._load_numpy()
+        if not self.np:
+            self.skipTest("NumPy is not installed")
+
+    def assertSameCalculation(self, first, second):
+        self.assertEqual(_columns(first), _columns(second))
+        self.assertEqual(_sums(first.totals), _sums(second.totals))
+
+    def test_numpy_matches_python(self):
+        items = _random_items(NUMPY_MIN_ROWS * 10, seed=7)
+        numpy_calculation = line_items._calculate_numpy(items, self.np)
+        self.assertIsNotNone(numpy_calculation)
+        self.assertSameCalculation(numpy_calculation, line_items._calculate_python(items))
+        self.assertTrue(all(type(value) is int for value in numpy_calculation.total))
+
+    def test_large_values_fall_back_to_python_ints(self):
+        # Row products beyond int64: NumPy declines and calculate() stays exact
+        items = _random_items(NUMPY_MIN_ROWS, seed=11, max_rate_paise=10 ** 16)
+        items.append(LineItem("", "Huge", 10 ** 9, 10 ** 17, 0, 1800, 1800))
+        self.assertIsNone(line_items._calculate_numpy(items, self.np))
+        self.assertSameCalculation(calculate(items), line_items._calculate_python(items))
+
+    def test_large_totals_fall_back_to_python_ints(self):
+        # Every row fits, but their sum does not
+        items = [LineItem("", "Big", QTY_SCALE, 10 ** 17, 0, 0, 0)] * NUMPY_MIN_ROWS * 2
+        calculation = calculate(items)
+        self.assertEqual(calculation.totals.total, 10 ** 17 * NUMPY_MIN_ROWS * 2)
+
+
+class ItemListTest(unittest.TestCase):
+    def assertTotalsMatch(self, items):
+        expected = calculate(list(items)).totals
+        self.assertEqual(_sums(items.totals), _sums(expected))
+        self.assertEqual(_sums(items.calculation().totals), _sums(expected))
+
+    def test_replace_and_remove_keep_totals_exact(self):
+        items = ItemList()
+        ids = items.extend(_random_items(NUMPY_MIN_ROWS * 2, seed=3))
+        extra = items.add(LineItem("", "Extra", 1500, 333, 125, 900, 900))
+        self.assertTotalsMatch(items)
+
+        items.replace(ids[5], LineItem("", "Replaced", 2000, 12345, 0, 250, 250))
+        self.assertEqual(items.ids().index(ids[5]), 5)
+        self.assertEqual(items[ids[5]].description, "Replaced")
+        self.assertTotalsMatch(items)
+
+        for item_id in ids[::3] + [extra]:
+            items.remove(item_id)
+        self.assertNotIn(extra, items)
+        self.assertTotalsMatch(items)
+
+    def test_removing_every_item_returns_to_zero(self):
+        items = ItemList()
+        ids = items.extend(_random_items(20, seed=5))
+        for item_id in ids:
+            items.remove(item_id)
+        self.assertEqual(_sums(items.totals), (0, 0, 0, 0, 0))
+        self.assertEqual(len(items.calculation()), 0)
+
+    def test_calculation_uses_stored_amounts_in_order(self):
+        items = ItemList()
+        ids = items.extend(_random_items(10, seed=9))
+        items.replace(ids[0], LineItem("", "First", 1000, 100, 0, 0, 0))
+        calculation = items.calculation()
+        self.assertEqual([calculation.row(index) for index in range(len(items))],
+                         [items.amounts(item_id) for item_id in ids])
+
+
+if __name__ == "__main__":
+    unittest.main()
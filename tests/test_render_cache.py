@@ -0,0 +1,108 @@
+"""Render cache keys, reuse and LRU eviction (python -m unittest discover tests)."""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from line_items import LineItem  # noqa: E402
+from render_cache import RenderCache, generate_invoice_cached, invoice_cache_key  # noqa: E402
+
+_PARTY = {"name": "Alpha Traders", "gst": "27AAAAA0000A1Z5", "address": "1 Main Road", "phone": "", "email": ""}
+_INVOICE = {"sale_date": "01-04-2025", "delivery_date": "02-04-2025"}
+
+
+def _items(rate_paise=150000):
+    return [LineItem("8541", "Panel", 2000, rate_paise, 500, 900, 900), LineItem("", "Cable", 10500, 2550)]
+
+
+class InvoiceCacheKeyTest(unittest.TestCase):
+    def test_same_content_same_key(self):
+        key = invoice_cache_key(_PARTY, _INVOICE, _items())
+        self.assertEqual(invoice_cache_key(dict(_PARTY), dict(_INVOICE), _items()), key)
+        # Surrounding blanks in the party details do not matter
+        self.assertEqual(invoice_cache_key(dict(_PARTY, name=" Alpha Traders "), _INVOICE, _items()), key)
+
+    def test_changes_give_a_new_key(self):
+        key = invoice_cache_key(_PARTY, _INVOICE, _items())
+        changed = [
+            invoice_cache_key(_PARTY, _INVOICE, _items(rate_paise=150001)),
+            invoice_cache_key(dict(_PARTY, gst=""), _INVOICE, _items()),
+            invoice_cache_key(_PARTY, dict(_INVOICE, sale_date="02-04-2025"), _items()),
+            invoice_cache_key(_PARTY, dict(_INVOICE, invoice_no="X-1"), _items()),
+            invoice_cache_key(_PARTY, _INVOICE, _items(), output_format="pdf"),
+        ]
+        self.assertNotIn(key, changed)
+        self.assertEqual(len(set(changed)), len(changed))
+
+
+class RenderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tempdir.name, "out")
+        os.makedirs(self.output_dir)
+        self.numbers = iter(range(1, 100))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def next_invoice_no(self):
+        return f"INV-{next(self.numbers):05d}"
+
+    def test_same_invoice_reuses_file_and_number(self):
+        cache = RenderCache(os.path.join(self.tempdir.name, "cache"))
+        path, invoice_no, cached = generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no,
+                                                           self.output_dir)
+        self.assertEqual((invoice_no, cached), ("INV-00001", False))
+        os.remove(path)
+
+        again, invoice_no, cached = generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no,
+                                                            self.output_dir)
+        self.assertEqual((again, invoice_no, cached), (path, "INV-00001", True))
+        self.assertTrue(os.path.exists(path))
+
+        _, invoice_no, cached = generate_invoice_cached(cache, _PARTY, _INVOICE, _items(rate_paise=99),
+                                                        self.next_invoice_no, self.output_dir)
+        self.assertEqual((invoice_no, cached), ("INV-00002", False))
+
+    def test_other_format_keeps_the_number(self):
+        cache = RenderCache(os.path.join(self.tempdir.name, "cache"))
+        generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no, self.output_dir)
+        path, invoice_no, cached = generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no,
+                                                           self.output_dir, output_format="pdf")
+        self.assertEqual((invoice_no, cached), ("INV-00001", False))
+        self.assertTrue(path.endswith("_INV-00001.pdf"))
+
+    def put_file(self, cache, key, size, mtime):
+        path = os.path.join(self.output_dir, f"Invoice_{key}.xlsx")
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        cache.put(key, path, key)
+        meta_path = os.path.join(cache.directory, key + ".json")
+        os.utime(meta_path, (mtime, mtime))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = RenderCache(os.path.join(self.tempdir.name, "cache"), max_bytes=3500)
+        for key, mtime in (("a", 1000), ("b", 2000), ("c", 3000)):
+            self.put_file(cache, key, 1000, mtime)
+        self.assertIsNotNone(cache.get("a"))  # Now the most recently used
+
+        self.put_file(cache, "d", 1000, 4000)
+        self.assertIsNone(cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertEqual(cache.get(key)["invoice_no"], key)
+        self.assertFalse(os.path.exists(os.path.join(cache.directory, "b.xlsx")))
+
+    def test_evicted_invoice_is_rendered_again(self):
+        cache = RenderCache(os.path.join(self.tempdir.name, "cache"), max_bytes=0)
+        generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no, self.output_dir)
+        self.assertEqual(os.listdir(cache.directory), [])
+        _, invoice_no, cached = generate_invoice_cached(cache, _PARTY, _INVOICE, _items(), self.next_invoice_no,
+                                                        self.output_dir)
+        self.assertEqual((invoice_no, cached), ("INV-00002", False))
+
+
+if __name__ == "__main__":
+    unittest.main()